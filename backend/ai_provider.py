@@ -4,24 +4,70 @@ Stock Fortress — Configurable AI Provider
 Universal adapter supporting Gemini, OpenAI, Claude, Perplexity, and any LiteLLM-supported model.
 
 Usage:
-    from ai_provider import ai_generate, ai_generate_blog
+    from ai_provider import ai_generate, ai_generate_blog, ai_generate_stream
 
 Configuration via .env:
     AI_PROVIDER=gemini              # gemini | openai | anthropic | perplexity
     AI_MODEL=gemini-2.5-flash       # Model for reports
     AI_BLOG_MODEL=gemini-2.5-flash  # Model for blog teasers (defaults to AI_MODEL)
     AI_TEMPERATURE=0.4              # Default temperature
+    AI_MAX_CONCURRENCY=8            # Max in-flight calls per provider (AI_MAX_CONCURRENCY_GEMINI overrides)
+    AI_TIMEOUT_SECONDS=120          # Per-call timeout for reports
+    AI_BLOG_TIMEOUT_SECONDS=60      # Per-call timeout for blog teasers
+    AI_POOL_MAX_CONNECTIONS=32      # Keep-alive HTTP pool size per provider client
+    AI_POOL_KEEPALIVE_SECONDS=120   # Idle time before a pooled connection is closed
+    AI_ROUTES=gemini:gemini-2.5-flash,openai:gpt-4o   # Ordered provider:model routes (default: AI_PROVIDER:AI_MODEL)
+    AI_BLOG_ROUTES=...              # Same for blog teasers (default: AI_ROUTES with AI_BLOG_MODEL first)
+    AI_HEDGE_ENABLED=true           # Race a second route once the first passes its p95 latency
+    AI_HEDGE_DELAY_SECONDS=45       # Hedge delay until a route has AI_HEDGE_MIN_SAMPLES latencies
+    AI_HEDGE_MIN_SAMPLES=20
+    AI_HEDGE_MIN_DELAY_SECONDS=5    # Never hedge sooner than this
+    AI_LATENCY_WINDOW=200           # Rolling latency samples kept per route
+    AI_PROMPT_CACHE=true            # Provider-side caching of the (large, static) system prompts
+    AI_PROMPT_CACHE_TTL_SECONDS=3600      # Gemini cached-content lifetime
+    AI_PROMPT_CACHE_REFRESH_SECONDS=300   # Extend a cache this long before it expires
+
+All calls use the providers' native async clients, so a slow generation never
+blocks the event loop — one worker can keep many generations in flight.
+
+Routing: each call goes to the first route. If that route fails, the next one is tried
+immediately (failover); if it is merely slow — past its own p95 — the next route is started
+in parallel (hedge), the first valid response wins and the other call is cancelled.
+Non-Gemini routes ignore `use_grounding` (no Google Search).
+
+Prompt caching: Gemini system prompts (+ tools) are uploaded once as cached content and
+referenced by name; Anthropic system prompts carry `cache_control`; OpenAI caches long
+prefixes automatically. Cached-token counts from every response land in provider_stats().
 """
 
 import os
 import json
-from typing import Optional
+import time
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 # ─── CONFIG ───
 AI_PROVIDER = os.environ.get("AI_PROVIDER", "gemini").lower()
 AI_MODEL = os.environ.get("AI_MODEL", "gemini-2.5-flash")
 AI_BLOG_MODEL = os.environ.get("AI_BLOG_MODEL", AI_MODEL)
 AI_TEMPERATURE = float(os.environ.get("AI_TEMPERATURE", "0.4"))
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "8"))
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT_SECONDS", "120"))
+AI_BLOG_TIMEOUT = float(os.environ.get("AI_BLOG_TIMEOUT_SECONDS", "60"))
+AI_POOL_MAX_CONNECTIONS = int(os.environ.get("AI_POOL_MAX_CONNECTIONS", "32"))
+AI_POOL_KEEPALIVE = float(os.environ.get("AI_POOL_KEEPALIVE_SECONDS", "120"))
+AI_HEDGE_ENABLED = os.environ.get("AI_HEDGE_ENABLED", "true").lower() == "true"
+AI_HEDGE_DELAY = float(os.environ.get("AI_HEDGE_DELAY_SECONDS", "45"))
+AI_HEDGE_MIN_SAMPLES = int(os.environ.get("AI_HEDGE_MIN_SAMPLES", "20"))
+AI_HEDGE_MIN_DELAY = float(os.environ.get("AI_HEDGE_MIN_DELAY_SECONDS", "5"))
+AI_LATENCY_WINDOW = int(os.environ.get("AI_LATENCY_WINDOW", "200"))
+AI_PROMPT_CACHE = os.environ.get("AI_PROMPT_CACHE", "true").lower() == "true"
+AI_PROMPT_CACHE_TTL = int(os.environ.get("AI_PROMPT_CACHE_TTL_SECONDS", "3600"))
+AI_PROMPT_CACHE_REFRESH = int(os.environ.get("AI_PROMPT_CACHE_REFRESH_SECONDS", "300"))
 
 # API Keys
 GEMINI_KEY = os.environ.get("GEMINI_API_KEY", "")
@@ -32,80 +78,781 @@ PERPLEXITY_KEY = os.environ.get("PERPLEXITY_API_KEY", "")
 print(f"🤖 AI Provider: {AI_PROVIDER} | Report Model: {AI_MODEL} | Blog Model: {AI_BLOG_MODEL}")
 
 
+# ─── CLIENT REGISTRY ───
+# Provider clients are built once (at startup or on first use) and reused, so each
+# generation rides an already-open keep-alive connection instead of paying for
+# client setup + TLS handshake.
+
+class _ClientRegistry:
+    """Long-lived provider clients sharing keep-alive HTTP pools."""
+
+    def __init__(self):
+        self._gemini = None
+        self._litellm = None
+        self._http = None
+        self.created: Dict[str, float] = {}
+        self.uses: Dict[str, int] = {}
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=AI_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_POOL_MAX_CONNECTIONS,
+            keepalive_expiry=AI_POOL_KEEPALIVE,
+        )
+
+    def gemini(self):
+        """Shared google-genai client (its .aio side holds the async pool)."""
+        if self._gemini is None:
+            from google import genai
+            from google.genai import types
+
+            try:
+                http_options = types.HttpOptions(async_client_args={"limits": self._limits()})
+                self._gemini = genai.Client(api_key=GEMINI_KEY, http_options=http_options)
+            except Exception as e:
+                # Older SDKs don't accept client args — still reuse one client
+                print(f"⚠️ Gemini pooled client unavailable ({e}), using default transport")
+                self._gemini = genai.Client(api_key=GEMINI_KEY)
+            self.created["gemini"] = time.time()
+            print("✅ Gemini client initialized")
+        self.uses["gemini"] = self.uses.get("gemini", 0) + 1
+        return self._gemini
+
+    def litellm(self):
+        """LiteLLM module wired to one shared async HTTP session."""
+        if self._litellm is None:
+            import httpx
+            import litellm
+
+            # Set appropriate API keys (once, not per call)
+            if OPENAI_KEY:
+                os.environ["OPENAI_API_KEY"] = OPENAI_KEY
+            if ANTHROPIC_KEY:
+                os.environ["ANTHROPIC_API_KEY"] = ANTHROPIC_KEY
+            if PERPLEXITY_KEY:
+                os.environ["PERPLEXITY_API_KEY"] = PERPLEXITY_KEY
+
+            self._http = httpx.AsyncClient(limits=self._limits(), timeout=AI_TIMEOUT)
+            litellm.aclient_session = self._http
+            self._litellm = litellm
+            self.created["litellm"] = time.time()
+            print("✅ LiteLLM client session initialized")
+        self.uses["litellm"] = self.uses.get("litellm", 0) + 1
+        return self._litellm
+
+    def stats(self) -> dict:
+        out = {}
+        for name in self.created:
+            out[name] = {
+                "age_s": round(time.time() - self.created[name]),
+                "uses": self.uses.get(name, 0),
+                "max_connections": AI_POOL_MAX_CONNECTIONS,
+                "keepalive_s": AI_POOL_KEEPALIVE,
+            }
+        if self._http is not None and "litellm" in out:
+            out["litellm"]["open_connections"] = _open_connections(self._http)
+        return out
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._litellm = None
+            self.created.pop("litellm", None)
+        if self._gemini is not None:
+            try:
+                await self._gemini.aio.aclose()
+            except Exception:
+                pass
+            self._gemini = None
+            self.created.pop("gemini", None)
+
+
+def _open_connections(http_client) -> Optional[int]:
+    """Best-effort count of pooled connections (httpcore internals)."""
+    try:
+        return len(http_client._transport._pool.connections)
+    except Exception:
+        return None
+
+
+clients = _ClientRegistry()
+
+
+async def warm_clients():
+    """Build every routed provider's client at startup so the first report doesn't pay for it."""
+    gemini_models = list(dict.fromkeys(r.model for r in REPORT_ROUTES if r.provider == "gemini"))
+    try:
+        if gemini_models:
+            client = clients.gemini()
+            # Cheap metadata call opens the TLS connection into the pool
+            await asyncio.wait_for(client.aio.models.get(model=gemini_models[0]), timeout=10)
+        if any(r.provider != "gemini" for r in REPORT_ROUTES + BLOG_ROUTES):
+            clients.litellm()
+        print(f"🔥 AI clients warmed: {', '.join(r.name for r in REPORT_ROUTES)}")
+    except Exception as e:
+        print(f"⚠️ AI client warm-up failed (will retry on first use): {e}")
+
+
+async def close_clients():
+    await prompt_cache.clear()
+    await clients.close()
+
+
+# ─── PROMPT CACHING ───
+
+class _GeminiPromptCache:
+    """
+    Gemini cached content per (model, grounding, system prompt).
+
+    Created on first use, kept alive by extending its TTL shortly before expiry, and
+    abandoned for AI_PROMPT_CACHE_TTL_SECONDS if the API refuses it (e.g. a prompt below
+    the model's minimum cacheable size) — callers then just send the prompt uncached.
+    """
+
+    def __init__(self):
+        self._entries: Dict[tuple, dict] = {}    # key -> {"name", "expires_at", "created_at"}
+        self._refused: Dict[tuple, float] = {}   # key -> retry after
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self.counters = {"created": 0, "refreshed": 0, "refused": 0, "invalidated": 0, "fallbacks": 0}
+
+    @staticmethod
+    def key(model: str, system_prompt: str, use_grounding: bool) -> tuple:
+        return model, use_grounding, hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+
+    async def get(self, model: str, system_prompt: str, use_grounding: bool) -> Optional[str]:
+        """Name of a live cache for this prompt, or None to call uncached."""
+        if not AI_PROMPT_CACHE:
+            return None
+        key = self.key(model, system_prompt, use_grounding)
+        now = time.time()
+        if self._refused.get(key, 0) > now:
+            return None
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] - now > AI_PROMPT_CACHE_REFRESH:
+            return entry["name"]
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] - time.time() > AI_PROMPT_CACHE_REFRESH:
+                return entry["name"]
+            try:
+                if entry and entry["expires_at"] > time.time() + 10:
+                    await self._extend(entry)
+                else:
+                    entry = self._entries[key] = await self._create(model, system_prompt, use_grounding)
+                return entry["name"]
+            except Exception as e:
+                self._entries.pop(key, None)
+                self._refused[key] = time.time() + AI_PROMPT_CACHE_TTL
+                self.counters["refused"] += 1
+                print(f"⚠️ Gemini prompt cache unavailable for {model} (sending uncached): {e}")
+                return None
+
+    async def _create(self, model: str, system_prompt: str, use_grounding: bool) -> dict:
+        from google.genai import types
+
+        tools = [types.Tool(google_search=types.GoogleSearch())] if use_grounding else None
+        cache = await clients.gemini().aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                tools=tools,
+                ttl=f"{AI_PROMPT_CACHE_TTL}s",
+                display_name=f"stock-fortress-{hashlib.sha256(system_prompt.encode()).hexdigest()[:8]}",
+            ),
+        )
+        self.counters["created"] += 1
+        return {"name": cache.name, "created_at": time.time(), "expires_at": time.time() + AI_PROMPT_CACHE_TTL}
+
+    async def _extend(self, entry: dict):
+        from google.genai import types
+
+        await clients.gemini().aio.caches.update(
+            name=entry["name"],
+            config=types.UpdateCachedContentConfig(ttl=f"{AI_PROMPT_CACHE_TTL}s"),
+        )
+        entry["expires_at"] = time.time() + AI_PROMPT_CACHE_TTL
+        self.counters["refreshed"] += 1
+
+    def invalidate(self, name: str):
+        for key, entry in list(self._entries.items()):
+            if entry["name"] == name:
+                del self._entries[key]
+                self.counters["invalidated"] += 1
+
+    async def clear(self):
+        """Delete our caches so they stop accruing storage time after shutdown."""
+        entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            try:
+                await clients.gemini().aio.caches.delete(name=entry["name"])
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "enabled": AI_PROMPT_CACHE,
+            "live": [{"name": e["name"], "expires_in_s": round(e["expires_at"] - now)}
+                     for e in self._entries.values()],
+            **self.counters,
+        }
+
+
+prompt_cache = _GeminiPromptCache()
+
+_token_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _record_usage(provider: str, prompt_tokens: Optional[int], cached_tokens: Optional[int],
+                  cache_write_tokens: Optional[int] = None):
+    stats = _token_stats.setdefault(provider, {
+        "responses": 0, "prompt_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0, "cache_hits": 0,
+    })
+    stats["responses"] += 1
+    stats["prompt_tokens"] += prompt_tokens or 0
+    stats["cached_tokens"] += cached_tokens or 0
+    stats["cache_write_tokens"] += cache_write_tokens or 0
+    if cached_tokens:
+        stats["cache_hits"] += 1
+
+
+def _is_cache_error(e: Exception, cache_name: str) -> bool:
+    """A deleted/expired cache surfaces as a 4xx on the generate call that names the cached
+    content; any other 400/403/404 (bad request, quota, wrong model) is a real error."""
+    if getattr(e, "code", None) not in (400, 403, 404):
+        return False
+    text = f"{getattr(e, 'message', '') or ''} {getattr(e, 'details', '') or ''} {e}".lower()
+    squashed = text.replace(" ", "").replace("_", "")
+    cache_id = cache_name.rsplit("/", 1)[-1].lower()  # "cachedContents/abc" → "abc"
+    return cache_id in text or "cachedcontent" in squashed or "cachecontent" in squashed
+
+
 # ─── GEMINI NATIVE (with Google Search Grounding) ───
 
-def _gemini_generate(system_prompt: str, user_prompt: str, model: str,
-                     temperature: float, use_grounding: bool = False) -> str:
-    """Generate content using the native Google GenAI SDK."""
-    from google import genai
+async def _gemini_generate(system_prompt: str, user_prompt: str, model: str,
+                           temperature: float, use_grounding: bool = False,
+                           response_schema: Optional[type] = None) -> str:
+    """Generate content using the native Google GenAI SDK (async client)."""
+    client = clients.gemini()
+    cache_name = await prompt_cache.get(model, system_prompt, use_grounding)
+
+    try:
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=user_prompt,
+            config=_gemini_config(system_prompt, temperature, use_grounding, response_schema, cache_name),
+        )
+    except Exception as e:
+        if not cache_name or not _is_cache_error(e, cache_name):
+            raise
+        # Cache vanished under us (expired / deleted) — retry once with the full prompt
+        prompt_cache.invalidate(cache_name)
+        prompt_cache.counters["fallbacks"] += 1
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=user_prompt,
+            config=_gemini_config(system_prompt, temperature, use_grounding, response_schema),
+        )
+
+    _record_gemini_usage(response)
+    return _strip_fences(response.text)
+
+
+async def _gemini_stream(system_prompt: str, user_prompt: str, model: str,
+                         temperature: float, use_grounding: bool = False) -> AsyncIterator[str]:
+    """Stream raw text chunks from the native Google GenAI SDK."""
+    client = clients.gemini()
+    cache_name = await prompt_cache.get(model, system_prompt, use_grounding)
+
+    try:
+        stream = await client.aio.models.generate_content_stream(
+            model=model,
+            contents=user_prompt,
+            config=_gemini_config(system_prompt, temperature, use_grounding, cached_content=cache_name),
+        )
+    except Exception as e:
+        if not cache_name or not _is_cache_error(e, cache_name):
+            raise
+        prompt_cache.invalidate(cache_name)
+        prompt_cache.counters["fallbacks"] += 1
+        stream = await client.aio.models.generate_content_stream(
+            model=model,
+            contents=user_prompt,
+            config=_gemini_config(system_prompt, temperature, use_grounding),
+        )
+    last = None
+    async for chunk in stream:
+        last = chunk
+        if chunk.text:
+            yield chunk.text
+    if last is not None:
+        _record_gemini_usage(last)  # usage arrives on the final chunk
+
+
+def _record_gemini_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        _record_usage("gemini", usage.prompt_token_count, usage.cached_content_token_count)
+
+
+def _gemini_schema(model: type) -> dict:
+    """
+    JSON schema of a pydantic model without "default" keywords: the report models default
+    every optional field, and google-genai 1.x rejects defaults in a Gemini response schema
+    (the defaults only matter when validating the reply, which pydantic does locally).
+    """
+    def strip(node):
+        if isinstance(node, dict):
+            return {k: (strip_map(v) if k in ("properties", "$defs") else strip(v))
+                    for k, v in node.items() if k != "default"}
+        if isinstance(node, list):
+            return [strip(v) for v in node]
+        return node
+
+    def strip_map(mapping):
+        return {name: strip(schema) for name, schema in mapping.items()}
+
+    return strip(model.model_json_schema())
+
+
+def _gemini_config(system_prompt: str, temperature: float, use_grounding: bool,
+                   response_schema: Optional[type] = None, cached_content: Optional[str] = None):
     from google.genai import types
 
-    client = genai.Client(api_key=GEMINI_KEY)
+    # Controlled JSON output can't be combined with the Google Search tool, so grounded
+    # calls stay prompt-constrained (and are repaired/validated by the caller instead)
+    structured = {}
+    if response_schema is not None and not use_grounding:
+        structured = {"response_mime_type": "application/json", "response_schema": _gemini_schema(response_schema)}
+
+    if cached_content:
+        # System instruction and tools live in the cache; the request may not repeat them
+        return types.GenerateContentConfig(cached_content=cached_content, temperature=temperature, **structured)
 
     tools = []
     if use_grounding:
         tools.append(types.Tool(google_search=types.GoogleSearch()))
 
-    config = types.GenerateContentConfig(
+    return types.GenerateContentConfig(
         system_instruction=system_prompt,
         tools=tools if tools else None,
         temperature=temperature,
+        **structured,
     )
 
-    response = client.models.generate_content(
-        model=model,
-        contents=user_prompt,
-        config=config,
-    )
-
-    text = response.text.strip()
-    # Strip markdown fences if present
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-    return text
-
 
 # ─── LITELLM UNIVERSAL (OpenAI, Claude, Perplexity, etc.) ───
 
-def _litellm_generate(system_prompt: str, user_prompt: str, model: str,
-                      temperature: float) -> str:
-    """Generate content using LiteLLM (supports 100+ providers)."""
-    import litellm
-
-    # Set appropriate API keys
-    if OPENAI_KEY:
-        os.environ["OPENAI_API_KEY"] = OPENAI_KEY
-    if ANTHROPIC_KEY:
-        os.environ["ANTHROPIC_API_KEY"] = ANTHROPIC_KEY
-    if PERPLEXITY_KEY:
-        os.environ["PERPLEXITY_API_KEY"] = PERPLEXITY_KEY
+async def _litellm_generate(system_prompt: str, user_prompt: str, model: str,
+                            temperature: float, json_mode: bool = False) -> str:
+    """Generate content using LiteLLM (supports 100+ providers, async)."""
+    litellm = clients.litellm()
 
     # LiteLLM model naming convention:
     # OpenAI: "gpt-4o", "gpt-4o-mini"
     # Claude: "anthropic/claude-3-5-sonnet-20241022"
     # Perplexity: "perplexity/sonar-pro"
 
-    response = litellm.completion(
+    response = await litellm.acompletion(
+        model=model,
+        messages=_litellm_messages(model, system_prompt, user_prompt),
+        temperature=temperature,
+        **_json_mode_args(model, json_mode),
+    )
+
+    _record_litellm_usage(model, getattr(response, "usage", None))
+    return _strip_fences(response.choices[0].message.content)
+
+
+def _litellm_messages(model: str, system_prompt: str, user_prompt: str) -> list:
+    system = {"role": "system", "content": system_prompt}
+    if AI_PROMPT_CACHE and ("anthropic/" in model or model.startswith("claude")):
+        # Anthropic only caches explicitly marked prefixes; OpenAI caches long prefixes on its own
+        system["content"] = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    return [system, {"role": "user", "content": user_prompt}]
+
+
+def _record_litellm_usage(model: str, usage):
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    cached = cached or getattr(usage, "cache_read_input_tokens", None)  # Anthropic
+    _record_usage(model.split("/", 1)[0] if "/" in model else "openai",
+                  getattr(usage, "prompt_tokens", None), cached,
+                  getattr(usage, "cache_creation_input_tokens", None))
+
+
+def _json_mode_args(model: str, json_mode: bool) -> dict:
+    # JSON mode guarantees syntactically valid JSON; the report shape itself is still
+    # validated by the caller. Perplexity only accepts full json_schema, so skip it there.
+    if not json_mode or model.startswith("perplexity/"):
+        return {}
+    return {"response_format": {"type": "json_object"}}
+
+
+async def _litellm_stream(system_prompt: str, user_prompt: str, model: str,
+                          temperature: float) -> AsyncIterator[str]:
+    """Stream raw text deltas through LiteLLM."""
+    litellm = clients.litellm()
+
+    response = await litellm.acompletion(
         model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=_litellm_messages(model, system_prompt, user_prompt),
         temperature=temperature,
+        stream=True,
     )
+    async for part in response:
+        delta = part.choices[0].delta.content if part.choices else None
+        if delta:
+            yield delta
 
-    text = response.choices[0].message.content.strip()
-    # Strip markdown fences if present
+
+def _strip_fences(text: str) -> str:
+    """Strip markdown fences if present."""
+    text = (text or "").strip()
     if text.startswith("```"):
         text = text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
     return text
 
 
+# ─── CONCURRENCY & TIMEOUTS ───
+# One semaphore per provider caps in-flight calls so a burst of reports can't
+# exhaust the provider's rate limit; everything else keeps flowing on the loop.
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_call_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _provider_limit(provider: str) -> int:
+    return int(os.environ.get(f"AI_MAX_CONCURRENCY_{provider.upper()}", AI_MAX_CONCURRENCY))
+
+
+def _semaphore(provider: str) -> asyncio.Semaphore:
+    sem = _semaphores.get(provider)
+    if sem is None:
+        sem = _semaphores[provider] = asyncio.Semaphore(_provider_limit(provider))
+    return sem
+
+
+def _stats_for(provider: str) -> Dict[str, int]:
+    return _call_stats.setdefault(provider, {
+        "in_flight": 0, "calls": 0, "timeouts": 0, "errors": 0,
+        "last_latency_ms": 0, "avg_latency_ms": 0, "last_ttfb_ms": 0,
+    })
+
+
+async def _dispatch(provider: str, call: Callable[[], Awaitable[str]], timeout: float) -> str:
+    """Run one provider call under its semaphore with a hard timeout."""
+    stats = _stats_for(provider)
+    async with _semaphore(provider):
+        stats["in_flight"] += 1
+        stats["calls"] += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(), timeout=timeout)
+            latency_ms = round((time.perf_counter() - started) * 1000)
+            stats["last_latency_ms"] = latency_ms
+            # Exponential moving average — cheap and good enough for a health check
+            stats["avg_latency_ms"] = round(latency_ms if stats["calls"] == 1
+                                            else 0.8 * stats["avg_latency_ms"] + 0.2 * latency_ms)
+            return result
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise TimeoutError(f"{provider} call exceeded {timeout:.0f}s timeout")
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+
+
+async def _dispatch_stream(provider: str, stream: AsyncIterator[str], timeout: float) -> AsyncIterator[str]:
+    """Relay a provider stream under its semaphore; `timeout` bounds the whole stream."""
+    stats = _stats_for(provider)
+    async with _semaphore(provider):
+        stats["in_flight"] += 1
+        stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout
+        first = True
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                if first:
+                    stats["last_ttfb_ms"] = round((loop.time() - started) * 1000)
+                    first = False
+                yield chunk
+            stats["last_latency_ms"] = round((loop.time() - started) * 1000)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise TimeoutError(f"{provider} stream exceeded {timeout:.0f}s timeout")
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            await stream.aclose()
+
+
+# ─── ROUTING: FAILOVER + HEDGED REQUESTS ───
+
+_PROVIDER_KEYS = {"gemini": GEMINI_KEY, "openai": OPENAI_KEY,
+                  "anthropic": ANTHROPIC_KEY, "perplexity": PERPLEXITY_KEY}
+
+
+class Route:
+    """One provider + model a call can be sent to."""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider.lower()
+        self.model = model
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    def configured(self) -> bool:
+        return bool(_PROVIDER_KEYS.get(self.provider, True))
+
+    def __repr__(self):
+        return f"Route({self.name!r})"
+
+
+def _parse_routes(spec: str, default: List[Route]) -> List[Route]:
+    # "provider:model" — split on the first colon only (LiteLLM models may contain "/")
+    routes = [Route(*item.strip().split(":", 1)) for item in spec.split(",") if ":" in item]
+    return routes or default
+
+
+REPORT_ROUTES = _parse_routes(os.environ.get("AI_ROUTES", ""), [Route(AI_PROVIDER, AI_MODEL)])
+BLOG_ROUTES = _parse_routes(os.environ.get("AI_BLOG_ROUTES", ""),
+                            [Route(REPORT_ROUTES[0].provider, AI_BLOG_MODEL)] + REPORT_ROUTES[1:])
+if len(REPORT_ROUTES) > 1:
+    print(f"🔀 AI routes: {' → '.join(r.name for r in REPORT_ROUTES)} (hedging {'on' if AI_HEDGE_ENABLED else 'off'})")
+
+# Models that answered calls inside the current track_served() block. The list is shared
+# by reference, so calls made from child tasks (sectioned generation) land in it too.
+_served_by: ContextVar[Optional[List[str]]] = ContextVar("ai_served_by", default=None)
+
+
+@contextmanager
+def track_served():
+    """Collect the models that answer ai_generate / ai_generate_stream calls in this block."""
+    served: List[str] = []
+    token = _served_by.set(served)
+    try:
+        yield served
+    finally:
+        _served_by.reset(token)
+
+
+def served_model() -> Optional[str]:
+    """Model(s) that produced the results inside the enclosing track_served() block."""
+    served = _served_by.get()
+    return " + ".join(dict.fromkeys(served)) if served else None
+
+
+def _record_served(model: str):
+    served = _served_by.get()
+    if served is not None:
+        served.append(model)
+
+
+class LatencyWindow:
+    """Rolling window of call latencies (seconds) with percentiles and a bucketed histogram."""
+
+    BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60, 90, 120)
+
+    def __init__(self, size: int = AI_LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def histogram(self) -> Dict[str, int]:
+        counts = {f"<={b}s": 0 for b in self.BUCKETS}
+        counts[f">{self.BUCKETS[-1]}s"] = 0
+        for sample in self.samples:
+            bucket = next((f"<={b}s" for b in self.BUCKETS if sample <= b), f">{self.BUCKETS[-1]}s")
+            counts[bucket] += 1
+        return counts
+
+
+# Latency differs a lot between a grounded report and a short blog teaser, so each
+# (route, purpose) pair gets its own window.
+_latency: Dict[str, LatencyWindow] = {}
+_route_stats: Dict[str, Dict[str, int]] = {}
+_decisions = deque(maxlen=50)
+
+
+def _window(route: Route, purpose: str) -> LatencyWindow:
+    return _latency.setdefault(f"{route.name}|{purpose}", LatencyWindow())
+
+
+def _route_counters(route: Route) -> Dict[str, int]:
+    return _route_stats.setdefault(route.name, {
+        "primary": 0, "wins": 0, "hedges_sent": 0, "hedge_wins": 0,
+        "failovers_to": 0, "failures": 0, "invalid": 0, "cancelled": 0,
+    })
+
+
+def _hedge_delay(route: Route, purpose: str) -> float:
+    window = _window(route, purpose)
+    if len(window.samples) < AI_HEDGE_MIN_SAMPLES:
+        return AI_HEDGE_DELAY
+    return max(AI_HEDGE_MIN_DELAY, window.percentile(95))
+
+
+def _available(routes: List[Route]) -> List[Route]:
+    usable = [r for r in routes if r.configured()]
+    return usable or routes[:1]
+
+
+async def _route(routes: List[Route], purpose: str, timeout: float,
+                 make_call: Callable[[Route], Callable[[], Awaitable[str]]],
+                 validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Send a call down the route list: fail over on errors/invalid output, hedge on slowness.
+
+    Raises:
+        The last route's exception when every route failed
+    """
+    routes = _available(routes)
+    loop = asyncio.get_running_loop()
+    pending: Dict[asyncio.Task, tuple] = {}  # task -> (route, started, kind)
+    remaining = list(routes)
+    decision = {"ts": round(time.time()), "purpose": purpose, "primary": routes[0].name,
+                "attempts": [], "winner": None}
+    last_error: Optional[BaseException] = None
+    hedged = False
+
+    def launch(kind: str):
+        route = remaining.pop(0)
+        task = asyncio.create_task(_dispatch(route.provider, make_call(route), timeout))
+        pending[task] = (route, loop.time(), kind)
+        decision["attempts"].append({"route": route.name, "kind": kind})
+        _route_counters(route)[{"primary": "primary", "hedge": "hedges_sent",
+                                "failover": "failovers_to"}[kind]] += 1
+
+    launch("primary")
+    try:
+        while pending:
+            wait_for = None
+            if AI_HEDGE_ENABLED and not hedged and remaining and len(pending) == 1:
+                task, (route, started, _) = next(iter(pending.items()))
+                wait_for = max(0.0, started + _hedge_delay(route, purpose) - loop.time())
+            done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                hedged = True
+                decision["hedge_after_ms"] = round(wait_for * 1000)
+                launch("hedge")
+                continue
+
+            for task in done:
+                route, started, kind = pending.pop(task)
+                counters = _route_counters(route)
+                try:
+                    text = task.result()
+                except Exception as e:
+                    counters["failures"] += 1
+                    last_error = e
+                    print(f"⚠️ AI route {route.name} failed ({purpose}): {e}")
+                    continue
+                if validate is not None and not validate(text):
+                    counters["invalid"] += 1
+                    last_error = ValueError(f"{route.name} returned an invalid response")
+                    continue
+
+                elapsed = loop.time() - started
+                _window(route, purpose).add(elapsed)
+                counters["wins"] += 1
+                if kind == "hedge":
+                    counters["hedge_wins"] += 1
+                decision.update(winner=route.name, latency_ms=round(elapsed * 1000))
+                _record_served(route.model)
+                return text
+
+            # Everything in flight failed — fail over to the next route right away
+            if not pending and remaining:
+                launch("failover")
+        raise last_error or RuntimeError("No AI route available")
+    finally:
+        # Cancelled losers stay out of the latency window: their elapsed time is bounded by
+        # the winner's, so recording it would pull p95 toward the hedge delay
+        for task, (route, _, _) in pending.items():
+            task.cancel()
+            _route_counters(route)["cancelled"] += 1
+        _decisions.append(decision)
+
+
+def provider_stats() -> dict:
+    """Per-provider concurrency limit, call outcomes, latency, routing and client pool stats."""
+    return {
+        "calls": {
+            provider: {"limit": _provider_limit(provider), **stats}
+            for provider, stats in _call_stats.items()
+        },
+        "routes": {
+            "report": [r.name for r in REPORT_ROUTES],
+            "blog": [r.name for r in BLOG_ROUTES],
+            "hedging": AI_HEDGE_ENABLED,
+            "counters": _route_stats,
+        },
+        "latency": {
+            key: {
+                "samples": len(window.samples),
+                "p50_s": _round(window.percentile(50)),
+                "p95_s": _round(window.percentile(95)),
+                "histogram": window.histogram(),
+            }
+            for key, window in _latency.items()
+        },
+        "recent_decisions": list(_decisions)[-10:],
+        "prompt_cache": {"gemini": prompt_cache.stats(), "tokens": _token_stats},
+        "clients": clients.stats(),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
 # ─── PUBLIC API ───
 
+def _generate_call(route: Route, system_prompt: str, user_prompt: str, model: str,
+                   temperature: float, use_grounding: bool,
+                   response_schema: Optional[type] = None) -> Callable[[], Awaitable[str]]:
+    if route.provider == "gemini":
+        return lambda: _gemini_generate(system_prompt, user_prompt, model, temperature, use_grounding,
+                                        response_schema)
+    return lambda: _litellm_generate(system_prompt, user_prompt, model, temperature,
+                                     json_mode=response_schema is not None)
+
+
 async def ai_generate(system_prompt: str, user_prompt: str,
                       temperature: Optional[float] = None,
-                      use_grounding: bool = False) -> str:
+                      use_grounding: bool = False,
+                      timeout: Optional[float] = None,
+                      validate: Optional[Callable[[str], bool]] = None,
+                      response_schema: Optional[type] = None) -> str:
     """
     Generate AI content for REPORTS (heavy analysis).
 
@@ -114,35 +861,80 @@ async def ai_generate(system_prompt: str, user_prompt: str,
         user_prompt: The user message
         temperature: Override default temperature
         use_grounding: Enable Google Search (Gemini only)
+        timeout: Override per-call timeout in seconds
+        validate: Rejects a response (e.g. unparseable JSON) so the next route is tried
+        response_schema: Pydantic model for structured output (Gemini response_schema when
+                         not grounded, LiteLLM JSON mode)
 
     Returns:
         Raw text response from the model
     """
     temp = temperature if temperature is not None else AI_TEMPERATURE
-    model = AI_MODEL
-
-    if AI_PROVIDER == "gemini":
-        return _gemini_generate(system_prompt, user_prompt, model, temp, use_grounding)
-    else:
-        return _litellm_generate(system_prompt, user_prompt, model, temp)
+    return await _route(
+        REPORT_ROUTES, "report", timeout or AI_TIMEOUT,
+        lambda route: _generate_call(route, system_prompt, user_prompt, route.model, temp, use_grounding,
+                                     response_schema),
+        validate,
+    )
 
 
 async def ai_generate_blog(system_prompt: str, user_prompt: str,
-                           temperature: Optional[float] = None) -> str:
+                           temperature: Optional[float] = None,
+                           timeout: Optional[float] = None) -> str:
     """
     Generate AI content for BLOG posts (light writing, no grounding).
 
     Args:
         system_prompt: The blog generation prompt
         user_prompt: Report JSON data to summarize
+        timeout: Override per-call timeout in seconds
 
     Returns:
         Raw text response from the model
     """
     temp = temperature if temperature is not None else 0.6  # slightly creative for blogs
-    model = AI_BLOG_MODEL
+    return await _route(
+        BLOG_ROUTES, "blog", timeout or AI_BLOG_TIMEOUT,
+        lambda route: _generate_call(route, system_prompt, user_prompt, route.model, temp, False),
+    )
 
-    if AI_PROVIDER == "gemini":
-        return _gemini_generate(system_prompt, user_prompt, model, temp, use_grounding=False)
-    else:
-        return _litellm_generate(system_prompt, user_prompt, model, temp)
+
+async def ai_generate_stream(system_prompt: str, user_prompt: str,
+                             temperature: Optional[float] = None,
+                             use_grounding: bool = False,
+                             timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Stream AI content for REPORTS chunk by chunk (same routes/settings as ai_generate).
+
+    Streams are not hedged (two half-streams can't be merged), but a route that fails
+    before producing its first chunk fails over to the next one.
+
+    Yields:
+        Raw text chunks as the model produces them (markdown fences NOT stripped)
+    """
+    temp = temperature if temperature is not None else AI_TEMPERATURE
+    routes = _available(REPORT_ROUTES)
+
+    for i, route in enumerate(routes):
+        if route.provider == "gemini":
+            stream = _gemini_stream(system_prompt, user_prompt, route.model, temp, use_grounding)
+        else:
+            stream = _litellm_stream(system_prompt, user_prompt, route.model, temp)
+        counters = _route_counters(route)
+        counters["primary" if i == 0 else "failovers_to"] += 1
+        started = time.monotonic()
+        yielded = False
+        try:
+            async for chunk in _dispatch_stream(route.provider, stream, timeout or AI_TIMEOUT):
+                yielded = True
+                yield chunk
+        except Exception as e:
+            counters["failures"] += 1
+            if yielded or i == len(routes) - 1:
+                raise
+            print(f"⚠️ AI route {route.name} stream failed before first chunk, failing over: {e}")
+            continue
+        _window(route, "report").add(time.monotonic() - started)
+        counters["wins"] += 1
+        _record_served(route.model)
+        return
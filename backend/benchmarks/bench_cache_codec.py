@@ -0,0 +1,142 @@
+"""
+Benchmark: cache codecs for report entries.
+
+Reports the encoded size, compression ratio vs. the old `json.dumps` text, and the
+per-entry encode/decode cost of every available codec.
+
+Usage (from backend/):
+    python benchmarks/bench_cache_codec.py                      # synthetic reports
+    python benchmarks/bench_cache_codec.py --samples reports/   # directory of report JSON files
+    python benchmarks/bench_cache_codec.py --train zstd.dict    # also train + save a zstd dictionary
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cache_codec  # noqa: E402
+
+WORDS = ("revenue growth margin guidance quarter debt cash flow valuation risk moat competitor "
+         "segment earnings estimate beat miss outlook demand pricing regulatory insider "
+         "institutional catalyst multiple premium discount headwind tailwind").split()
+
+
+def _sentence(rng, n=18):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def synthetic_report(rng: random.Random, ticker: str) -> dict:
+    """A report with the production schema's shape and realistic text volume."""
+    s = lambda n=18: _sentence(rng, n)  # noqa: E731
+    price = rng.uniform(5, 900)
+    return {
+        "meta": {
+            "ticker": ticker, "company_name": f"{ticker} Holdings Inc.", "sector": rng.choice(["Technology", "Healthcare", "Energy"]),
+            "current_price": f"${price:.2f}", "market_cap": f"${rng.uniform(1, 3000):.1f}B",
+            "trailing_pe": f"{rng.uniform(8, 80):.1f}", "forward_pe": f"{rng.uniform(8, 60):.1f}",
+            "fifty_two_week_range": f"${price * 0.7:.2f} - ${price * 1.2:.2f}", "avg_volume": f"{rng.uniform(1, 90):.1f}M",
+            "beta": f"{rng.uniform(0.5, 2.2):.2f}", "report_date": "2026-02-13", "data_freshness_note": s(12),
+        },
+        "step_1_know_what_you_own": {
+            "one_liner": s(14), "how_it_makes_money": s(45), "key_products_or_services": [s(6) for _ in range(4)],
+            "customer_type": s(10), "pass_fail": "YES - " + s(12),
+        },
+        "step_2_check_the_financials": {
+            **{k: s(10) for k in ("latest_quarter", "revenue_latest", "revenue_growth_yoy", "revenue_beat_miss", "eps_latest",
+                                  "eps_beat_miss", "net_income_latest", "gross_margin", "operating_margin_trend",
+                                  "free_cash_flow_latest", "cash_position")},
+            "profitable": True, "debt_level": "MODERATE", "financial_health_grade": "B",
+            "red_flags": [s(20) for _ in range(3)], "green_flags": [s(20) for _ in range(3)],
+            "revenue_breakdown": [{"segment": s(2), "percentage": rng.randint(5, 60), "revenue": f"${rng.uniform(1, 90):.1f}B"} for _ in range(4)],
+        },
+        "step_2a_earnings_and_guidance_review": {k: s(40) for k in (
+            "one_time_items", "segment_breakdown", "guidance_changes", "management_tone", "analyst_reaction", "forward_statements_note")},
+        "step_3_understand_the_story": {
+            "bull_case": s(45), "base_case": s(45), "bear_case": s(45),
+            "what_must_go_right": [s(12) for _ in range(3)], "what_could_break_the_story": [s(12) for _ in range(3)],
+            "macro_overlay": s(35), "catalyst_timeline": [s(15), s(15)],
+        },
+        "step_4_know_the_risks": {
+            "top_risks": [{"risk": s(5), "severity": "HIGH", "likelihood": "MEDIUM", "explanation": s(30)} for _ in range(4)],
+            "ownership_signals": s(30), "regulatory_exposure": s(30), "concentration_risk": s(25),
+        },
+        "step_5_check_the_competition": {
+            "main_competitors": [{"name": s(2), "why_compete": s(15), "their_advantage": s(15)} for _ in range(3)],
+            "moat_strength": "MODERATE", "moat_explanation": s(40),
+        },
+        "step_6_valuation_reality_check": {k: s(25) for k in (
+            "current_pe", "forward_pe", "sector_or_peer_avg_pe", "price_to_sales", "ev_ebitda_if_relevant",
+            "simple_dcf_implied_value", "is_it_expensive", "valuation_context", "base_case_target",
+            "bull_case_target", "bear_case_target")},
+        "step_7_verdict": {k: s(15) for k in (
+            "action", "confidence", "one_line_reason", "what_signal_would_change_this",
+            "most_important_metric_to_track", "suggested_revisit_date")},
+        "investor_gut_check": {f"question_{i}": s(25) for i in range(1, 6)} | {"mindset_reminder": s(15)},
+    }
+
+
+def load_samples(path: str):
+    return [json.loads(p.read_text()) for p in sorted(Path(path).glob("*.json"))]
+
+
+def bench(codec, reports, rounds: int):
+    blobs = [codec.encode(r, time.time()) for r in reports]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for r in reports:
+            codec.encode(r, 0.0)
+    encode_us = (time.perf_counter() - start) / (rounds * len(reports)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for b in blobs:
+            cache_codec.loads(codec.decompress(b[cache_codec.HEADER_SIZE:]))
+    decode_us = (time.perf_counter() - start) / (rounds * len(reports)) * 1e6
+    return sum(len(b) for b in blobs) / len(blobs), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", help="Directory of report JSON files")
+    parser.add_argument("--count", type=int, default=200, help="Synthetic reports to generate")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--train", help="Train a zstd dictionary from the samples and write it here")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    reports = load_samples(args.samples) if args.samples else [
+        synthetic_report(rng, f"T{i:03d}") for i in range(args.count)]
+
+    # Hold out a quarter of the reports so the dictionary is measured on unseen data
+    split = max(1, len(reports) * 3 // 4)
+    train_set, test_set = reports[:split], reports[split:] or reports
+
+    baseline = sum(len(json.dumps({"ts": 0.0, "data": r})) for r in test_set) / len(test_set)
+
+    codecs = [cache_codec.Codec(), cache_codec.ZlibCodec(6), cache_codec.ZlibCodec(9)]
+    if cache_codec.zstandard is not None:
+        codecs += [cache_codec.ZstdCodec(3), cache_codec.ZstdCodec(9)]
+        dict_data = cache_codec.train_dictionary(train_set)
+        codecs += [cache_codec.ZstdCodec(3, dict_data)]
+        if args.train:
+            Path(args.train).write_bytes(dict_data)
+            print(f"Wrote {len(dict_data)} byte dictionary to {args.train}")
+    else:
+        print("(zstandard not installed — zstd codecs skipped)")
+
+    print(f"{len(test_set)} reports, json: {'orjson' if cache_codec.orjson else 'stdlib'}, "
+          f"baseline json.dumps text: {baseline:,.0f} B/entry\n")
+    print(f"{'codec':<14}{'bytes/entry':>12}{'ratio':>8}{'encode µs':>11}{'decode µs':>11}")
+    for codec in codecs:
+        size, enc, dec = bench(codec, test_set, args.rounds)
+        label = codec.name + (f"-{codec.level}" if hasattr(codec, "level") else "")
+        print(f"{label:<14}{size:>12,.0f}{baseline / size:>7.1f}x{enc:>11.1f}{dec:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: bulk quote engines.
+
+Compares the per-ticker loop (`fetch_quotes`: one fast_info lookup per symbol) with the
+vectorized engine (`fetch_quotes_batch`: one bulk download, NumPy column math) on wall time
+and the number of HTTP requests sent upstream. Hits Yahoo for real — run it sparingly.
+
+Usage (from backend/):
+    python benchmarks/bench_quotes.py                        # 10, 100 and 500 symbols
+    python benchmarks/bench_quotes.py --sizes 10,50 --rounds 3
+    python benchmarks/bench_quotes.py --symbols-file my_tickers.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from market_data import fetch_quotes, fetch_quotes_batch  # noqa: E402
+
+try:
+    from curl_cffi import requests as http  # what recent yfinance versions require
+    SESSION_ARGS = {"impersonate": "chrome"}
+except ImportError:
+    import requests as http
+    SESSION_ARGS = {}
+
+DEFAULT_SYMBOLS_FILE = Path(__file__).resolve().parent.parent.parent / "frontend" / "src" / "data" / "tickers.json"
+
+
+class RequestCounter:
+    """Counts HTTP requests made through a session (nested get → request calls count once)."""
+
+    def __init__(self, session):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        for name in ("request", "get", "post"):
+            setattr(session, name, self._wrap(getattr(session, name)))
+
+    def _wrap(self, fn):
+        def counted(*args, **kwargs):
+            depth = getattr(self._local, "depth", 0)
+            if depth == 0:
+                with self._lock:
+                    self.count += 1
+            self._local.depth = depth + 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.depth = depth
+        return counted
+
+
+def load_symbols(path: Path):
+    data = json.loads(path.read_text())
+    return list(dict.fromkeys((d["t"] if isinstance(d, dict) else d).upper() for d in data))
+
+
+def run(engine, symbols):
+    """(seconds, upstream requests, symbols with a price) for one fresh-session fetch."""
+    session = http.Session(**SESSION_ARGS)
+    counter = RequestCounter(session)
+    start = time.perf_counter()
+    quotes = engine(symbols, session=session)
+    elapsed = time.perf_counter() - start
+    priced = sum(1 for q in quotes.values() if q and q.get("price"))
+    return elapsed, counter.count, priced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,500", help="Comma-separated symbol counts")
+    parser.add_argument("--rounds", type=int, default=1, help="Runs per engine and size (best time is kept)")
+    parser.add_argument("--symbols-file", default=str(DEFAULT_SYMBOLS_FILE),
+                        help="JSON list of tickers (strings or {\"t\": ...} objects)")
+    args = parser.parse_args()
+
+    universe = load_symbols(Path(args.symbols_file))
+    engines = [("per-ticker loop", fetch_quotes), ("vectorized batch", fetch_quotes_batch)]
+
+    print(f"{len(universe)} symbols available from {args.symbols_file}\n")
+    print(f"{'symbols':>8}  {'engine':<18}{'wall s':>9}{'requests':>10}{'priced':>8}{'speedup':>9}")
+    for size in (int(n) for n in args.sizes.split(",")):
+        symbols = universe[:size]
+        if len(symbols) < size:
+            print(f"(only {len(symbols)} symbols available for the {size} run)")
+        baseline = None
+        for label, engine in engines:
+            results = [run(engine, symbols) for _ in range(args.rounds)]
+            elapsed, requests, priced = min(results)
+            if baseline is None:
+                baseline = elapsed
+            speedup = baseline / elapsed if elapsed else float("inf")
+            print(f"{len(symbols):>8}  {label:<18}{elapsed:>9.2f}{requests:>10}{priced:>8}{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
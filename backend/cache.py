@@ -0,0 +1,325 @@
+"""
+Stock Fortress — Tiered Report Cache
+=====================================
+L1: bounded, in-process LRU (entry- and byte-capped, TTL-aware eviction)
+L2: Redis (shared by every worker/replica)
+
+Both tiers hold codec-encoded bytes (see cache_codec.py), decoded only when the data is
+actually needed. Reads go L1 → L2; an L2 hit is promoted into L1 so the next read skips
+the Redis round trip. L1 entries live at most CACHE_L1_TTL_SECONDS so each worker
+periodically re-reads L2 and picks up reports refreshed by other workers.
+
+Redis is accessed through redis.asyncio on one explicitly sized connection pool, so a slow
+Redis never blocks the event loop. Other modules share it via `get_redis()`.
+
+Configuration via .env:
+    REDIS_URL=redis://...
+    REDIS_POOL_SIZE=20             # Max pooled connections per worker
+    REDIS_SOCKET_TIMEOUT=5         # Seconds per Redis operation
+    REPORT_HARD_TTL_HOURS=24       # Entry lifetime (Redis TTL)
+    CACHE_L1_MAX_ENTRIES=512       # L1 entry cap
+    CACHE_L1_MAX_MB=64             # L1 byte cap (encoded size)
+    CACHE_L1_TTL_SECONDS=300       # Max time an entry stays in L1 before re-reading L2
+    CACHE_BODY_MAX_MB=32           # Pre-serialized JSON bodies kept for hot entries
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+import cache_codec as codec
+
+CACHE_TTL = timedelta(hours=float(os.environ.get("REPORT_HARD_TTL_HOURS", "24")))
+L1_MAX_ENTRIES = int(os.environ.get("CACHE_L1_MAX_ENTRIES", "512"))
+L1_MAX_BYTES = int(float(os.environ.get("CACHE_L1_MAX_MB", "64")) * 1024 * 1024)
+L1_TTL = float(os.environ.get("CACHE_L1_TTL_SECONDS", "300"))
+BODY_MAX_BYTES = int(float(os.environ.get("CACHE_BODY_MAX_MB", "32")) * 1024 * 1024)
+
+REDIS_POOL_SIZE = int(os.environ.get("REDIS_POOL_SIZE", "20"))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "5"))
+
+# Redis Connection (async, pooled — shared by every module that needs Redis)
+REDIS_URL = os.environ.get("REDIS_URL", "")
+redis_pool = None
+redis_client = None
+if REDIS_URL and "YOUR_PASSWORD_HERE" not in REDIS_URL:
+    try:
+        redis_pool = aioredis.ConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_POOL_SIZE,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+            decode_responses=False,  # entries are codec-framed bytes
+        )
+        redis_client = aioredis.Redis(connection_pool=redis_pool)
+        print(f"✅ Redis client initialized (async pool, max {REDIS_POOL_SIZE} connections)")
+    except Exception as e:
+        print(f"⚠️ Redis init failed: {e}")
+
+
+def get_redis():
+    """The shared async Redis client (None when Redis isn't configured)."""
+    return redis_client
+
+
+async def close_redis():
+    if redis_client is not None:
+        await redis_client.aclose()
+
+
+class LRUCache:
+    """In-process LRU bounded by entry count AND total bytes, with per-entry expiry."""
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_bytes: int = L1_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (blob, ts, expires_at, size)
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Return (value, ts) and mark the entry most-recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        if entry[2] <= time.time():
+            self._remove(key)
+            self.counters["expirations"] += 1
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return entry[0], entry[1]
+
+    def set(self, key: str, value: Any, ts: float, expires_at: float, size: int):
+        if size > self.max_bytes:
+            return  # would evict everything else — not worth holding
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, ts, expires_at, size)
+        self.bytes += size
+        if len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._evict()
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        self.bytes -= self._entries.pop(key)[3]
+
+    def _evict(self):
+        # Expired entries go first, wherever they sit in the LRU order...
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if e[2] <= now]:
+            self._remove(key)
+            self.counters["expirations"] += 1
+        # ...then least-recently-used until we're back under both caps
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self.counters,
+        }
+
+
+l1 = LRUCache()
+# Decompressed JSON + ETag per hot entry, so a cache hit can be served as raw bytes
+bodies = LRUCache(max_entries=L1_MAX_ENTRIES, max_bytes=BODY_MAX_BYTES)
+_l2_counters = {"hits": 0, "misses": 0, "errors": 0, "bytes_read": 0, "bytes_written": 0}
+
+
+async def get_cache(key: str) -> Optional[dict]:
+    entry = await get_cache_entry(key)
+    return entry[0] if entry else None
+
+
+async def get_cache_entry(key: str, shared: bool = False) -> Optional[tuple]:
+    """
+    Return (data, age_seconds) for anything younger than the hard TTL.
+
+    shared=True skips this process's L1 copy and reads Redis, for decisions that must see
+    what other workers wrote (e.g. "has this stale report been refreshed already?").
+    """
+    if shared and redis_client:
+        l1.delete(key)
+    return (await get_cache_entries([key]))[0]
+
+
+async def get_cache_entries(keys: List[str]) -> List[Optional[tuple]]:
+    """
+    Batch form of get_cache_entry: L1 first, then ONE pipelined Redis round trip for
+    every key L1 didn't have.
+    """
+    now = time.time()
+    results: List[Optional[tuple]] = []
+    for key, hit in zip(keys, await get_cache_blobs(keys)):
+        if hit is None:
+            results.append(None)
+            continue
+        blob, ts = hit
+        try:
+            results.append((codec.decode(blob), now - ts))
+        except Exception as e:
+            print(f"⚠️ Cache entry {key} undecodable: {e}")
+            l1.delete(key)
+            results.append(None)
+    return results
+
+
+async def get_cache_body(key: str) -> Optional[tuple]:
+    """
+    (json_bytes, etag, age_seconds) for a cached entry — the data exactly as it should go
+    on the wire, never parsed. Hot entries skip even the decompression.
+    """
+    hit = (await get_cache_blobs([key]))[0]
+    if hit is None:
+        return None
+    blob, ts = hit
+    # Entries can be rewritten in place (same ts) by live patches, so the memo is keyed
+    # on the blob's checksum rather than its timestamp
+    stamp = zlib.crc32(blob)
+    memo = bodies.get(key)
+    if memo and memo[1] == stamp:
+        body, etag = memo[0]
+    else:
+        try:
+            body = codec.decode_json(blob)
+        except Exception as e:
+            print(f"⚠️ Cache entry {key} undecodable: {e}")
+            l1.delete(key)
+            return None
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        bodies.set(key, (body, etag), stamp, time.time() + L1_TTL, len(body))
+    return body, etag, time.time() - ts
+
+
+async def get_cache_blobs(keys: List[str]) -> List[Optional[tuple]]:
+    """(encoded blob, ts) per key — entries stay encoded until someone needs the data."""
+    results: List[Optional[tuple]] = [None] * len(keys)
+    pending: Dict[str, List[int]] = {}
+
+    # 1. L1 (in-process)
+    for i, key in enumerate(keys):
+        hit = l1.get(key)
+        if hit:
+            results[i] = hit
+        else:
+            pending.setdefault(key, []).append(i)
+
+    # 2. L2 (Redis) — GET + TTL per key in one pipeline; promote hits into L1
+    if pending and redis_client:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in pending:
+                    pipe.get(key)
+                    pipe.ttl(key)
+                replies = await pipe.execute()
+        except Exception as e:
+            _l2_counters["errors"] += 1
+            print(f"⚠️ Redis read error: {e}")
+            return results
+
+        for n, (key, slots) in enumerate(pending.items()):
+            raw, remaining = replies[2 * n], replies[2 * n + 1]
+            if not raw:
+                _l2_counters["misses"] += 1
+                continue
+            _l2_counters["hits"] += 1
+            _l2_counters["bytes_read"] += len(raw)
+            if codec.is_framed(raw):
+                blob, ts = raw, codec.read_timestamp(raw)
+            else:
+                blob, ts = _upgrade_legacy(key, raw, remaining)
+                if blob is None:
+                    continue
+            _promote(key, blob, ts)
+            for i in slots:
+                results[i] = (blob, ts)
+    return results
+
+
+def _upgrade_legacy(key: str, raw: bytes, remaining: Optional[int]) -> tuple:
+    """Re-encode an entry written as JSON text by older code."""
+    try:
+        stored = json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️ Redis entry {key} unreadable: {e}")
+        return None, None
+    if isinstance(stored, dict) and "ts" in stored and "data" in stored:
+        data, ts = stored["data"], stored["ts"]
+    else:
+        # Bare report — infer its age from the remaining TTL
+        age = CACHE_TTL.total_seconds() - remaining if remaining and remaining > 0 else CACHE_TTL.total_seconds()
+        data, ts = stored, time.time() - age
+    return codec.get_codec().encode(data, ts), ts
+
+
+async def set_cache(key: str, data: dict, ts: Optional[float] = None):
+    await set_cache_many({key: data}, {key: ts} if ts else None)
+
+
+async def set_cache_many(items: Dict[str, dict], timestamps: Optional[Dict[str, float]] = None):
+    """
+    Write several entries to both tiers — one pipelined Redis round trip.
+
+    `timestamps` backdates entries restored from elsewhere (e.g. the report store) so
+    they keep their real age; anything already past the hard TTL is skipped.
+    """
+    now = time.time()
+    encoder = codec.get_codec()
+    stamps = {key: (timestamps or {}).get(key) or now for key in items}
+    ttls = {key: int(CACHE_TTL.total_seconds() - (now - ts)) for key, ts in stamps.items()}
+    blobs = {key: encoder.encode(data, stamps[key]) for key, data in items.items() if ttls[key] > 0}
+    # 1. Redis (shared)
+    if redis_client and blobs:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, blob in blobs.items():
+                    pipe.setex(key, ttls[key], blob)
+                await pipe.execute()
+            _l2_counters["bytes_written"] += sum(len(b) for b in blobs.values())
+        except Exception as e:
+            _l2_counters["errors"] += 1
+            print(f"⚠️ Redis write error: {e}")
+
+    # 2. Always write to L1 (also the only tier when Redis is down)
+    for key, blob in blobs.items():
+        _promote(key, blob, stamps[key])
+
+
+def _promote(key: str, blob: bytes, ts: float):
+    hard_expiry = ts + CACHE_TTL.total_seconds()
+    # Without Redis, L1 is the only copy — keep it for the full TTL
+    expires_at = min(hard_expiry, time.time() + L1_TTL) if redis_client else hard_expiry
+    l1.set(key, blob, ts, expires_at, len(blob))
+
+
+def cache_stats() -> dict:
+    l2 = {"enabled": bool(redis_client), **_l2_counters}
+    if redis_pool is not None:
+        l2["pool"] = {
+            "max_connections": REDIS_POOL_SIZE,
+            "in_use": len(getattr(redis_pool, "_in_use_connections", ())),
+            "idle": len(getattr(redis_pool, "_available_connections", ())),
+        }
+    return {"codec": codec.get_codec().name, "l1": l1.stats(), "bodies": bodies.stats(), "l2": l2}
@@ -0,0 +1,196 @@
+"""
+Stock Fortress — Cache Codecs
+==============================
+Compact binary encoding for cached reports: a fast JSON encoder (orjson when installed)
+plus zstd (optionally with a shared dictionary trained on report JSON) or zlib compression.
+
+Every encoded value is framed as:
+
+    [1 byte codec tag][8 byte float64 timestamp][payload]
+
+so the cache can read an entry's age without decoding it, and entries written by any codec
+(or by older code as plain JSON text) stay readable during a rollout.
+
+Usage:
+    codec = get_codec()                  # from CACHE_CODEC
+    blob = codec.encode(report, ts)
+    ts = read_timestamp(blob)
+    report = decode(blob)                # whichever codec wrote it
+
+Configuration via .env:
+    CACHE_CODEC=zstd                # zstd | zlib | json (zstd falls back to zlib if not installed)
+    CACHE_COMPRESSION_LEVEL=3       # zstd 1-22 / zlib 1-9
+    CACHE_ZSTD_DICT=/path/to/dict   # Optional dictionary (see benchmarks/bench_cache_codec.py --train)
+"""
+
+import os
+import json
+import zlib
+import struct
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CACHE_CODEC = os.environ.get("CACHE_CODEC", "zstd").lower()
+CACHE_COMPRESSION_LEVEL = int(os.environ.get("CACHE_COMPRESSION_LEVEL", "3"))
+CACHE_ZSTD_DICT = os.environ.get("CACHE_ZSTD_DICT", "")
+
+_HEADER = struct.Struct("<Bd")  # tag, timestamp
+HEADER_SIZE = _HEADER.size
+
+TAG_JSON = 1
+TAG_ZLIB = 2
+TAG_ZSTD = 3
+TAG_ZSTD_DICT = 4
+
+
+# ─── JSON ───
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# ─── CODECS ───
+
+class Codec:
+    """Plain JSON bytes, no compression."""
+
+    name = "json"
+    tag = TAG_JSON
+
+    def encode(self, obj: Any, ts: float) -> bytes:
+        return _HEADER.pack(self.tag, ts) + self.compress(dumps(obj))
+
+    def compress(self, raw: bytes) -> bytes:
+        return raw
+
+    def decompress(self, payload: bytes) -> bytes:
+        return payload
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    tag = TAG_ZLIB
+
+    def __init__(self, level: int = 6):
+        self.level = max(1, min(level, 9))
+
+    def compress(self, raw: bytes) -> bytes:
+        return zlib.compress(raw, self.level)
+
+    def decompress(self, payload: bytes) -> bytes:
+        return zlib.decompress(payload)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    tag = TAG_ZSTD
+
+    def __init__(self, level: int = 3, dict_data: Optional[bytes] = None):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        self.level = level
+        self.dictionary = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+        if self.dictionary is not None:
+            self.name = "zstd+dict"
+            self.tag = TAG_ZSTD_DICT
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+
+    def compress(self, raw: bytes) -> bytes:
+        return self._compressor.compress(raw)
+
+    def decompress(self, payload: bytes) -> bytes:
+        return self._decompressor.decompress(payload)
+
+
+def train_dictionary(samples: List[Any], size: int = 32 * 1024) -> bytes:
+    """Train a zstd dictionary from sample reports (dicts or JSON bytes)."""
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    raw = [s if isinstance(s, bytes) else dumps(s) for s in samples]
+    return zstandard.train_dictionary(size, raw).as_bytes()
+
+
+# ─── REGISTRY ───
+
+_codecs: Dict[int, Codec] = {}
+_active: Optional[Codec] = None
+
+
+def _load_dictionary() -> Optional[bytes]:
+    if not CACHE_ZSTD_DICT:
+        return None
+    try:
+        with open(CACHE_ZSTD_DICT, "rb") as f:
+            return f.read()
+    except OSError as e:
+        print(f"⚠️ Cache: zstd dictionary unavailable ({e}), compressing without it")
+        return None
+
+
+def _build_codecs():
+    global _active
+    _codecs[TAG_JSON] = Codec()
+    _codecs[TAG_ZLIB] = ZlibCodec(CACHE_COMPRESSION_LEVEL)
+    if zstandard is not None:
+        _codecs[TAG_ZSTD] = ZstdCodec(CACHE_COMPRESSION_LEVEL)
+        dict_data = _load_dictionary()
+        if dict_data:
+            _codecs[TAG_ZSTD_DICT] = ZstdCodec(CACHE_COMPRESSION_LEVEL, dict_data)
+
+    if CACHE_CODEC == "json":
+        _active = _codecs[TAG_JSON]
+    elif CACHE_CODEC == "zlib" or zstandard is None:
+        if CACHE_CODEC == "zstd":
+            print("⚠️ Cache: zstandard not installed, using zlib")
+        _active = _codecs[TAG_ZLIB]
+    else:
+        _active = _codecs.get(TAG_ZSTD_DICT) or _codecs[TAG_ZSTD]
+    print(f"✅ Cache codec: {_active.name} (json: {'orjson' if orjson else 'stdlib'})")
+
+
+def get_codec() -> Codec:
+    """The codec new entries are written with."""
+    return _active
+
+
+def is_framed(blob: bytes) -> bool:
+    return bool(blob) and blob[0] in _codecs
+
+
+def read_timestamp(blob: bytes) -> float:
+    return _HEADER.unpack_from(blob)[1]
+
+
+def decode_json(blob: bytes) -> bytes:
+    """The entry's raw JSON bytes (decompressed, not parsed)."""
+    codec = _codecs.get(blob[0])
+    if codec is None:
+        raise ValueError(f"Unknown cache codec tag {blob[0]}")
+    return codec.decompress(blob[HEADER_SIZE:])
+
+
+def decode(blob: bytes) -> Any:
+    """Decode an entry written by any registered codec."""
+    return loads(decode_json(blob))
+
+
+_build_codecs()
@@ -0,0 +1,613 @@
+"""
+Stock Fortress — Priority Job Queue
+====================================
+Admission control for LLM work. Generation requests become jobs that are claimed in
+priority order (plan tier first, then FIFO), deduplicated per key, and capped by ONE
+global concurrency limit shared by every consumer.
+
+  • local (default) — SQLite file; survives restarts, shared by processes on one machine
+  • redis           — sorted sets + hashes on the shared Redis; for multiple replicas
+
+Priority comes from the plan tiers in stripe_billing.PLAN_REPORTS (premium > pro > free),
+resolved from the caller's Supabase access token. A job submitted for a key that is
+already queued or running returns the existing job (upgraded to the higher priority).
+
+Usage:
+    job, created = await queue.submit("report", "AAPL", {"ticker": "AAPL"}, plan="pro")
+    runner = JobRunner(queue, {"report": run_report_job})
+    runner.start()
+    await queue.get(job["id"])       # {"status": "queued" | "running" | "done" | "failed", ...}
+
+Configuration via .env:
+    JOB_QUEUE_BACKEND=local          # local | redis
+    JOB_QUEUE_PATH=data/jobs.db      # SQLite file for the local backend (relative to backend/)
+    JOB_CONCURRENCY=3                # Max jobs running at once, across ALL consumers
+    JOB_RUN_IN_WEB=1                 # Also run jobs inside the web process (0 once worker.py is deployed)
+    JOB_LEASE_SECONDS=600            # A running job whose consumer stops renewing its lease for this
+                                     # long is requeued (crashed consumer); live runs renew every 1/3
+    JOB_RESULT_TTL_SECONDS=3600      # How long finished jobs stay pollable
+    JOB_POLL_INTERVAL=0.5            # Seconds between claim attempts when idle
+    JOB_PLAN_CACHE_SECONDS=300       # How long a token → plan lookup is reused
+    JOB_PLAN_CACHE_SIZE=10000        # Most token → plan lookups kept (least recently used dropped)
+    JOB_MAX_ATTEMPTS=3               # Tries per job before it is marked failed
+    JOB_RETRY_BACKOFF_SECONDS=30     # First retry delay; doubles per attempt (with jitter)
+    JOB_RETRY_BACKOFF_MAX_SECONDS=600
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Header
+
+from prewarm import require_admin
+
+try:
+    from stripe_billing import PLAN_REPORTS
+except ImportError:
+    PLAN_REPORTS = {"free": 3, "pro": 30, "premium": 999999}
+
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "local").lower()
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "data/jobs.db")
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "3"))
+JOB_RUN_IN_WEB = os.environ.get("JOB_RUN_IN_WEB", "1") == "1"
+JOB_LEASE = float(os.environ.get("JOB_LEASE_SECONDS", "600"))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "0.5"))
+JOB_PLAN_CACHE = float(os.environ.get("JOB_PLAN_CACHE_SECONDS", "300"))
+JOB_PLAN_CACHE_SIZE = int(os.environ.get("JOB_PLAN_CACHE_SIZE", "10000"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.environ.get("JOB_RETRY_BACKOFF_SECONDS", "30"))
+JOB_RETRY_BACKOFF_MAX = float(os.environ.get("JOB_RETRY_BACKOFF_MAX_SECONDS", "600"))
+
+# Bigger report allowance = higher priority: free 0, pro 1, premium 2
+PLAN_PRIORITY = {plan: rank for rank, plan in enumerate(sorted(PLAN_REPORTS, key=PLAN_REPORTS.get))}
+DEFAULT_PLAN = min(PLAN_REPORTS, key=PLAN_REPORTS.get)
+
+def plan_priority(plan: Optional[str]) -> int:
+    return PLAN_PRIORITY.get(plan or DEFAULT_PLAN, 0)
+
+
+def _new_job(kind: str, key: str, payload: dict, plan: str, now: float) -> dict:
+    return {
+        "id": uuid.uuid4().hex, "kind": kind, "key": key, "payload": payload,
+        "plan": plan, "priority": plan_priority(plan), "status": "queued", "attempts": 0,
+        "created_at": now, "available_at": now, "started_at": None, "finished_at": None,
+        "error": None,
+    }
+
+
+# ─── LOCAL (SQLITE) ───
+
+class LocalJobQueue:
+    """Jobs in a local SQLite file. Claims run in an IMMEDIATE transaction, so separate
+    processes on the same machine (web + worker) share one queue and one limit."""
+
+    name = "local"
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self.path = Path(path)
+        if not self.path.is_absolute():
+            self.path = Path(__file__).parent / self.path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    error TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (kind, key, status)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _transaction(self, fn):
+        def run():
+            db = self._connect()
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                result = fn(db)
+                db.execute("COMMIT")
+                return result
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            finally:
+                db.close()
+        return asyncio.to_thread(run)
+
+    @staticmethod
+    def _row(row) -> dict:
+        job = dict(zip(("id", "kind", "key", "payload", "plan", "priority", "status", "attempts",
+                        "created_at", "available_at", "started_at", "finished_at", "error"), row))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    async def submit(self, kind: str, key: str, payload: dict, plan: str = DEFAULT_PLAN) -> Tuple[dict, bool]:
+        """(job, created). An active job for the same key is returned instead of a new one."""
+        def insert(db):
+            now = time.time()
+            row = db.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND key = ? AND status IN ('queued', 'running') LIMIT 1",
+                (kind, key),
+            ).fetchone()
+            if row:
+                job = self._row(row)
+                if job["status"] == "queued" and plan_priority(plan) > job["priority"]:
+                    job["plan"], job["priority"] = plan, plan_priority(plan)
+                    db.execute("UPDATE jobs SET plan = ?, priority = ? WHERE id = ?",
+                               (job["plan"], job["priority"], job["id"]))
+                return job, False
+            job = _new_job(kind, key, payload, plan, now)
+            db.execute(
+                "INSERT INTO jobs (id, kind, key, payload, plan, priority, status, attempts, created_at, "
+                "available_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', 0, ?, ?)",
+                (job["id"], kind, key, json.dumps(payload), plan, job["priority"], now, now),
+            )
+            return job, True
+
+        return await self._transaction(insert)
+
+    async def claim(self) -> Optional[dict]:
+        """Highest-priority due job, if fewer than `concurrency` jobs are running anywhere."""
+        def take(db):
+            now = time.time()
+            # While running, available_at is the lease expiry. Requeue jobs whose consumer
+            # stopped renewing (died mid-run), and drop long-finished ones
+            db.execute("UPDATE jobs SET status = 'queued', available_at = ? "
+                       "WHERE status = 'running' AND available_at < ?", (now, now))
+            db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                       (now - JOB_RESULT_TTL,))
+            running = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+            if running >= self.concurrency:
+                return None
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY priority DESC, created_at LIMIT 1", (now,),
+            ).fetchone()
+            if not row:
+                return None
+            job = self._row(row)
+            job.update(status="running", attempts=job["attempts"] + 1, started_at=now)
+            db.execute("UPDATE jobs SET status = 'running', attempts = ?, started_at = ?, available_at = ? "
+                       "WHERE id = ?", (job["attempts"], now, now + JOB_LEASE, job["id"]))
+            return job
+
+        return await self._transaction(take)
+
+    async def renew(self, job: dict) -> bool:
+        """Extend the lease of a job we're running; False if it was requeued meanwhile."""
+        def update(db):
+            return db.execute("UPDATE jobs SET available_at = ? WHERE id = ? AND status = 'running' "
+                              "AND attempts = ?", (time.time() + JOB_LEASE, job["id"], job["attempts"])).rowcount
+
+        return bool(await self._transaction(update))
+
+    async def finish(self, job_id: str, error: Optional[str] = None, retry_at: Optional[float] = None):
+        """Mark done, failed, or (with retry_at) back in the queue from that time on."""
+        def update(db):
+            if retry_at is not None:
+                db.execute("UPDATE jobs SET status = 'queued', available_at = ?, error = ? WHERE id = ?",
+                           (retry_at, error, job_id))
+            else:
+                db.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                           ("failed" if error else "done", time.time(), error, job_id))
+
+        await self._transaction(update)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        def query():
+            with self._connect() as db:
+                return db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        row = await asyncio.to_thread(query)
+        return self._row(row) if row else None
+
+    async def position(self, job: dict) -> Optional[int]:
+        """Queued jobs that will be claimed before this one; None if it isn't queued."""
+        if job["status"] != "queued":
+            return None
+
+        def query():
+            with self._connect() as db:
+                return db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority > ? OR (priority = ? AND created_at < ?))",
+                    (job["priority"], job["priority"], job["created_at"]),
+                ).fetchone()[0]
+
+        return await asyncio.to_thread(query)
+
+    async def depth(self) -> dict:
+        def query():
+            with self._connect() as db:
+                return db.execute("SELECT status, plan, COUNT(*) FROM jobs WHERE status IN "
+                                  "('queued', 'running') GROUP BY status, plan").fetchall()
+
+        rows = await asyncio.to_thread(query)
+        queued = {plan: 0 for plan in PLAN_PRIORITY}
+        running = 0
+        for status, plan, count in rows:
+            if status == "queued":
+                queued[plan] = queued.get(plan, 0) + count
+            else:
+                running += count
+        return {"queued": queued, "running": running}
+
+
+# ─── REDIS ───
+
+# Queue score: higher priority first, then FIFO by enqueue time
+_PRIORITY_BAND = 1e10
+
+_SUBMIT_SCRIPT = """
+local existing = redis.call("get", KEYS[1])
+if existing and redis.call("exists", ARGV[1] .. existing) == 1 then
+    local status = redis.call("hget", ARGV[1] .. existing, "status")
+    if status == "queued" or status == "running" then
+        local priority = tonumber(redis.call("hget", ARGV[1] .. existing, "priority"))
+        if status == "queued" and tonumber(ARGV[4]) > priority then
+            local created = tonumber(redis.call("hget", ARGV[1] .. existing, "created_at"))
+            redis.call("hset", ARGV[1] .. existing, "priority", ARGV[4], "plan", ARGV[5])
+            if redis.call("zscore", KEYS[2], existing) then
+                redis.call("zadd", KEYS[2], (tonumber(ARGV[6]) - tonumber(ARGV[4])) * tonumber(ARGV[7]) + created, existing)
+            end
+        end
+        return {existing, 0}
+    end
+end
+redis.call("hset", ARGV[1] .. ARGV[2], unpack(cjson.decode(ARGV[3])))
+redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[9])
+redis.call("zadd", KEYS[2], (tonumber(ARGV[6]) - tonumber(ARGV[4])) * tonumber(ARGV[7]) + tonumber(ARGV[8]), ARGV[2])
+return {ARGV[2], 1}
+"""
+
+# KEYS: queued, running, delayed   ARGV: job prefix, now, lease, limit, max priority, band
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[2])
+for _, id in ipairs(redis.call("zrangebyscore", KEYS[3], "-inf", now)) do
+    redis.call("zrem", KEYS[3], id)
+    local priority = tonumber(redis.call("hget", ARGV[1] .. id, "priority") or 0)
+    redis.call("zadd", KEYS[1], (tonumber(ARGV[5]) - priority) * tonumber(ARGV[6]) + now, id)
+end
+for _, id in ipairs(redis.call("zrangebyscore", KEYS[2], "-inf", now)) do
+    redis.call("zrem", KEYS[2], id)
+    redis.call("hset", ARGV[1] .. id, "status", "queued")
+    local priority = tonumber(redis.call("hget", ARGV[1] .. id, "priority") or 0)
+    redis.call("zadd", KEYS[1], (tonumber(ARGV[5]) - priority) * tonumber(ARGV[6]) + now, id)
+end
+if redis.call("zcard", KEYS[2]) >= tonumber(ARGV[4]) then
+    return nil
+end
+local popped = redis.call("zpopmin", KEYS[1])
+if #popped == 0 then
+    return nil
+end
+local id = popped[1]
+redis.call("zadd", KEYS[2], now + tonumber(ARGV[3]), id)
+redis.call("hset", ARGV[1] .. id, "status", "running", "started_at", ARGV[2])
+redis.call("hincrby", ARGV[1] .. id, "attempts", 1)
+return id
+"""
+
+
+class RedisJobQueue:
+    """Jobs on the shared Redis, so every replica and worker drains one queue under one limit."""
+
+    name = "redis"
+    prefix = "jobs:"
+
+    def __init__(self, redis_client, concurrency: int = JOB_CONCURRENCY):
+        self.redis = redis_client
+        self.concurrency = concurrency
+        self._queued = self.prefix + "queued"
+        self._running = self.prefix + "running"
+        self._delayed = self.prefix + "delayed"
+        self._job = self.prefix + "job:"
+        self._submit = redis_client.register_script(_SUBMIT_SCRIPT)
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+
+    @staticmethod
+    def _decode(raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        job = {k.decode(): v.decode() for k, v in raw.items()}
+        job["payload"] = json.loads(job["payload"])
+        job["priority"] = int(job["priority"])
+        job["attempts"] = int(job.get("attempts", 0))
+        for field in ("created_at", "available_at", "started_at", "finished_at"):
+            job[field] = float(job[field]) if job.get(field) else None
+        job["error"] = job.get("error") or None
+        return job
+
+    async def submit(self, kind: str, key: str, payload: dict, plan: str = DEFAULT_PLAN) -> Tuple[dict, bool]:
+        now = time.time()
+        job = _new_job(kind, key, payload, plan, now)
+        fields = {k: (json.dumps(v) if k == "payload" else v) for k, v in job.items() if v is not None}
+        flat = [str(x) for pair in fields.items() for x in pair]
+        job_id, created = await self._submit(
+            keys=[f"{self.prefix}key:{kind}:{key}", self._queued],
+            args=[self._job, job["id"], json.dumps(flat), job["priority"], plan,
+                  max(PLAN_PRIORITY.values()), _PRIORITY_BAND, now, int(JOB_LEASE + JOB_RESULT_TTL)],
+        )
+        job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+        return (job if created else await self.get(job_id)), bool(created)
+
+    async def claim(self) -> Optional[dict]:
+        job_id = await self._claim(
+            keys=[self._queued, self._running, self._delayed],
+            args=[self._job, time.time(), JOB_LEASE, self.concurrency, max(PLAN_PRIORITY.values()), _PRIORITY_BAND],
+        )
+        return await self.get(job_id.decode()) if job_id else None
+
+    async def renew(self, job: dict) -> bool:
+        """Extend the lease of a job we're running; False if it was requeued meanwhile."""
+        return bool(await self.redis.zadd(self._running, {job["id"]: time.time() + JOB_LEASE}, xx=True, ch=True))
+
+    async def finish(self, job_id: str, error: Optional[str] = None, retry_at: Optional[float] = None):
+        key = self._job + job_id
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._running, job_id)
+        if retry_at is not None:
+            pipe.hset(key, mapping={"status": "queued", "available_at": retry_at, "error": error or ""})
+            pipe.zadd(self._delayed, {job_id: retry_at})
+        else:
+            pipe.hset(key, mapping={"status": "failed" if error else "done", "finished_at": time.time(),
+                                    "error": error or ""})
+            pipe.expire(key, int(JOB_RESULT_TTL))
+        await pipe.execute()
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return self._decode(await self.redis.hgetall(self._job + job_id))
+
+    async def position(self, job: dict) -> Optional[int]:
+        """Rank in the ready queue; None if it isn't there (running, finished, or backing off)."""
+        return await self.redis.zrank(self._queued, job["id"])
+
+    async def depth(self) -> dict:
+        top = max(PLAN_PRIORITY.values())
+        pipe = self.redis.pipeline()
+        for plan, priority in PLAN_PRIORITY.items():
+            low = (top - priority) * _PRIORITY_BAND
+            pipe.zcount(self._queued, low, f"({low + _PRIORITY_BAND}")
+        pipe.zcard(self._delayed)
+        pipe.zcard(self._running)
+        *counts, delayed, running = await pipe.execute()
+        return {"queued": dict(zip(PLAN_PRIORITY, counts)), "retrying": delayed, "running": running}
+
+
+def _build_queue():
+    if JOB_QUEUE_BACKEND == "redis":
+        from cache import get_redis
+        client = get_redis()
+        if client:
+            print(f"✅ Job queue: Redis (concurrency {JOB_CONCURRENCY})")
+            return RedisJobQueue(client)
+        print("⚠️ JOB_QUEUE_BACKEND=redis but Redis is not configured — using local queue")
+    print(f"✅ Job queue: local SQLite (concurrency {JOB_CONCURRENCY})")
+    return LocalJobQueue()
+
+
+queue = _build_queue()
+
+
+# ─── PLAN LOOKUP ───
+
+# sha256(token) -> (plan, looked up at); raw tokens are never kept, and the table is
+# bounded: expired entries go on read, the least recently used once it's full
+_plan_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+
+async def plan_for_token(authorization: Optional[str]) -> str:
+    """Plan of the Supabase user behind `Authorization: Bearer <access token>`; free if unknown."""
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    if not token:
+        return DEFAULT_PLAN
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    cached = _plan_cache.get(digest)
+    if cached and time.time() - cached[1] < JOB_PLAN_CACHE:
+        _plan_cache.move_to_end(digest)
+        return cached[0]
+    _plan_cache.pop(digest, None)
+
+    from blog_engine import _get_sb
+    sb = _get_sb()
+    if not sb:
+        return DEFAULT_PLAN
+
+    def lookup() -> str:
+        user = sb.auth.get_user(token).user
+        rows = (sb.table("subscriptions").select("plan_name, status")
+                .eq("user_id", user.id).execute().data)
+        if rows and rows[0].get("status", "active") == "active":
+            return rows[0].get("plan_name") or DEFAULT_PLAN
+        return DEFAULT_PLAN
+
+    try:
+        plan = await asyncio.to_thread(lookup)
+    except Exception as e:
+        print(f"⚠️ Plan lookup failed (treating as {DEFAULT_PLAN}): {e}")
+        plan = DEFAULT_PLAN
+    plan = plan if plan in PLAN_PRIORITY else DEFAULT_PLAN
+    _plan_cache[digest] = (plan, time.time())
+    while len(_plan_cache) > JOB_PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return plan
+
+
+# ─── RUNNER ───
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with ±25% jitter, so failed jobs don't retry in lockstep."""
+    delay = min(JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0), JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+
+class JobRunner:
+    """
+    Claims jobs while the global limit allows and runs them with the handler for their kind.
+    `slots` caps this consumer's own parallelism; failures are retried with backoff up to
+    `max_attempts`.
+    """
+
+    def __init__(self, job_queue, handlers: Dict[str, Handler], slots: int = JOB_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.queue = job_queue
+        self.handlers = handlers
+        self.slots = asyncio.Semaphore(slots)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._active: set = set()
+        self._waits = {plan: deque(maxlen=200) for plan in PLAN_PRIORITY}
+        self.counters = {"completed": 0, "retried": 0, "failed": 0, "interrupted": 0, "claim_errors": 0}
+
+    def notify(self):
+        """Wake the claim loop now (a job was just submitted in this process)."""
+        self._wake.set()
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, drain: float = 0):
+        """Stop claiming; give running jobs up to `drain` seconds, then interrupt (and requeue) them."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if drain and self._active:
+            await asyncio.wait(set(self._active), timeout=drain)
+        for task in list(self._active):
+            task.cancel()
+        if self._active:
+            await asyncio.gather(*self._active, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            await self.slots.acquire()
+            self._wake.clear()
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                self.counters["claim_errors"] += 1
+                print(f"⚠️ Job claim failed: {e}")
+                job = None
+            if not job:
+                self.slots.release()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+
+    async def _run(self, job: dict):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            self._waits.setdefault(job["plan"], deque(maxlen=200)).append(job["started_at"] - job["created_at"])
+            handler = self.handlers.get(job["kind"])
+            if not handler:
+                raise ValueError(f"No handler for job kind {job['kind']!r}")
+            await handler(job["payload"])
+            await self.queue.finish(job["id"])
+            self.counters["completed"] += 1
+        except asyncio.CancelledError:
+            # Shutdown: hand the job straight back instead of waiting out its lease
+            self.counters["interrupted"] += 1
+            try:
+                await asyncio.shield(self.queue.finish(job["id"], error="interrupted", retry_at=time.time()))
+            except Exception:
+                pass
+            raise
+        except Exception as e:
+            if job["attempts"] < self.max_attempts:
+                delay = retry_delay(job["attempts"])
+                self.counters["retried"] += 1
+                print(f"🔄 Job {job['kind']}:{job['key']} failed (attempt {job['attempts']}), "
+                      f"retrying in {delay:.0f}s: {e}")
+                await self.queue.finish(job["id"], error=str(e), retry_at=time.time() + delay)
+            else:
+                self.counters["failed"] += 1
+                print(f"⚠️ Job {job['kind']}:{job['key']} failed after {job['attempts']} attempts: {e}")
+                await self.queue.finish(job["id"], error=str(e))
+        finally:
+            heartbeat.cancel()
+            self.slots.release()
+
+    async def _heartbeat(self, job: dict):
+        """Keep the job's lease alive while its handler runs, so a long generation isn't
+        requeued (and run twice) just for outliving JOB_LEASE."""
+        while True:
+            await asyncio.sleep(JOB_LEASE / 3)
+            try:
+                if not await self.queue.renew(job):
+                    print(f"⚠️ Job {job['kind']}:{job['key']} lost its lease (requeued elsewhere)")
+                    return
+            except Exception as e:
+                print(f"⚠️ Job lease renewal failed for {job['kind']}:{job['key']}: {e}")
+
+    def stats(self) -> dict:
+        waits = {}
+        for plan, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[plan] = {
+                "samples": len(ordered),
+                "p50_seconds": round(ordered[len(ordered) // 2], 2) if ordered else None,
+                "max_seconds": round(ordered[-1], 2) if ordered else None,
+            }
+        return {"active": len(self._active), "wait_times": waits, **self.counters}
+
+
+runners: List[JobRunner] = []
+
+
+async def queue_stats() -> dict:
+    try:
+        depth = await queue.depth()
+    except Exception as e:
+        depth = {"error": str(e)}
+    return {
+        "backend": queue.name,
+        "concurrency_limit": queue.concurrency,
+        "plan_priority": PLAN_PRIORITY,
+        "depth": depth,
+        "runners": [runner.stats() for runner in runners],
+    }
+
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/jobs")
+async def job_queue_status(x_admin_token: Optional[str] = Header(None)):
+    """Queue depth per plan, running jobs, and wait times per plan for this process's runner."""
+    require_admin(x_admin_token)
+    return await queue_stats()
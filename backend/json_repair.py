@@ -0,0 +1,178 @@
+"""
+Stock Fortress — Local JSON Repair
+===================================
+Recovers model output that is *almost* JSON — truncated mid-object, trailing commas,
+raw newlines inside strings, a preamble or ``` fences around it — without another
+model call.
+
+Usage:
+    data = repair_json(text)           # best-effort whole document (raises if hopeless)
+    sections = salvage_sections(text)  # every top-level member that can be recovered
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_DANGLING_KEY = re.compile(r'([{,])\s*' + _STRING + r'\s*(?::\s*)?$')
+_PARTIAL_LITERAL = re.compile(r'([:\[,])\s*[-+.\w]+$')
+_MEMBER_KEY = re.compile(r'\s*,?\s*(' + _STRING + r')\s*:\s*')
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse `text`, fixing the common ways model JSON goes wrong.
+
+    Raises:
+        json.JSONDecodeError: if the text can't be recovered
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            elif ch == "\t":
+                ch = "\\t"
+            elif ch < " ":
+                continue
+            out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                continue  # stray closer
+            _strip_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            continue
+        out.append(ch)
+
+    # Truncated: close the open string, drop the incomplete last member, close containers
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    if stack:
+        doc = "".join(out).rstrip()
+        if stack[-1] == "}":
+            doc = _DANGLING_KEY.sub(lambda m: m.group(1), doc)
+        if not doc.endswith('"'):
+            doc = _PARTIAL_LITERAL.sub(lambda m: m.group(1), doc)
+        doc = doc.rstrip().rstrip(",").rstrip()
+        if doc.endswith(":"):  # key whose value was cut off entirely
+            doc = _DANGLING_KEY.sub(lambda m: m.group(1), doc).rstrip().rstrip(",")
+        out = [doc] + list(reversed(stack))
+
+    return json.loads("".join(out))
+
+
+def _strip_trailing_comma(out: List[str]):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _split_members(text: str) -> List[Tuple[str, str]]:
+    """(key, raw value text) for each top-level member of the first object in `text`."""
+    start = text.find("{")
+    if start < 0:
+        return []
+    members: List[Tuple[str, str]] = []
+    i, n = start + 1, len(text)
+    while i < n:
+        key_match = _MEMBER_KEY.match(text, i)
+        if not key_match:
+            break
+        try:
+            key = json.loads(key_match.group(1))
+        except ValueError:
+            break
+        j = key_match.end()
+        depth, in_string, escape = 0, False, False
+        k = j
+        while k < n:
+            ch = text[k]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+                    if depth == 0:
+                        k += 1
+                        break
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                depth += 1
+            elif ch in "}]":
+                if depth == 0:
+                    break  # closing brace of the top-level object
+                depth -= 1
+                if depth == 0:
+                    k += 1
+                    break
+            elif ch == "," and depth == 0:
+                break
+            k += 1
+        members.append((key, text[j:k]))
+        i = k
+        if i < n and text[i] == "}":
+            break
+    return members
+
+
+def salvage_sections(text: str) -> Dict[str, Any]:
+    """
+    Every top-level member of the object in `text` that parses (after repair).
+    Members that are malformed beyond repair are left out.
+    """
+    try:
+        whole = json.loads(text)
+        if isinstance(whole, dict):
+            return whole
+    except ValueError:
+        pass
+
+    sections: Dict[str, Any] = {}
+    for key, raw in _split_members(text):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            sections[key] = json.loads(raw)
+        except ValueError:
+            try:
+                # Wrapped in an (unclosed) array so strings and scalars get the same repair
+                sections[key] = repair_json("[" + raw)[0]
+            except (ValueError, IndexError):
+                continue
+    return sections
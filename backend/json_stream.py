@@ -0,0 +1,142 @@
+"""
+Stock Fortress — Incremental JSON Section Parser
+=================================================
+Feeds raw model tokens in as they stream and hands back each TOP-LEVEL member of the
+report object (`meta`, `step_1_...`, `investor_gut_check`) the moment its value closes.
+
+Usage:
+    parser = SectionStreamParser()
+    for chunk in stream:
+        for key, value in parser.feed(chunk):
+            emit(key, value)
+    report = parser.result()
+
+Anything before the first "{" (preamble, ``` fences) and after the closing "}" is ignored.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+# Scanner states at the top level of the object
+_BEFORE_OBJECT = 0   # haven't seen the opening "{"
+_EXPECT_KEY = 1      # waiting for the next member's key (or "}")
+_IN_KEY = 2          # inside the key string
+_EXPECT_COLON = 3    # key read, waiting for ":"
+_EXPECT_VALUE = 4    # ":" read, waiting for the value's first character
+_IN_VALUE = 5        # scanning the value
+_DONE = 6            # top-level "}" seen
+
+
+class SectionStreamParser:
+    """Incrementally parse a streamed JSON object into its top-level members."""
+
+    def __init__(self):
+        self._buf: List[str] = []     # text of the member currently being scanned
+        self._state = _BEFORE_OBJECT
+        self._key_chars: List[str] = []
+        self._key = ""
+        self._depth = 0               # nesting depth inside the current value
+        self._in_string = False
+        self._escape = False
+        self._scalar = False          # current value is a bare number / literal
+        self.sections: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of text; return members completed by it, in order."""
+        completed: List[Tuple[str, Any]] = []
+        for ch in chunk:
+            state = self._state
+            if state == _DONE:
+                break
+
+            if state == _BEFORE_OBJECT:
+                if ch == "{":
+                    self._state = _EXPECT_KEY
+
+            elif state == _EXPECT_KEY:
+                if ch == '"':
+                    self._state = _IN_KEY
+                    self._key_chars = []
+                elif ch == "}":
+                    self._state = _DONE
+
+            elif state == _IN_KEY:
+                if self._escape:
+                    self._key_chars.append(ch)
+                    self._escape = False
+                elif ch == "\\":
+                    self._key_chars.append(ch)
+                    self._escape = True
+                elif ch == '"':
+                    self._key = json.loads('"' + "".join(self._key_chars) + '"')
+                    self._state = _EXPECT_COLON
+                else:
+                    self._key_chars.append(ch)
+
+            elif state == _EXPECT_COLON:
+                if ch == ":":
+                    self._state = _EXPECT_VALUE
+
+            elif state == _EXPECT_VALUE:
+                if ch.isspace():
+                    continue
+                self._buf = [ch]
+                self._state = _IN_VALUE
+                if ch in "{[":
+                    self._depth = 1
+                elif ch == '"':
+                    self._depth = 0
+                    self._in_string = True
+                else:
+                    self._depth = 0
+                    self._scalar = True
+
+            elif state == _IN_VALUE:
+                if self._scalar:
+                    # Bare number / true / false / null ends at the next delimiter
+                    if ch == "," or ch == "}" or ch.isspace():
+                        completed.append(self._finish())
+                        if ch == "}":
+                            self._state = _DONE
+                        continue
+                    self._buf.append(ch)
+                    continue
+
+                self._buf.append(ch)
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                        if self._depth == 0:
+                            completed.append(self._finish())
+                elif ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        completed.append(self._finish())
+
+        return completed
+
+    def _finish(self) -> Tuple[str, Any]:
+        value = json.loads("".join(self._buf))
+        self.sections[self._key] = value
+        self._buf = []
+        self._scalar = False
+        self._state = _EXPECT_KEY
+        return self._key, value
+
+    def result(self) -> Dict[str, Any]:
+        """The fully assembled object. Raises if the stream ended before the closing brace."""
+        if not self.done:
+            raise json.JSONDecodeError("Stream ended before the report object closed", "", 0)
+        return self.sections
@@ -1,10 +1,364 @@
+"""
+Stock Fortress — Market Data
+=============================
+Quotes and fundamentals from yfinance.
+
+Quotes are cached per symbol for a few seconds in the shared Redis (so every request and
+every replica polling the same watchlist shares one upstream fetch), with an in-process
+fallback when Redis isn't configured. Symbols Yahoo has no data for are negatively cached
+for longer; timeouts and errors are not cached at all. Upstream fetches run in a bounded
+thread pool, each timed from when it starts running (not while it waits for a thread), and
+concurrent misses for the same symbol share one fetch.
+
+Several misses at once are fetched with ONE bulk download of the last few daily bars
+(fetch_quotes_batch), with price / change / percent computed as NumPy column operations;
+a single symbol uses its real-time fast_info. See benchmarks/bench_quotes.py.
+
+Usage:
+    quotes = await get_quotes(["AAPL", "MSFT"])   # {symbol: {price, change, percent}}
+
+Configuration via .env:
+    QUOTE_CACHE_TTL_SECONDS=5         # How long a quote is reused
+    QUOTE_NEGATIVE_TTL_SECONDS=60     # How long a symbol Yahoo has no data for is not retried
+    QUOTE_FETCH_WORKERS=8             # Threads for upstream quote fetches (per process)
+    QUOTE_FETCH_TIMEOUT_SECONDS=4     # Per-symbol upstream timeout (from when a thread picks it up)
+    QUOTE_ENGINE=batch                # batch (one bulk download per miss set) | per_symbol
+    QUOTE_BATCH_TIMEOUT_SECONDS=10    # Timeout for one bulk download
+"""
+
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
 from fastapi import APIRouter, HTTPException, Query
+import numpy as np
+import pandas as pd
 import yfinance as yf
-from typing import List, Dict
-import asyncio
+
+from cache import get_redis
+
+QUOTE_CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL_SECONDS", "5"))
+QUOTE_NEGATIVE_TTL = float(os.environ.get("QUOTE_NEGATIVE_TTL_SECONDS", "60"))
+QUOTE_FETCH_WORKERS = int(os.environ.get("QUOTE_FETCH_WORKERS", "8"))
+QUOTE_FETCH_TIMEOUT = float(os.environ.get("QUOTE_FETCH_TIMEOUT_SECONDS", "4"))
+QUOTE_ENGINE = os.environ.get("QUOTE_ENGINE", "batch").lower()
+QUOTE_BATCH_TIMEOUT = float(os.environ.get("QUOTE_BATCH_TIMEOUT_SECONDS", "10"))
 
 router = APIRouter(prefix="/api/market-data", tags=["market-data"])
 
+EMPTY_QUOTE = {"price": 0, "change": 0, "percent": 0}
+
+def fetch_quotes(symbol_list: List[str], session=None) -> Dict[str, dict]:
+    """
+    Blocking yfinance fetch of {symbol: {price, change, percent}} for several tickers,
+    one fast_info lookup per symbol. Symbols with no data get zeros.
+    """
+    # yfinance can fetch multiple tickers in one go
+    # We use 'tickers' string space-separated
+    data = yf.Tickers(" ".join(symbol_list), session=session)
+
+    results = {}
+    for symbol in symbol_list:
+        try:
+            results[symbol] = _quote_from_ticker(data.tickers[symbol]) or dict(EMPTY_QUOTE)
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            results[symbol] = dict(EMPTY_QUOTE)
+
+    return results
+
+
+def _quote_from_ticker(ticker) -> Optional[dict]:
+    # fast_info is faster than .info
+    price = ticker.fast_info.last_price
+    prev_close = ticker.fast_info.previous_close
+    if not (price and prev_close):
+        return None
+    change = price - prev_close
+    percent = (change / prev_close) * 100
+    return {
+        "price": round(price, 2),
+        "change": round(change, 2),
+        "percent": round(percent, 2)
+    }
+
+
+def fetch_quotes_batch(symbol_list: List[str], session=None) -> Dict[str, Optional[dict]]:
+    """
+    Blocking: {symbol: {price, change, percent}} for many tickers from ONE bulk download of
+    the last few daily bars. Price is the latest close (today's bar while the market is open),
+    change is against the previous session. Symbols without two sessions of data map to None.
+    """
+    data = yf.download(symbol_list, period="5d", interval="1d", auto_adjust=False, progress=False,
+                       threads=min(len(symbol_list), QUOTE_FETCH_WORKERS), session=session)
+    if data is None or data.empty or "Close" not in data:
+        return {symbol: None for symbol in symbol_list}
+    close = data["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbol_list[0])
+    closes = close.reindex(columns=symbol_list).to_numpy(dtype=float)  # sessions × symbols
+
+    # Last and second-to-last valid close per column (a symbol can miss a session)
+    rows = np.arange(closes.shape[0])[:, None]
+    valid = ~np.isnan(closes)
+    last_row = np.where(valid, rows, -1).max(axis=0)
+    prev_row = np.where(valid & (rows < last_row), rows, -1).max(axis=0)
+    cols = np.arange(closes.shape[1])
+    price = closes[last_row, cols]
+    prev_close = closes[prev_row, cols]
+    ok = (last_row >= 0) & (prev_row >= 0) & (price > 0) & (prev_close > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = price - prev_close
+        percent = change / prev_close * 100
+    price, change, percent = (np.round(a, 2).tolist() for a in (price, change, percent))
+    return {
+        symbol: ({"price": price[i], "change": change[i], "percent": percent[i]} if ok[i] else None)
+        for i, symbol in enumerate(symbol_list)
+    }
+
+
+# ─── QUOTE CACHE ───
+
+_quote_pool = ThreadPoolExecutor(max_workers=QUOTE_FETCH_WORKERS, thread_name_prefix="quotes")
+# One slot per pool thread, held until the thread is actually free again — so a fetch
+# only starts its timeout once it has a thread, and queued fetches don't expire in line
+_quote_slots = asyncio.Semaphore(QUOTE_FETCH_WORKERS)
+_FAILED = object()  # timeout / error: answered as zeros, but never cached
+_local_quotes: Dict[str, tuple] = {}       # symbol -> (expires_at, quote or None) when Redis is off
+_quote_fetches: Dict[str, asyncio.Future] = {}  # symbol -> in-flight batch fetch
+_quote_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "upstream_calls": 0, "upstream_batches": 0,
+                "timeouts": 0, "errors": 0}
+
+
+def _quote_key(symbol: str) -> str:
+    return f"quote:{symbol}"
+
+
+async def _cached_quotes(symbols: List[str]) -> Dict[str, Optional[dict]]:
+    """{symbol: quote} for cache hits; a None value is a negative (known-bad) entry."""
+    redis = get_redis()
+    if redis is None:
+        now = time.time()
+        return {s: _local_quotes[s][1] for s in symbols if s in _local_quotes and _local_quotes[s][0] > now}
+    try:
+        blobs = await redis.mget([_quote_key(s) for s in symbols])
+    except Exception as e:
+        print(f"⚠️ Quote cache read failed: {e}")
+        return {}
+    return {s: json.loads(blob) for s, blob in zip(symbols, blobs) if blob is not None}
+
+
+async def _store_quotes(quotes: Dict[str, Optional[dict]]):
+    redis = get_redis()
+    if redis is None:
+        now = time.time()
+        for symbol, quote in quotes.items():
+            _local_quotes[symbol] = (now + (QUOTE_CACHE_TTL if quote else QUOTE_NEGATIVE_TTL), quote)
+        if len(_local_quotes) > 10_000:
+            for symbol in [s for s, (expires, _) in _local_quotes.items() if expires <= now]:
+                del _local_quotes[symbol]
+        return
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for symbol, quote in quotes.items():
+            ttl = QUOTE_CACHE_TTL if quote else QUOTE_NEGATIVE_TTL
+            pipe.set(_quote_key(symbol), json.dumps(quote).encode(), px=int(ttl * 1000))
+        await pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Quote cache write failed: {e}")
+
+
+def _fetch_quote(symbol: str) -> Optional[dict]:
+    return _quote_from_ticker(yf.Ticker(symbol))
+
+
+async def _in_pool(timeout: float, fn, *args):
+    """Run fn in the quote pool once a thread is free; the timeout covers the run, not the wait."""
+    await _quote_slots.acquire()
+    future = asyncio.get_running_loop().run_in_executor(_quote_pool, fn, *args)
+    future.add_done_callback(lambda _: _quote_slots.release())
+    return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+
+async def _upstream_quote(symbol: str):
+    """One symbol from Yahoo in the bounded pool; None on no data, _FAILED on error or timeout."""
+    _quote_stats["upstream_calls"] += 1
+    try:
+        return await _in_pool(QUOTE_FETCH_TIMEOUT, _fetch_quote, symbol)
+    except asyncio.TimeoutError:
+        _quote_stats["timeouts"] += 1
+        print(f"Quote fetch timed out for {symbol}")
+    except Exception as e:
+        _quote_stats["errors"] += 1
+        print(f"Error fetching data for {symbol}: {e}")
+    return _FAILED
+
+
+async def _upstream_quotes(symbols: List[str]) -> Dict[str, object]:
+    """Several symbols: one bulk download (falling back to per-symbol fetches if it fails)."""
+    if QUOTE_ENGINE == "batch" and len(symbols) > 1:
+        _quote_stats["upstream_batches"] += 1
+        try:
+            return await _in_pool(QUOTE_BATCH_TIMEOUT, fetch_quotes_batch, symbols)
+        except asyncio.TimeoutError:
+            _quote_stats["timeouts"] += 1
+            print(f"Bulk quote download timed out for {len(symbols)} symbols, fetching one by one")
+        except Exception as e:
+            _quote_stats["errors"] += 1
+            print(f"Bulk quote download failed ({e}), fetching one by one")
+    return dict(zip(symbols, await asyncio.gather(*(_upstream_quote(s) for s in symbols))))
+
+
+async def _fetch_batch(symbols: List[str]) -> Dict[str, Optional[dict]]:
+    try:
+        fetched = await _upstream_quotes(symbols)
+        await _store_quotes({s: q for s, q in fetched.items() if q is not _FAILED})
+        return {s: (None if q is _FAILED else q) for s, q in fetched.items()}
+    finally:
+        for symbol in symbols:
+            _quote_fetches.pop(symbol, None)
+
+
+async def _fetch_missing(symbols: List[str]) -> Dict[str, Optional[dict]]:
+    """Fetch cache misses; a symbol already being fetched by another request is joined, not refetched."""
+    owned = [s for s in symbols if s not in _quote_fetches]
+    if owned:
+        batch = asyncio.ensure_future(_fetch_batch(owned))
+        for symbol in owned:
+            _quote_fetches[symbol] = batch
+    batches = {id(task): task for task in (_quote_fetches[s] for s in symbols)}
+
+    results: Dict[str, Optional[dict]] = {}
+    for task in batches.values():
+        # Shielded: a disconnecting client doesn't cancel a fetch other requests are waiting on
+        results.update(await asyncio.shield(task))
+    return {s: results[s] for s in symbols}
+
+
+async def get_quotes(symbol_list: List[str]) -> Dict[str, dict]:
+    """
+    {symbol: {price, change, percent}} from the shared quote cache, fetching misses upstream.
+    Symbols with no data (or a failed / timed-out fetch) get zeros.
+    """
+    symbols = list(dict.fromkeys(symbol_list))
+    if not symbols:
+        return {}
+    quotes = await _cached_quotes(symbols)
+    for quote in quotes.values():
+        _quote_stats["hits" if quote else "negative_hits"] += 1
+    missing = [s for s in symbols if s not in quotes]
+    if missing:
+        _quote_stats["misses"] += len(missing)
+        quotes.update(await _fetch_missing(missing))
+    return {s: quotes[s] or dict(EMPTY_QUOTE) for s in symbol_list}
+
+
+def quote_stats() -> dict:
+    lookups = _quote_stats["hits"] + _quote_stats["negative_hits"] + _quote_stats["misses"]
+    return {
+        **_quote_stats,
+        "hit_rate": round((lookups - _quote_stats["misses"]) / lookups, 3) if lookups else None,
+        "backend": "redis" if get_redis() is not None else "local",
+        "ttl_seconds": QUOTE_CACHE_TTL,
+        "negative_ttl_seconds": QUOTE_NEGATIVE_TTL,
+        "engine": QUOTE_ENGINE,
+        "inflight": len(_quote_fetches),
+    }
+
+
+_INFO_FIELDS = (
+    "longName", "sector", "currentPrice", "regularMarketPrice", "marketCap", "trailingPE", "forwardPE",
+    "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "averageVolume", "beta", "trailingEps", "grossMargins",
+    "freeCashflow", "totalCash", "totalDebt", "debtToEquity", "currentRatio", "quickRatio",
+    "priceToSalesTrailing12Months", "enterpriseToEbitda", "sharesOutstanding",
+)
+
+
+def _fetch_info(ticker) -> Dict[str, object]:
+    info = ticker.info or {}
+    return {key: info[key] for key in _INFO_FIELDS if info.get(key) is not None}
+
+
+def _fetch_latest_quarter(ticker) -> Dict[str, object]:
+    """
+    Latest reported quarter, read by column (quarter end date) so a gap in one row can't
+    shift values onto the wrong quarter. The year-ago revenue is the quarter ending about
+    a year earlier (330-400 days), or left out.
+    """
+    out: Dict[str, object] = {}
+    income = ticker.quarterly_income_stmt
+    if income is None or income.empty:
+        return out
+    anchor = "Total Revenue" if "Total Revenue" in income.index else None
+    reported = income.loc[anchor].dropna() if anchor else None
+    quarters = reported.index if anchor else income.columns[income.notna().any()]
+    if not len(quarters):
+        return out
+    latest = max(quarters)
+    out["quarterEnd"] = latest.date().isoformat()
+    for row, key in (("Total Revenue", "quarterRevenue"), ("Net Income", "quarterNetIncome"),
+                     ("Diluted EPS", "quarterEps")):
+        if row in income.index and pd.notna(income.at[row, latest]):
+            out[key] = float(income.at[row, latest])
+    if anchor:
+        year_ago = [c for c in reported.index if 330 <= (latest - c).days <= 400]
+        if year_ago:
+            closest = min(year_ago, key=lambda c: abs((latest - c).days - 365))
+            if reported[closest]:
+                out["quarterRevenueYearAgo"] = float(reported[closest])
+    return out
+
+
+def _fetch_free_cash_flow(ticker) -> Dict[str, object]:
+    """
+    Latest quarter's free cash flow with its own quarter end: the cash-flow statement can
+    lag (or lead) the income statement, so it isn't assumed to match quarterEnd.
+    """
+    cashflow = ticker.quarterly_cashflow
+    if cashflow is None or "Free Cash Flow" not in cashflow.index:
+        return {}
+    values = cashflow.loc["Free Cash Flow"].dropna()
+    if not len(values):
+        return {}
+    latest = max(values.index)
+    return {"quarterFreeCashFlow": float(values[latest]), "freeCashFlowQuarterEnd": latest.date().isoformat()}
+
+
+async def get_fundamentals(symbol: str) -> Dict[str, object]:
+    """
+    One ticker's quote stats, latest quarter and balance sheet as raw numbers.
+    The three yfinance requests run concurrently; whatever Yahoo doesn't have is left out.
+    """
+    ticker = yf.Ticker(symbol)
+    parts = await asyncio.gather(
+        *(asyncio.to_thread(fetch, ticker) for fetch in (_fetch_info, _fetch_latest_quarter, _fetch_free_cash_flow)),
+        return_exceptions=True,
+    )
+    out: Dict[str, object] = {}
+    for part in parts:
+        if isinstance(part, Exception):
+            print(f"Error fetching fundamentals for {symbol}: {part}")
+        else:
+            out.update(part)
+    return out
+
+
+@router.get("/fundamentals/{ticker}")
+async def get_ticker_fundamentals(ticker: str):
+    """
+    Quote stats, latest quarter and balance-sheet numbers for one ticker (raw yfinance values).
+    Example: /api/market-data/fundamentals/AAPL
+    """
+    symbol = ticker.strip().upper()
+    if not symbol or len(symbol) > 10:
+        raise HTTPException(status_code=400, detail="Invalid ticker")
+    return await get_fundamentals(symbol)
+
+
 @router.get("/bulk")
 async def get_bulk_market_data(tickers: str = Query(..., description="Comma-separated list of tickers")):
     """
@@ -17,36 +371,9 @@ async def get_bulk_market_data(tickers: str = Query(..., description="Comma-sepa
     symbol_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
     if not symbol_list:
         return {}
-    
-    # yfinance can fetch multiple tickers in one go
-    # We use 'tickers' string space-separated
+
     try:
-        data = yf.Tickers(" ".join(symbol_list))
-        
-        results = {}
-        for symbol in symbol_list:
-            try:
-                # fast_info is faster than .info
-                ticker = data.tickers[symbol]
-                price = ticker.fast_info.last_price
-                prev_close = ticker.fast_info.previous_close
-                
-                if price and prev_close:
-                    change = price - prev_close
-                    percent = (change / prev_close) * 100
-                    results[symbol] = {
-                        "price": round(price, 2),
-                        "change": round(change, 2),
-                        "percent": round(percent, 2)
-                    }
-                else:
-                    # Fallback or error in data
-                    results[symbol] = { "price": 0, "change": 0, "percent": 0 }
-            except Exception as e:
-                print(f"Error fetching data for {symbol}: {e}")
-                results[symbol] = { "price": 0, "change": 0, "percent": 0 }
-
-        return results
+        return await get_quotes(symbol_list)
     except Exception as e:
         print(f"Global error in bulk fetch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,226 @@
+"""
+Stock Fortress — Technical & Risk Metrics Engine
+=================================================
+Deterministic metrics computed from the local price-history store, for many tickers at
+once: their adjusted closes are aligned into one (days × tickers) matrix and every metric
+is a column-wise NumPy reduction over it — no per-ticker Python loops, no model calls.
+
+  • SMA 50 / 200, EMA 20, RSI 14 (Wilder smoothing)
+  • realized volatility (21 trading days, 1 year), annualized
+  • max drawdown (1 year, full lookback), 1-year return
+  • 52-week high / low from the daily high / low bars
+  • beta and correlation vs the benchmark (SPY) on 1 year of daily log returns
+
+Feeds the report's verified facts (report_facts.gather_facts) and
+GET /api/market-data/metrics?tickers=AAPL,MSFT.
+
+Usage:
+    result = await compute_metrics(["AAPL", "MSFT"])   # {"benchmark", "metrics": {symbol: {...}}}
+
+Configuration via .env:
+    METRICS_BENCHMARK=SPY          # Beta / correlation reference
+    METRICS_LOOKBACK_DAYS=730      # Calendar days of history the metrics use
+    METRICS_MAX_TICKERS=50         # Per request
+"""
+
+import os
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from price_history import history, valid_symbol
+
+METRICS_BENCHMARK = os.environ.get("METRICS_BENCHMARK", "SPY").upper()
+METRICS_LOOKBACK_DAYS = int(os.environ.get("METRICS_LOOKBACK_DAYS", "730"))
+METRICS_MAX_TICKERS = int(os.environ.get("METRICS_MAX_TICKERS", "50"))
+
+TRADING_DAYS = 252
+MONTH = 21
+
+
+# ─── ALIGNMENT ───
+
+def align(bars: Dict[str, np.ndarray], field: str = "adj_close", fill: bool = True):
+    """
+    (days, matrix) with one column per symbol on the union of their trading days.
+    Gaps inside a column are forward-filled (unless `fill` is off); rows before a symbol's
+    first bar stay NaN.
+    """
+    symbols = list(bars)
+    days = np.unique(np.concatenate([b["day"] for b in bars.values()])) if bars else np.zeros(0, np.int32)
+    prices = np.full((len(days), len(symbols)), np.nan)
+    for col, symbol in enumerate(symbols):
+        b = bars[symbol]
+        prices[np.searchsorted(days, b["day"]), col] = b[field]
+    prices[prices <= 0] = np.nan
+    return days, _ffill(prices) if fill else prices
+
+
+def _ffill(matrix: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(matrix)
+    rows = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+# ─── INDICATORS (column-wise over a days × tickers matrix) ───
+
+def _observed(matrix: np.ndarray) -> np.ndarray:
+    return (~np.isnan(matrix)).sum(axis=0)
+
+
+def _ew_mean(matrix: np.ndarray, alpha: float) -> np.ndarray:
+    """Latest exponentially weighted mean per column (weights (1-alpha)^k, newest k=0; NaNs skipped)."""
+    weights = (1 - alpha) ** np.arange(len(matrix))[::-1]
+    valid = ~np.isnan(matrix)
+    num = (np.where(valid, matrix, 0) * weights[:, None]).sum(axis=0)
+    den = (valid * weights[:, None]).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return num / den
+
+
+def sma(prices: np.ndarray, window: int) -> np.ndarray:
+    tail = prices[-window:]
+    with np.errstate(invalid="ignore"):
+        out = tail.sum(axis=0) / window
+    return np.where(_observed(tail) == window, out, np.nan)
+
+
+def ema(prices: np.ndarray, span: int) -> np.ndarray:
+    out = _ew_mean(prices, 2 / (span + 1))
+    return np.where(_observed(prices) >= span, out, np.nan)
+
+
+def rsi(prices: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder RSI: gains and losses smoothed with alpha = 1/period."""
+    change = np.diff(prices, axis=0)
+    gain = _ew_mean(np.where(np.isnan(change), np.nan, np.clip(change, 0, None)), 1 / period)
+    loss = _ew_mean(np.where(np.isnan(change), np.nan, np.clip(-change, 0, None)), 1 / period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(loss > 0, 100 - 100 / (1 + gain / loss), 100.0)
+    return np.where(_observed(change) > period, out, np.nan)
+
+
+def volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """Annualized standard deviation of the last `window` daily log returns."""
+    tail = returns[-window:]
+    n = _observed(tail)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centered = tail - np.nansum(tail, axis=0) / n
+        out = np.sqrt(np.nansum(centered ** 2, axis=0) / (n - 1) * TRADING_DAYS)
+    return np.where(n >= window * 0.8, out, np.nan)
+
+
+def max_drawdown(prices: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+    """Worst peak-to-trough decline (negative fraction) over the last `window` rows."""
+    tail = prices[-window:] if window else prices
+    peak = np.fmax.accumulate(tail, axis=0)
+    with np.errstate(invalid="ignore"):
+        drawdown = np.where(np.isnan(tail), 0, tail / peak - 1)
+    return np.where(_observed(tail) > 1, drawdown.min(axis=0), np.nan)
+
+
+def beta(returns: np.ndarray, market: np.ndarray, window: int = TRADING_DAYS):
+    """(beta, correlation) of every column against `market` over the last `window` returns."""
+    x, y = returns[-window:], market[-window:, None]
+    mask = ~np.isnan(x) & ~np.isnan(y)
+    n = mask.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = np.where(mask, x - np.where(mask, x, 0).sum(axis=0) / n, 0)
+        dy = np.where(mask, y - np.where(mask, y, 0).sum(axis=0) / n, 0)
+        cov = (dx * dy).sum(axis=0)
+        var_x, var_y = (dx ** 2).sum(axis=0), (dy ** 2).sum(axis=0)
+        b = cov / var_y
+        corr = cov / np.sqrt(var_x * var_y)
+    enough = n >= window * 0.8
+    return np.where(enough, b, np.nan), np.where(enough, corr, np.nan)
+
+
+# ─── ENGINE ───
+
+def _value(x, digits: int, scale: float = 1.0) -> Optional[float]:
+    return None if np.isnan(x) else round(float(x) * scale, digits)
+
+
+def metrics_table(bars: Dict[str, np.ndarray], benchmark: str = METRICS_BENCHMARK) -> Dict[str, dict]:
+    """Every metric for every symbol in `bars` (the benchmark's bars included for beta)."""
+    symbols = [s for s in bars if len(bars[s])]
+    if not symbols:
+        return {}
+    bars = {s: bars[s] for s in symbols}
+    _, prices = align(bars)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(prices), axis=0)
+    # The 52-week range is the traded (unadjusted) intraday range, like the quoted price
+    highs = align(bars, "high", fill=False)[1][-TRADING_DAYS:]
+    lows = align(bars, "low", fill=False)[1][-TRADING_DAYS:]
+
+    if benchmark in symbols:
+        b, corr = beta(returns, returns[:, symbols.index(benchmark)])
+    else:
+        b = corr = np.full(len(symbols), np.nan)
+    columns = {
+        "sma_50": (sma(prices, 50), 2, 1),
+        "sma_200": (sma(prices, 200), 2, 1),
+        "ema_20": (ema(prices, 20), 2, 1),
+        "rsi_14": (rsi(prices, 14), 1, 1),
+        "volatility_1m_pct": (volatility(returns, MONTH), 2, 100),
+        "volatility_1y_pct": (volatility(returns, TRADING_DAYS), 2, 100),
+        "max_drawdown_1y_pct": (max_drawdown(prices, TRADING_DAYS), 2, 100),
+        "max_drawdown_pct": (max_drawdown(prices), 2, 100),
+        "return_1y_pct": ((prices[-1] / prices[-TRADING_DAYS - 1] - 1) if len(prices) > TRADING_DAYS
+                          else np.full(len(symbols), np.nan), 2, 100),
+        "high_52w": (np.fmax.reduce(highs, axis=0), 2, 1),
+        "low_52w": (np.fmin.reduce(lows, axis=0), 2, 1),
+        "beta_1y": (b, 2, 1),
+        "correlation_1y": (corr, 2, 1),
+    }
+
+    table = {}
+    for col, symbol in enumerate(symbols):
+        last = bars[symbol][-1]
+        row = {
+            "as_of": str(np.datetime64(int(last["day"]), "D")),
+            "price": round(float(last["close"]), 2),
+            "observations": int(len(bars[symbol])),
+        }
+        row.update({name: _value(values[col], digits, scale) for name, (values, digits, scale) in columns.items()})
+        if row["sma_200"]:
+            row["price_vs_sma_200_pct"] = round((float(prices[-1, col]) / row["sma_200"] - 1) * 100, 2)
+        table[symbol] = row
+    return table
+
+
+async def compute_metrics(symbols: List[str], benchmark: str = METRICS_BENCHMARK) -> dict:
+    """Metrics for `symbols` from the local history store (missing sessions fetched first)."""
+    start = date.today() - timedelta(days=METRICS_LOOKBACK_DAYS)
+    bars = await history(list(dict.fromkeys([*symbols, benchmark])), start=start)
+    started = time.perf_counter()
+    table = metrics_table(bars, benchmark)
+    return {
+        "benchmark": benchmark,
+        "metrics": {s: table.get(s) for s in symbols},
+        "compute_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+router = APIRouter(prefix="/api/market-data", tags=["market-data"])
+
+
+@router.get("/metrics")
+async def get_market_metrics(tickers: str):
+    """
+    Technical and risk metrics for up to METRICS_MAX_TICKERS tickers, computed in one batch.
+    Example: /api/market-data/metrics?tickers=AAPL,MSFT,TSLA
+    Percentages are in percent (28.4 = 28.4%), beta / correlation are vs "benchmark";
+    tickers without history map to null.
+    """
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    if len(symbols) > METRICS_MAX_TICKERS or not all(valid_symbol(s) for s in symbols):
+        raise HTTPException(status_code=400, detail=f"At most {METRICS_MAX_TICKERS} valid tickers per request")
+    return await compute_metrics(symbols)
@@ -0,0 +1,365 @@
+"""
+Stock Fortress — Report Pre-Warming Scheduler
+==============================================
+Keeps the most-requested reports generated BEFORE users ask for them.
+
+Popularity = request frequency seen by /api/report (exponentially decayed) plus seed signals:
+  • watchlists  — how many users follow the ticker (Supabase `watchlists`)
+  • blog views  — most-read tickers (Supabase `blog_posts.views`)
+  • tickers.json — the frontend's top names, as a weak prior
+
+Off-peak (outside US market hours), the scheduler regenerates the top-N reports that are
+missing or close to their soft TTL, within an hourly LLM-call budget and a concurrency cap.
+
+Configuration via .env:
+    PREWARM_ENABLED=1
+    PREWARM_TOP_N=50                 # How many of the most popular tickers to keep warm
+    PREWARM_CALLS_PER_HOUR=20        # LLM-call budget (per worker); a report costs one call per
+                                     # model request (single mode: 1, sectioned: one per group)
+    PREWARM_CONCURRENCY=2            # Max pre-warm generations in flight
+    PREWARM_INTERVAL_SECONDS=300     # Time between scheduling cycles
+    PREWARM_LEAD_MINUTES=120         # Refresh reports this long before their soft TTL
+    PREWARM_HALF_LIFE_HOURS=24       # Decay of request counts
+    PREWARM_PEAK_HOURS=9-16          # US/Eastern hours treated as peak (no pre-warming)
+    PREWARM_TICKERS_FILE=...         # Path to the frontend tickers.json (optional)
+    ADMIN_TOKEN=...                  # Required as X-Admin-Token on /api/admin/* (unset = admin API off)
+"""
+
+import os
+import hmac
+import json
+import math
+import time
+import asyncio
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from fastapi import APIRouter, Header, HTTPException
+
+PREWARM_ENABLED = os.environ.get("PREWARM_ENABLED", "1") == "1"
+PREWARM_TOP_N = int(os.environ.get("PREWARM_TOP_N", "50"))
+PREWARM_CALLS_PER_HOUR = int(os.environ.get("PREWARM_CALLS_PER_HOUR", "20"))
+PREWARM_CONCURRENCY = int(os.environ.get("PREWARM_CONCURRENCY", "2"))
+PREWARM_INTERVAL = float(os.environ.get("PREWARM_INTERVAL_SECONDS", "300"))
+PREWARM_LEAD = float(os.environ.get("PREWARM_LEAD_MINUTES", "120")) * 60
+PREWARM_HALF_LIFE = float(os.environ.get("PREWARM_HALF_LIFE_HOURS", "24")) * 3600
+PREWARM_PEAK_HOURS = os.environ.get("PREWARM_PEAK_HOURS", "9-16")
+PREWARM_TICKERS_FILE = os.environ.get(
+    "PREWARM_TICKERS_FILE",
+    str(Path(__file__).parent.parent / "frontend" / "src" / "data" / "tickers.json"),
+)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+MARKET_TZ = ZoneInfo("America/New_York")
+SEED_REFRESH_SECONDS = 3600
+STATIC_SEED_COUNT = 25
+# Request counts that have decayed below this are dropped from the popularity table
+PRUNE_BELOW = 0.01
+
+# Seed weights, in "requests per half-life" units
+WATCHLIST_WEIGHT = 1.0
+BLOG_VIEW_WEIGHT = 0.02
+STATIC_WEIGHT = 0.5
+
+
+def _peak_window():
+    start, end = PREWARM_PEAK_HOURS.split("-")
+    return int(start), int(end)
+
+
+def is_market_hours(now: Optional[datetime] = None) -> bool:
+    """Weekday, within PREWARM_PEAK_HOURS (US/Eastern)."""
+    now = now or datetime.now(MARKET_TZ)
+    start, end = _peak_window()
+    return now.weekday() < 5 and start <= now.hour < end
+
+
+class PopularityTracker:
+    """Exponentially-decayed request counts per ticker, plus static seed weights."""
+
+    def __init__(self, half_life: float = PREWARM_HALF_LIFE):
+        self._decay = math.log(2) / half_life
+        self._counts: Dict[str, tuple] = {}  # ticker -> (value, updated_at)
+        self.seeds: Dict[str, float] = {}
+
+    def _current(self, ticker: str, now: float) -> float:
+        value, updated = self._counts.get(ticker, (0.0, now))
+        return value * math.exp(-self._decay * (now - updated))
+
+    def record(self, ticker: str):
+        now = time.time()
+        self._counts[ticker] = (self._current(ticker, now) + 1.0, now)
+
+    def score(self, ticker: str, now: Optional[float] = None) -> float:
+        return self._current(ticker, now or time.time()) + self.seeds.get(ticker, 0.0)
+
+    def prune(self, now: Optional[float] = None):
+        """Forget tickers whose decayed count is negligible (keeps the table bounded)."""
+        now = now or time.time()
+        for ticker in [t for t in self._counts if self._current(t, now) < PRUNE_BELOW]:
+            del self._counts[ticker]
+
+    def top(self, n: int) -> List[tuple]:
+        now = time.time()
+        self.prune(now)
+        tickers = set(self._counts) | set(self.seeds)
+        scored = [(t, self.score(t, now)) for t in tickers]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+
+class PrewarmScheduler:
+    """Background task that regenerates popular reports off-peak, within a call budget."""
+
+    def __init__(self):
+        self.popularity = PopularityTracker()
+        self._cache_ages: Optional[Callable[[List[str]], Awaitable[Dict[str, Optional[float]]]]] = None
+        self._regenerate: Optional[Callable[[str], Awaitable[dict]]] = None
+        self._soft_ttl = 0.0
+        self._calls_per_report = 1
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        self._cycle_lock = asyncio.Lock()   # the loop and /prewarm/run share one budget
+        self._spent = deque()           # timestamps of pre-warm LLM calls in the last hour
+        self._seeded_at = 0.0
+        self._warmed: Dict[str, float] = {}  # ticker -> when we pre-warmed it
+        self.queue: List[str] = []
+        self.in_progress: set = set()
+        self.last_cycle: dict = {}
+        self.counters = {
+            "hits": 0, "misses": 0,
+            "market_hours_hits": 0, "market_hours_misses": 0,
+            "prewarmed_hits": 0,        # hits served by a report the scheduler generated
+            "prewarm_generations": 0, "prewarm_failures": 0,
+        }
+
+    def bind(self, cache_ages: Callable[[List[str]], Awaitable[Dict[str, Optional[float]]]],
+             regenerate: Callable[[str], Awaitable[dict]], soft_ttl: float, calls_per_report: int = 1):
+        """
+        Wire the scheduler to the report cache.
+
+        Args:
+            cache_ages: tickers → age in seconds of each cached report (None if not cached),
+                        looked up in one batch
+            regenerate: coroutine that regenerates + caches a ticker's report
+            soft_ttl: seconds after which a cached report is considered stale
+            calls_per_report: model calls one regeneration costs against the hourly budget
+        """
+        self._cache_ages = cache_ages
+        self._regenerate = regenerate
+        self._soft_ttl = soft_ttl
+        self._calls_per_report = max(1, calls_per_report)
+
+    # ─── REQUEST ACCOUNTING ───
+
+    def record(self, ticker: str, hit: bool):
+        """
+        Called for every report request. Only hits count towards popularity here; a miss
+        counts once its report was generated and served (served()), so unknown or failing
+        tickers never reach the top-N.
+        """
+        peak = is_market_hours()
+        if hit:
+            self.popularity.record(ticker)
+            self.counters["hits"] += 1
+            if peak:
+                self.counters["market_hours_hits"] += 1
+            if ticker in self._warmed:
+                self.counters["prewarmed_hits"] += 1
+        else:
+            self.counters["misses"] += 1
+            if peak:
+                self.counters["market_hours_misses"] += 1
+            self._warmed.pop(ticker, None)
+
+    def served(self, ticker: str):
+        """A report generated on a miss was delivered to the client."""
+        self.popularity.record(ticker)
+
+    # ─── SCHEDULING ───
+
+    def start(self):
+        if not PREWARM_ENABLED or self._task or not self._regenerate:
+            return
+        self._task = asyncio.create_task(self._loop())
+        print(f"🔥 Pre-warm scheduler started (top {PREWARM_TOP_N}, {PREWARM_CALLS_PER_HOUR} calls/h)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Pre-warm cycle failed: {e}")
+            await asyncio.sleep(PREWARM_INTERVAL)
+
+    async def run_cycle(self):
+        """One scheduling cycle; skipped if another one (loop or admin-triggered) is running."""
+        if self._cycle_lock.locked():
+            return
+        async with self._cycle_lock:
+            await self._cycle()
+
+    async def _cycle(self):
+        if time.time() - self._seeded_at > SEED_REFRESH_SECONDS:
+            await self._refresh_seeds()
+
+        if is_market_hours():
+            self.queue = []
+            self.last_cycle = {"at": time.time(), "skipped": "market hours"}
+            return
+
+        self.queue = await self.plan()
+        started = []
+        for ticker in list(self.queue):
+            if self.budget_remaining() < self._calls_per_report:
+                break
+            self._spent.extend([time.time()] * self._calls_per_report)
+            self.queue.remove(ticker)
+            started.append(asyncio.create_task(self._warm(ticker)))
+
+        self.last_cycle = {"at": time.time(), "started": len(started), "deferred": len(self.queue)}
+        if started:
+            await asyncio.gather(*started)
+
+    async def plan(self) -> List[str]:
+        """Top-N tickers whose report is missing or expires within the lead window."""
+        candidates = [t for t, _ in self.popularity.top(PREWARM_TOP_N) if t not in self.in_progress]
+        ages = await self._cache_ages(candidates) if candidates else {}
+        return [t for t in candidates
+                if ages.get(t) is None or ages[t] >= self._soft_ttl - PREWARM_LEAD]
+
+    def budget_remaining(self) -> int:
+        cutoff = time.time() - 3600
+        while self._spent and self._spent[0] < cutoff:
+            self._spent.popleft()
+        return PREWARM_CALLS_PER_HOUR - len(self._spent)
+
+    async def _warm(self, ticker: str):
+        self.in_progress.add(ticker)
+        try:
+            async with self._semaphore:
+                await self._regenerate(ticker)
+            self._warmed[ticker] = time.time()
+            self.counters["prewarm_generations"] += 1
+            print(f"🔥 Pre-warmed report for {ticker}")
+        except Exception as e:
+            self.counters["prewarm_failures"] += 1
+            print(f"⚠️ Pre-warm failed for {ticker}: {e}")
+        finally:
+            self.in_progress.discard(ticker)
+
+    # ─── SEEDS ───
+
+    async def _refresh_seeds(self):
+        seeds: Dict[str, float] = {}
+        for ticker, weight in _static_seeds().items():
+            seeds[ticker] = seeds.get(ticker, 0.0) + weight
+        try:
+            for ticker, weight in (await asyncio.to_thread(_database_seeds)).items():
+                seeds[ticker] = seeds.get(ticker, 0.0) + weight
+        except Exception as e:
+            print(f"⚠️ Pre-warm: failed to load watchlist/blog seeds: {e}")
+        self.popularity.seeds = seeds
+        self._seeded_at = time.time()
+
+    async def stats(self) -> dict:
+        top = self.popularity.top(PREWARM_TOP_N)
+        ages = await self._cache_ages([t for t, _ in top]) if self._cache_ages and top else {}
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        peak_hits, peak_misses = self.counters["market_hours_hits"], self.counters["market_hours_misses"]
+        return {
+            "enabled": PREWARM_ENABLED,
+            "running": bool(self._task),
+            "market_hours": is_market_hours(),
+            "budget": {"per_hour": PREWARM_CALLS_PER_HOUR, "remaining": self.budget_remaining(),
+                       "calls_per_report": self._calls_per_report},
+            "queue": self.queue,
+            "in_progress": sorted(self.in_progress),
+            "last_cycle": self.last_cycle,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "market_hours_hit_rate": round(peak_hits / (peak_hits + peak_misses), 3) if peak_hits + peak_misses else None,
+            "counters": self.counters,
+            "top": [
+                {"ticker": t, "score": round(score, 2), "age_s": _round(ages.get(t))}
+                for t, score in top
+            ],
+        }
+
+
+def _round(value: Optional[float]) -> Optional[int]:
+    return None if value is None else round(value)
+
+
+def _static_seeds() -> Dict[str, float]:
+    """The frontend's top names, weighted by their position in tickers.json."""
+    try:
+        with open(PREWARM_TICKERS_FILE) as f:
+            names = json.load(f)[:STATIC_SEED_COUNT]
+    except (OSError, ValueError):
+        return {}
+    return {
+        entry["t"].upper(): STATIC_WEIGHT * (1 - i / STATIC_SEED_COUNT)
+        for i, entry in enumerate(names) if entry.get("t")
+    }
+
+
+def _database_seeds() -> Dict[str, float]:
+    """Watchlist follower counts + blog views from Supabase (blocking — run in a thread)."""
+    from blog_engine import _get_sb
+    sb = _get_sb()
+    if not sb:
+        return {}
+
+    seeds: Dict[str, float] = {}
+    watchlists = sb.table("watchlists").select("ticker").execute()
+    for row in (watchlists.data or []):
+        ticker = (row.get("ticker") or "").upper()
+        if ticker:
+            seeds[ticker] = seeds.get(ticker, 0.0) + WATCHLIST_WEIGHT
+
+    posts = sb.table("blog_posts").select("ticker, views").execute()
+    for row in (posts.data or []):
+        ticker = (row.get("ticker") or "").upper()
+        if ticker:
+            seeds[ticker] = seeds.get(ticker, 0.0) + BLOG_VIEW_WEIGHT * (row.get("views") or 0)
+    return seeds
+
+
+scheduler = PrewarmScheduler()
+
+
+# ─── ADMIN ENDPOINTS ───
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def require_admin(token: Optional[str]):
+    """Deny by default: without ADMIN_TOKEN configured the admin API doesn't exist."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+
+@router.get("/prewarm")
+async def prewarm_status(x_admin_token: Optional[str] = Header(None)):
+    """Pre-warm queue, budget, popularity ranking and cache hit-rate impact."""
+    require_admin(x_admin_token)
+    return await scheduler.stats()
+
+
+@router.post("/prewarm/run")
+async def prewarm_run(x_admin_token: Optional[str] = Header(None)):
+    """Run one scheduling cycle now (still honours market hours and the hourly budget)."""
+    require_admin(x_admin_token)
+    asyncio.create_task(scheduler.run_cycle())
+    return {"queued": True}
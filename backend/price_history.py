@@ -0,0 +1,288 @@
+"""
+Stock Fortress — Local OHLCV History Store
+===========================================
+Daily bars per ticker in a flat, memory-mapped file of fixed-size records, so chart and
+metrics reads are disk-local (page cache) instead of fresh upstream downloads.
+
+  • One file per ticker: data/history/AAPL.ohlcv — packed HISTORY_DTYPE records, oldest first
+  • Reads map the file (np.memmap) and slice it with a binary search on the day column;
+    a range is a VIEW of the mapped pages, never a copy
+  • Only completed sessions missing from the file are fetched and appended. A ticker is
+    checked upstream at most once per PRICE_HISTORY_CHECK_MINUTES, so weekends and holidays
+    don't cost a request each time.
+  • If the adjusted close of the last stored bar no longer matches upstream (dividend or
+    split since), the file is re-downloaded and rewritten
+
+Usage:
+    bars = await history(["AAPL"], start=date(2024, 1, 1))   # {symbol: structured ndarray view}
+    bars["AAPL"]["close"]
+
+Configuration via .env:
+    PRICE_HISTORY_DIR=data/history          # Relative to backend/ (mount a volume in prod)
+    PRICE_HISTORY_INITIAL_YEARS=10          # Depth of the first download per ticker
+    PRICE_HISTORY_CHECK_MINUTES=60          # Min time between upstream checks per ticker
+"""
+
+import os
+import re
+import time
+import fcntl
+import asyncio
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import yfinance as yf
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+
+from prewarm import require_admin
+
+PRICE_HISTORY_DIR = os.environ.get("PRICE_HISTORY_DIR", "data/history")
+PRICE_HISTORY_INITIAL_YEARS = int(os.environ.get("PRICE_HISTORY_INITIAL_YEARS", "10"))
+PRICE_HISTORY_CHECK = float(os.environ.get("PRICE_HISTORY_CHECK_MINUTES", "60")) * 60
+
+# day = days since 1970-01-01; prices as reported, adj_close adjusted for splits + dividends
+HISTORY_DTYPE = np.dtype([
+    ("day", "<i4"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("adj_close", "<f8"), ("volume", "<f8"),
+])
+EMPTY = np.zeros(0, dtype=HISTORY_DTYPE)
+
+# Symbols double as file names: letters, digits and the . - ^ = Yahoo uses (BRK.B, ^GSPC,
+# EURUSD=X) — no path separators, nothing that could point outside PRICE_HISTORY_DIR
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9^][A-Z0-9.\-=]{0,9}$")
+
+# US close + a margin for the final print to settle
+MARKET_TZ = ZoneInfo("America/New_York")
+SESSION_SETTLED = (16, 30)
+ADJUSTMENT_TOLERANCE = 1e-4  # float noise between downloads stays well below this
+
+_root = Path(PRICE_HISTORY_DIR)
+if not _root.is_absolute():
+    _root = Path(__file__).parent / _root
+
+_maps: Dict[str, tuple] = {}           # symbol -> ((inode, size), memmap)
+_checked: Dict[str, float] = {}        # symbol -> last upstream check
+_locks: Dict[str, asyncio.Lock] = {}
+_stats = {"reads": 0, "upstream_fetches": 0, "rows_appended": 0, "rewrites": 0, "fetch_errors": 0}
+
+
+def valid_symbol(symbol: str) -> bool:
+    return bool(SYMBOL_PATTERN.match(symbol))
+
+
+def _path(symbol: str) -> Path:
+    if not valid_symbol(symbol):
+        raise ValueError(f"Invalid ticker: {symbol!r}")
+    return _root / f"{symbol}.ohlcv"
+
+
+def to_day(d: date) -> int:
+    return (d - date(1970, 1, 1)).days
+
+
+def last_completed_session(now: Optional[datetime] = None) -> int:
+    """Epoch day of the most recent weekday session that has closed (US/Eastern)."""
+    now = now or datetime.now(MARKET_TZ)
+    day = now.date()
+    if now.weekday() >= 5 or (now.hour, now.minute) < SESSION_SETTLED:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return to_day(day)
+
+
+# ─── FILE ACCESS ───
+
+def load(symbol: str) -> np.ndarray:
+    """All stored bars for `symbol` as a read-only memmap (re-mapped only when the file changed)."""
+    path = _path(symbol)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return EMPTY
+    version = (stat.st_ino, stat.st_size)
+    cached = _maps.get(symbol)
+    if cached and cached[0] == version:
+        return cached[1]
+    count = stat.st_size // HISTORY_DTYPE.itemsize
+    bars = np.memmap(path, dtype=HISTORY_DTYPE, mode="r", shape=(count,)) if count else EMPTY
+    _maps[symbol] = (version, bars)
+    return bars
+
+
+def slice_range(bars: np.ndarray, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+    """Bars with start <= day <= end — a view into `bars` (binary search, no copy)."""
+    days = bars["day"]
+    lo = int(np.searchsorted(days, start, side="left")) if start is not None else 0
+    hi = int(np.searchsorted(days, end, side="right")) if end is not None else len(bars)
+    return bars[lo:hi]
+
+
+def _write(symbol: str, rows: np.ndarray, rewrite: bool = False) -> int:
+    """
+    Append rows newer than the stored last day, under a file lock so a web process and a
+    worker never interleave writes. A rewrite goes to a new file that replaces the old one
+    atomically — readers still mapping the old file are never truncated under.
+    """
+    path = _path(symbol)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if rewrite:
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_bytes(rows.tobytes())
+        os.replace(tmp, path)
+        return len(rows)
+    with open(path, "ab+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0, os.SEEK_END)
+        size = f.tell() - f.tell() % HISTORY_DTYPE.itemsize
+        if size >= HISTORY_DTYPE.itemsize:
+            f.seek(size - HISTORY_DTYPE.itemsize)
+            last_day = np.frombuffer(f.read(HISTORY_DTYPE.itemsize), dtype=HISTORY_DTYPE)["day"][0]
+            rows = rows[rows["day"] > last_day]
+        if size != f.seek(0, os.SEEK_END):
+            f.truncate(size)  # a torn trailing record from an interrupted write
+        f.write(rows.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    return len(rows)
+
+
+# ─── UPSTREAM ───
+
+def _download(symbol: str, start_day: int, through_day: int) -> np.ndarray:
+    """Blocking: completed daily bars from start_day through through_day as HISTORY_DTYPE rows."""
+    start = date(1970, 1, 1) + timedelta(days=start_day)
+    end = date(1970, 1, 1) + timedelta(days=through_day + 1)  # yfinance's end is exclusive
+    frame = yf.Ticker(symbol).history(start=start.isoformat(), end=end.isoformat(), interval="1d",
+                                      auto_adjust=False, actions=False)
+    if frame is None or frame.empty:
+        return EMPTY
+    frame = frame.dropna(subset=["Close"])
+    rows = np.zeros(len(frame), dtype=HISTORY_DTYPE)
+    rows["day"] = np.asarray(frame.index.date, dtype="datetime64[D]").astype(np.int64)
+    for field, column in (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"),
+                          ("adj_close", "Adj Close"), ("volume", "Volume")):
+        source = column if column in frame else "Close"
+        rows[field] = frame[source].to_numpy(dtype=float)
+    return rows[rows["day"] <= through_day]
+
+
+def _update(symbol: str) -> None:
+    """Blocking: bring the file up to the last completed session."""
+    through = last_completed_session()
+    stored = load(symbol)
+    if len(stored) and stored["day"][-1] >= through:
+        return
+
+    _stats["upstream_fetches"] += 1
+    if not len(stored):
+        first = to_day(date.today() - timedelta(days=365 * PRICE_HISTORY_INITIAL_YEARS))
+        rows = _download(symbol, first, through)
+        if len(rows):  # unknown / delisted symbols leave no file behind
+            _stats["rows_appended"] += _write(symbol, rows, rewrite=True)
+        return
+
+    # Re-fetch the last stored bar too: a changed adj_close means history was re-adjusted
+    last = stored[-1]
+    rows = _download(symbol, int(last["day"]), through)
+    overlap = rows[rows["day"] == last["day"]]
+    if len(overlap) and last["adj_close"] and \
+            abs(overlap["adj_close"][0] / last["adj_close"] - 1) > ADJUSTMENT_TOLERANCE:
+        _stats["rewrites"] += 1
+        print(f"🔄 Price history for {symbol} re-adjusted upstream (dividend/split) — rewriting")
+        rows = _download(symbol, int(stored["day"][0]), through)
+        if len(rows):
+            _stats["rows_appended"] += _write(symbol, rows, rewrite=True)
+        return
+    _stats["rows_appended"] += _write(symbol, rows)
+
+
+async def ensure(symbol: str) -> None:
+    """Fetch missing sessions for `symbol`, at most once per PRICE_HISTORY_CHECK."""
+    stored = load(symbol)
+    if len(stored) and stored["day"][-1] >= last_completed_session():
+        return
+    if time.time() - _checked.get(symbol, 0) < PRICE_HISTORY_CHECK:
+        return  # checked recently (holiday, or no new data yet)
+    lock = _locks.setdefault(symbol, asyncio.Lock())
+    async with lock:
+        if time.time() - _checked.get(symbol, 0) < PRICE_HISTORY_CHECK:
+            return
+        try:
+            await asyncio.to_thread(_update, symbol)
+        except Exception as e:
+            _stats["fetch_errors"] += 1
+            print(f"⚠️ Price history update failed for {symbol} (serving stored bars): {e}")
+        _checked[symbol] = time.time()
+
+
+async def history(symbols: Iterable[str], start: Optional[date] = None,
+                  end: Optional[date] = None) -> Dict[str, np.ndarray]:
+    """{symbol: bars in [start, end]} — read-only views into the mapped files.
+    Raises ValueError for a symbol that isn't a plausible ticker (nothing is fetched or written)."""
+    symbols = list(dict.fromkeys(symbols))
+    invalid = [s for s in symbols if not valid_symbol(s)]
+    if invalid:
+        raise ValueError(f"Invalid ticker: {invalid[0]!r}")
+    await asyncio.gather(*(ensure(s) for s in symbols))
+    _stats["reads"] += len(symbols)
+    lo = to_day(start) if start else None
+    hi = to_day(end) if end else None
+    return {s: slice_range(load(s), lo, hi) for s in symbols}
+
+
+def history_stats() -> dict:
+    return {**_stats, "mapped_tickers": len(_maps), "dir": str(_root)}
+
+
+# ─── API ───
+
+router = APIRouter(prefix="/api/market-data", tags=["market-data"])
+
+
+def _columns(bars: np.ndarray) -> dict:
+    return {
+        "dates": bars["day"].astype("datetime64[D]").astype(str).tolist(),
+        **{field: bars[field].tolist() for field in HISTORY_DTYPE.names if field != "day"},
+    }
+
+
+@router.get("/history/stats")
+async def price_history_stats(x_admin_token: Optional[str] = Header(None)):
+    """Store counters and location (admin only)."""
+    require_admin(x_admin_token)
+    return history_stats()
+
+
+@router.get("/history")
+async def get_price_history(
+    ticker: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    format: str = Query("json", pattern="^(json|binary)$"),
+):
+    """
+    Daily OHLCV bars for one ticker from the local store (missing sessions fetched first).
+    Example: /api/market-data/history?ticker=AAPL&start=2024-01-01&end=2024-12-31
+
+    format=json returns columnar arrays ({"dates", "open", ..., "volume"}). format=binary
+    returns the mapped records as-is (little-endian, X-Record-Layout header) — no copy
+    between the page cache and the socket.
+    """
+    symbol = ticker.strip().upper()
+    if not valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail="Invalid ticker")
+    bars = (await history([symbol], start, end))[symbol]
+
+    if format == "binary":
+        layout = ",".join(f"{name}:{HISTORY_DTYPE.fields[name][0].str}" for name in HISTORY_DTYPE.names)
+        return Response(
+            content=memoryview(bars.view(np.uint8)) if len(bars) else b"",
+            media_type="application/octet-stream",
+            headers={"X-Record-Layout": layout, "X-Record-Count": str(len(bars))},
+        )
+    return {"ticker": symbol, "count": len(bars), **_columns(bars)}
@@ -0,0 +1,357 @@
+"""
+Stock Fortress — Live Quote Streaming
+======================================
+Pushes quote changes to subscribers instead of having every client poll /bulk.
+
+  • ONE poller per distinct symbol, however many clients subscribe to it. Pollers tick on a
+    shared grid, so the symbols due at the same moment are fetched together through
+    get_quotes (quote cache + one bulk download).
+  • Subscribers only hear about a symbol when its quote actually changes.
+  • Backpressure: a subscriber holds at most the LATEST quote per symbol. A slow client
+    skips intermediate prices instead of buffering them, and one that stops reading for
+    QUOTE_STREAM_MAX_LAG_SECONDS is disconnected.
+
+Endpoints:
+    GET /api/market-data/stream?tickers=AAPL,MSFT   server-sent `quote` events
+    WS  /api/market-data/ws                         send {"subscribe": [...]} / {"unsubscribe": [...]}
+    GET /api/market-data/stream/stats               subscribers and poll counts per symbol (admin)
+
+Configuration via .env:
+    QUOTE_STREAM_INTERVAL_SECONDS=5    # Poll interval per symbol
+    QUOTE_STREAM_MAX_SYMBOLS=50        # Symbols per subscriber
+    QUOTE_STREAM_MAX_LAG_SECONDS=30    # Drop a client that hasn't read an update for this long
+    QUOTE_STREAM_HEARTBEAT_SECONDS=15  # SSE keep-alive comment interval
+    QUOTE_STREAM_MAX_POLLERS=500       # Distinct symbols polled per process (new ones rejected beyond)
+    QUOTE_STREAM_MAX_SUBSCRIBERS=1000  # Open streams per process
+"""
+
+import os
+import json
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import APIRouter, Header, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+
+from market_data import get_quotes
+from prewarm import require_admin
+
+QUOTE_STREAM_INTERVAL = float(os.environ.get("QUOTE_STREAM_INTERVAL_SECONDS", "5"))
+QUOTE_STREAM_MAX_SYMBOLS = int(os.environ.get("QUOTE_STREAM_MAX_SYMBOLS", "50"))
+QUOTE_STREAM_MAX_LAG = float(os.environ.get("QUOTE_STREAM_MAX_LAG_SECONDS", "30"))
+QUOTE_STREAM_HEARTBEAT = float(os.environ.get("QUOTE_STREAM_HEARTBEAT_SECONDS", "15"))
+QUOTE_STREAM_MAX_POLLERS = int(os.environ.get("QUOTE_STREAM_MAX_POLLERS", "500"))
+QUOTE_STREAM_MAX_SUBSCRIBERS = int(os.environ.get("QUOTE_STREAM_MAX_SUBSCRIBERS", "1000"))
+
+# Poll requests arriving within this window share one get_quotes call
+BATCH_WINDOW = 0.05
+
+
+class CapacityError(ValueError):
+    """The process is already polling / streaming as much as it's allowed to."""
+
+
+class Subscriber:
+    """One client's symbol set plus the latest undelivered quote per symbol."""
+
+    def __init__(self):
+        self.symbols: Set[str] = set()
+        self.pending: Dict[str, dict] = {}
+        self.closed = False
+        self.conflated = 0           # updates replaced before the client read them
+        self._waiting_since: Optional[float] = None
+        self._ready = asyncio.Event()
+
+    def push(self, symbol: str, quote: dict):
+        if symbol in self.pending:
+            self.conflated += 1
+        self.pending[symbol] = quote
+        if self._waiting_since is None:
+            self._waiting_since = time.monotonic()
+        self._ready.set()
+
+    def lag(self) -> float:
+        return time.monotonic() - self._waiting_since if self._waiting_since is not None else 0.0
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Dict[str, dict]:
+        """Every quote that changed since the last call ({} on timeout or when closed)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        batch, self.pending = self.pending, {}
+        self._waiting_since = None
+        self._ready.clear()
+        return batch
+
+
+class _Poller:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.subscribers: Set[Subscriber] = set()
+        self.quote: Optional[dict] = None
+        self.task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.updates = 0
+        self.changed_at: Optional[float] = None
+
+
+class QuoteHub:
+    """Shared per-symbol pollers fanning quote changes out to subscribers."""
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[Dict[str, dict]]],
+                 interval: float = QUOTE_STREAM_INTERVAL, max_lag: float = QUOTE_STREAM_MAX_LAG):
+        self.fetch = fetch
+        self.interval = interval
+        self.max_lag = max_lag
+        self._pollers: Dict[str, _Poller] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._batch: Dict[str, asyncio.Future] = {}
+        self._flush: Optional[asyncio.Task] = None
+        self.counters = {"fetches": 0, "fetch_errors": 0, "slow_disconnects": 0, "conflated": 0,
+                         "rejected": 0}
+
+    # ── subscriptions ──
+
+    def check_capacity(self, symbols: Iterable[str]):
+        """Raise CapacityError if a new subscriber to `symbols` would be rejected right now."""
+        new = {s for s in symbols if s not in self._pollers}
+        if len(self._subscribers) >= QUOTE_STREAM_MAX_SUBSCRIBERS or \
+                len(self._pollers) + len(new) > QUOTE_STREAM_MAX_POLLERS:
+            self.counters["rejected"] += 1
+            raise CapacityError("Too many open quote streams — try again later")
+
+    def subscribe(self, sub: Subscriber, symbols: Iterable[str]):
+        """Raises ValueError past the per-subscriber limit, CapacityError past the process limits
+        (symbols before the offending one stay subscribed)."""
+        if sub not in self._subscribers:
+            if len(self._subscribers) >= QUOTE_STREAM_MAX_SUBSCRIBERS:
+                self.counters["rejected"] += 1
+                raise CapacityError("Too many open quote streams — try again later")
+            self._subscribers.add(sub)
+        for symbol in symbols:
+            if symbol in sub.symbols:
+                continue
+            if len(sub.symbols) >= QUOTE_STREAM_MAX_SYMBOLS:
+                raise ValueError(f"At most {QUOTE_STREAM_MAX_SYMBOLS} symbols per subscription")
+            poller = self._pollers.get(symbol)
+            if poller is None:
+                if len(self._pollers) >= QUOTE_STREAM_MAX_POLLERS:
+                    self.counters["rejected"] += 1
+                    raise CapacityError("Too many symbols being streamed — try again later")
+                poller = self._pollers[symbol] = _Poller(symbol)
+                poller.task = asyncio.create_task(self._poll(poller))
+            sub.symbols.add(symbol)
+            poller.subscribers.add(sub)
+            if poller.quote:
+                sub.push(symbol, poller.quote)  # current price right away, not at the next change
+
+    def unsubscribe(self, sub: Subscriber, symbols: Optional[Iterable[str]] = None):
+        for symbol in list(symbols if symbols is not None else sub.symbols):
+            sub.symbols.discard(symbol)
+            sub.pending.pop(symbol, None)
+            poller = self._pollers.get(symbol)
+            if not poller:
+                continue
+            poller.subscribers.discard(sub)
+            if not poller.subscribers:
+                poller.task.cancel()
+                del self._pollers[symbol]
+        if symbols is None:
+            self.counters["conflated"] += sub.conflated
+            sub.conflated = 0
+            self._subscribers.discard(sub)
+
+    # ── polling ──
+
+    async def _poll(self, poller: _Poller):
+        while True:
+            # Align to a shared grid so symbols due together are fetched in one batch
+            if poller.polls:
+                delay = self.interval - time.time() % self.interval
+                await asyncio.sleep(delay if delay > self.interval * 0.1 else delay + self.interval)
+            try:
+                quote = await self._get(poller.symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["fetch_errors"] += 1
+                print(f"⚠️ Quote stream poll failed for {poller.symbol}: {e}")
+                continue
+            finally:
+                poller.polls += 1
+            if quote and quote.get("price") and quote != poller.quote:
+                poller.quote = quote
+                poller.updates += 1
+                poller.changed_at = time.time()
+                self._fan_out(poller, quote)
+
+    def _fan_out(self, poller: _Poller, quote: dict):
+        for sub in list(poller.subscribers):
+            if sub.lag() > self.max_lag:
+                # Not reading at all — stop holding state for it
+                self.counters["slow_disconnects"] += 1
+                self.unsubscribe(sub)
+                sub.close()
+                continue
+            sub.push(poller.symbol, quote)
+
+    async def _get(self, symbol: str) -> Optional[dict]:
+        future = self._batch.get(symbol)
+        if future is None:
+            future = self._batch[symbol] = asyncio.get_running_loop().create_future()
+        if self._flush is None:
+            self._flush = asyncio.create_task(self._flush_batch())
+        return await asyncio.shield(future)
+
+    async def _flush_batch(self):
+        await asyncio.sleep(BATCH_WINDOW)
+        batch, self._batch, self._flush = self._batch, {}, None
+        self.counters["fetches"] += 1
+        try:
+            quotes = await self.fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for symbol, future in batch.items():
+            future.set_result(quotes.get(symbol))
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "symbols": {
+                symbol: {
+                    "subscribers": len(p.subscribers),
+                    "price": p.quote["price"] if p.quote else None,
+                    "polls": p.polls,
+                    "updates": p.updates,
+                    "changed_at": p.changed_at,
+                }
+                for symbol, p in sorted(self._pollers.items(), key=lambda kv: -len(kv[1].subscribers))
+            },
+            "interval_seconds": self.interval,
+            **self.counters,
+            "conflated": self.counters["conflated"] + sum(s.conflated for s in self._subscribers),
+        }
+
+
+hub = QuoteHub(get_quotes)
+
+router = APIRouter(prefix="/api/market-data", tags=["market-data"])
+
+
+def _symbols(tickers) -> List[str]:
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    if not all(isinstance(t, str) for t in tickers):
+        raise ValueError("Tickers must be strings")
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    if any(len(s) > 10 for s in symbols):
+        raise ValueError("Invalid ticker")
+    return symbols
+
+
+@router.get("/stream/stats")
+async def quote_stream_stats(x_admin_token: Optional[str] = Header(None)):
+    """Pollers, subscribers per symbol, and backpressure counters for this process."""
+    require_admin(x_admin_token)
+    return hub.stats()
+
+
+@router.get("/stream")
+async def stream_quotes(tickers: str):
+    """
+    Server-sent events: a `quote` event ({"symbol", "price", "change", "percent"}) with the
+    current price of each ticker, then one whenever a price changes.
+    Example: /api/market-data/stream?tickers=AAPL,MSFT,TSLA
+    """
+    try:
+        symbols = _symbols(tickers)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not symbols:
+        raise HTTPException(400, "No tickers given")
+    if len(symbols) > QUOTE_STREAM_MAX_SYMBOLS:
+        raise HTTPException(400, f"At most {QUOTE_STREAM_MAX_SYMBOLS} tickers per stream")
+
+    try:
+        hub.check_capacity(symbols)
+    except CapacityError as e:
+        raise HTTPException(503, str(e))
+    return StreamingResponse(
+        _quote_events(symbols),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _quote_events(symbols: List[str]):
+    # Subscribed here, not in the handler: a client that disconnects before the first
+    # read never starts this generator, and its pollers would never be released
+    sub = Subscriber()
+    try:
+        try:
+            hub.subscribe(sub, symbols)
+        except CapacityError as e:  # filled up since the handler's check
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        while not sub.closed:
+            batch = await sub.next(QUOTE_STREAM_HEARTBEAT)
+            if not batch:
+                yield ": ping\n\n"
+                continue
+            for symbol, quote in batch.items():
+                yield f"event: quote\ndata: {json.dumps({'symbol': symbol, **quote})}\n\n"
+    finally:
+        hub.unsubscribe(sub)
+
+
+@router.websocket("/ws")
+async def quote_socket(websocket: WebSocket):
+    """
+    Client → server: {"subscribe": ["AAPL", ...]} or {"unsubscribe": [...]} at any time.
+    Server → client: {"type": "quote", "symbol", "price", "change", "percent"} on every change,
+    {"type": "error", "detail"} for a rejected message.
+    """
+    await websocket.accept()
+    sub = Subscriber()
+
+    async def reader():
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError('Expected {"subscribe": [...]} or {"unsubscribe": [...]}')
+                if "subscribe" in message:
+                    hub.subscribe(sub, _symbols(message["subscribe"]))
+                if "unsubscribe" in message:
+                    hub.unsubscribe(sub, _symbols(message["unsubscribe"]))
+            except (TypeError, ValueError) as e:  # includes invalid JSON and CapacityError
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+    async def writer():
+        while not sub.closed:
+            for symbol, quote in (await sub.next(QUOTE_STREAM_HEARTBEAT)).items():
+                await websocket.send_json({"type": "quote", "symbol": symbol, **quote})
+
+    # Either side ending (client gone, or dropped as too slow) ends the connection
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(writer())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)  # WebSocketDisconnect lands here
+        hub.unsubscribe(sub)
+        if sub.closed:
+            try:
+                await websocket.close(code=1013)  # try again later: too slow to keep up
+            except Exception:
+                pass
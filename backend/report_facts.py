@@ -0,0 +1,349 @@
+"""
+Stock Fortress — Verified Report Facts
+=======================================
+Hard numbers (price, market cap, multiples, latest quarter, balance sheet) come from
+market data, not from the model. They are fetched alongside generation, handed to the model
+as verified facts (so it doesn't spend grounded searches looking them up), and written over
+the matching report fields afterwards. Technical and risk metrics (volatility, drawdown,
+beta vs SPY, RSI, moving averages) computed locally by market_metrics join them as
+prompt-only facts.
+
+Between regenerations, the price-sensitive fields (price, market cap, multiples, upside to
+the DCF / scenario targets) are patched from live quotes — again without a model call.
+
+Usage:
+    facts = await gather_facts("AAPL")         # {} when market data is unavailable
+    prompt += facts_prompt(facts)
+    apply_facts(report, facts)                 # overwrites + records meta.verified_data
+    refresh_live_fields(report, price)         # intraday patch + records meta.live_data
+
+Configuration via .env:
+    REPORT_FACTS_ENABLED=true
+    REPORT_FACTS_TIMEOUT_SECONDS=4   # Max wait for facts before the model call starts without them
+                                     # (metrics get 3/4 of it; a first-time history download
+                                     # finishes in the background for the next report)
+    REPORT_LIVE_REFRESH_MINUTES=15   # Min interval between live patches of a cached report
+"""
+
+import os
+import re
+import time
+import asyncio
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+REPORT_FACTS_ENABLED = os.environ.get("REPORT_FACTS_ENABLED", "true").lower() == "true"
+REPORT_FACTS_TIMEOUT = float(os.environ.get("REPORT_FACTS_TIMEOUT_SECONDS", "4"))
+REPORT_LIVE_REFRESH_MINUTES = float(os.environ.get("REPORT_LIVE_REFRESH_MINUTES", "15"))
+
+try:
+    from market_data import get_fundamentals
+except ImportError as e:
+    get_fundamentals = None
+    print(f"⚠️ Report facts disabled (market data unavailable): {e}")
+
+try:
+    from market_metrics import compute_metrics, METRICS_BENCHMARK
+except ImportError as e:
+    compute_metrics, METRICS_BENCHMARK = None, "SPY"
+    print(f"⚠️ Report metrics disabled (metrics engine unavailable): {e}")
+
+# fact key -> (report section, field) it overwrites; facts without a field only go in the prompt
+FACT_FIELDS = {
+    "company_name": ("meta", "company_name"),
+    "sector": ("meta", "sector"),
+    "current_price": ("meta", "current_price"),
+    "market_cap": ("meta", "market_cap"),
+    "trailing_pe": ("meta", "trailing_pe"),
+    "forward_pe": ("meta", "forward_pe"),
+    "fifty_two_week_range": ("meta", "fifty_two_week_range"),
+    "avg_volume": ("meta", "avg_volume"),
+    "beta": ("meta", "beta"),
+    "revenue_latest": ("step_2_check_the_financials", "revenue_latest"),
+    "revenue_growth_yoy": ("step_2_check_the_financials", "revenue_growth_yoy"),
+    "eps_latest": ("step_2_check_the_financials", "eps_latest"),
+    "net_income_latest": ("step_2_check_the_financials", "net_income_latest"),
+    "gross_margin": ("step_2_check_the_financials", "gross_margin"),
+    "free_cash_flow_latest": ("step_2_check_the_financials", "free_cash_flow_latest"),
+    "cash_position": ("step_2_check_the_financials", "cash_position"),
+    "price_to_sales": ("step_6_valuation_reality_check", "price_to_sales"),
+    "ev_ebitda": ("step_6_valuation_reality_check", "ev_ebitda_if_relevant"),
+}
+
+_LABELS = {
+    "trailing_pe": "Trailing P/E",
+    "forward_pe": "Forward P/E",
+    "fifty_two_week_range": "52-week range",
+    "avg_volume": "Average volume",
+    "revenue_latest": "Revenue (latest quarter)",
+    "revenue_growth_yoy": "Revenue growth YoY (latest quarter)",
+    "eps_latest": "Diluted EPS (latest quarter)",
+    "net_income_latest": "Net income (latest quarter)",
+    "free_cash_flow_latest": "Free cash flow (latest quarter)",
+    "cash_position": "Cash",
+    "price_to_sales": "Price/sales (TTM)",
+    "ev_ebitda": "EV/EBITDA",
+    "total_debt": "Total debt",
+    "debt_to_equity": "Debt-to-equity",
+    "current_ratio": "Current ratio",
+    "quick_ratio": "Quick ratio",
+    "shares_outstanding": "Shares outstanding",
+    "trailing_eps": "Trailing EPS (TTM)",
+    "free_cash_flow_ttm": "Free cash flow (TTM)",
+    "beta_1y": f"Beta vs {METRICS_BENCHMARK} (1y daily returns)",
+    "volatility_1m": "Realized volatility (1 month, annualized)",
+    "volatility_1y": "Realized volatility (1 year, annualized)",
+    "max_drawdown_1y": "Max drawdown (1 year)",
+    "return_1y": "Total return (1 year)",
+    "rsi_14": "RSI (14-day)",
+    "sma_50": "50-day moving average",
+    "sma_200": "200-day moving average",
+    "price_vs_sma_200": "Price vs 200-day average",
+}
+
+
+def _money(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    sign, value = ("-" if value < 0 else ""), abs(value)
+    for unit, size in (("T", 1e12), ("B", 1e9), ("M", 1e6)):
+        if value >= size:
+            return f"{sign}${value / size:.2f}{unit}"
+    return f"{sign}${value:,.2f}"
+
+
+def _number(value: Optional[float], digits: int = 2) -> Optional[str]:
+    return f"{value:,.{digits}f}" if value is not None else None
+
+
+def _percent(value: Optional[float]) -> Optional[str]:
+    return f"{value * 100:.1f}%" if value is not None else None
+
+
+def _points(value: Optional[float], sign: str = "") -> Optional[str]:
+    """A value already in percent (28.4 → "28.4%")."""
+    return f"{value:{sign}.1f}%" if value is not None else None
+
+
+def format_facts(raw: Dict[str, Any], metrics: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Raw market-data numbers (+ market_metrics row) → report-ready strings keyed like FACT_FIELDS / _LABELS."""
+    metrics = metrics or {}
+    price = raw.get("currentPrice") or raw.get("regularMarketPrice")
+    quarter = raw.get("quarterEnd")
+
+    def quarterly(value: Optional[str], end: Optional[str] = quarter) -> Optional[str]:
+        return f"{value} (quarter ended {end})" if value and end else value
+
+    growth = None
+    if raw.get("quarterRevenue") and raw.get("quarterRevenueYearAgo"):
+        growth = raw["quarterRevenue"] / raw["quarterRevenueYearAgo"] - 1
+
+    facts = {
+        "company_name": raw.get("longName"),
+        "sector": raw.get("sector"),
+        "current_price": f"${price:,.2f}" if price else None,
+        "market_cap": _money(raw.get("marketCap")),
+        "trailing_pe": _number(raw.get("trailingPE"), 1),
+        "forward_pe": _number(raw.get("forwardPE"), 1),
+        "fifty_two_week_range": (f"${raw['fiftyTwoWeekLow']:,.2f} - ${raw['fiftyTwoWeekHigh']:,.2f}"
+                                 if raw.get("fiftyTwoWeekLow") and raw.get("fiftyTwoWeekHigh") else None),
+        "avg_volume": _number(raw.get("averageVolume"), 0),
+        "beta": _number(raw.get("beta") if raw.get("beta") is not None else metrics.get("beta_1y")),
+        "revenue_latest": quarterly(_money(raw.get("quarterRevenue"))),
+        "revenue_growth_yoy": _percent(growth),
+        "eps_latest": quarterly(f"${raw['quarterEps']:.2f}" if raw.get("quarterEps") is not None else None),
+        "net_income_latest": quarterly(_money(raw.get("quarterNetIncome"))),
+        "gross_margin": _percent(raw.get("grossMargins")),
+        "free_cash_flow_latest": quarterly(_money(raw.get("quarterFreeCashFlow")), raw.get("freeCashFlowQuarterEnd")),
+        "cash_position": _money(raw.get("totalCash")),
+        "price_to_sales": _number(raw.get("priceToSalesTrailing12Months")),
+        "ev_ebitda": _number(raw.get("enterpriseToEbitda")),
+        "total_debt": _money(raw.get("totalDebt")),
+        "debt_to_equity": _number(raw.get("debtToEquity") / 100 if raw.get("debtToEquity") else None),
+        "current_ratio": _number(raw.get("currentRatio")),
+        "quick_ratio": _number(raw.get("quickRatio")),
+        "shares_outstanding": _number(raw.get("sharesOutstanding"), 0),
+        "trailing_eps": f"${raw['trailingEps']:.2f}" if raw.get("trailingEps") is not None else None,
+        "free_cash_flow_ttm": _money(raw.get("freeCashflow")),
+        "beta_1y": _number(metrics.get("beta_1y")),
+        "volatility_1m": _points(metrics.get("volatility_1m_pct")),
+        "volatility_1y": _points(metrics.get("volatility_1y_pct")),
+        "max_drawdown_1y": _points(metrics.get("max_drawdown_1y_pct")),
+        "return_1y": _points(metrics.get("return_1y_pct"), "+"),
+        "rsi_14": _number(metrics.get("rsi_14"), 1),
+        "sma_50": f"${metrics['sma_50']:,.2f}" if metrics.get("sma_50") else None,
+        "sma_200": f"${metrics['sma_200']:,.2f}" if metrics.get("sma_200") else None,
+        "price_vs_sma_200": _points(metrics.get("price_vs_sma_200_pct"), "+"),
+    }
+    return {key: value for key, value in facts.items() if value}
+
+
+async def gather_facts(ticker: str) -> Dict[str, str]:
+    """Formatted facts for `ticker` ({} if disabled or market data fails)."""
+    if not REPORT_FACTS_ENABLED or get_fundamentals is None:
+        return {}
+    deadline = time.monotonic() + REPORT_FACTS_TIMEOUT * 0.75
+    metrics_task = asyncio.create_task(_metrics(ticker)) if compute_metrics else None
+    try:
+        raw = await get_fundamentals(ticker)
+    except Exception as e:
+        print(f"⚠️ Report facts unavailable for {ticker}: {e}")
+        raw = {}
+    metrics = None
+    if metrics_task:
+        # Not cancelled when late: a first history download still lands for the next report
+        done, _ = await asyncio.wait({metrics_task}, timeout=max(0.0, deadline - time.monotonic()))
+        metrics = metrics_task.result() if done else None
+    return format_facts(raw, metrics)
+
+
+async def _metrics(ticker: str) -> Optional[Dict[str, Any]]:
+    try:
+        return (await compute_metrics([ticker]))["metrics"].get(ticker)
+    except Exception as e:
+        print(f"⚠️ Report metrics unavailable for {ticker}: {e}")
+        return None
+
+
+def facts_prompt(facts: Dict[str, str]) -> str:
+    """Prompt block handing the verified numbers to the model."""
+    if not facts:
+        return ""
+    lines = []
+    for key, value in facts.items():
+        label = _LABELS.get(key) or key.replace("_", " ").capitalize()
+        lines.append(f"- {label}: {value}")
+    return (
+        f"\n\nVERIFIED MARKET DATA (Yahoo Finance, as of {date.today().isoformat()}). Use these exact "
+        "values — do NOT search for them again; spend your searches on earnings context, news, "
+        "guidance, risks and competition instead:\n" + "\n".join(lines)
+    )
+
+
+def apply_facts(report: Dict[str, Any], facts: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Overwrite report fields with the verified facts and record which ones (meta.verified_data).
+    Works on a partial report too (e.g. one streamed section).
+    """
+    verified = [f"{section}.{field}" for key, (section, field) in FACT_FIELDS.items() if key in facts]
+    for key, (section, field) in FACT_FIELDS.items():
+        if key in facts and isinstance(report.get(section), dict):
+            report[section][field] = facts[key]
+    if verified and isinstance(report.get("meta"), dict):
+        report["meta"]["verified_data"] = {
+            "source": "Yahoo Finance",
+            "as_of": date.today().isoformat(),
+            "fields": verified,
+        }
+    return report
+
+
+# ─── INTRADAY LIVE REFRESH ───
+# Between regenerations only the price moves; everything price-derived is rescaled from the
+# values the report was generated with (kept in meta.live_data.base), never compounded.
+
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+_UNITS = {"t": 1e12, "trillion": 1e12, "b": 1e9, "billion": 1e9, "m": 1e6, "million": 1e6}
+_MONEY = re.compile(r"\$?\s*(-?\d[\d,]*(?:\.\d+)?)\s*(trillion|billion|million|t|b|m)?\b", re.I)
+_IMPLIED_PRICE = re.compile(r"implied share price[^$\d]*\$?\s*(\d[\d,]*(?:\.\d+)?)", re.I)
+
+# report field -> how it moves with the price ("price", "scale" = proportional)
+LIVE_FIELDS = {
+    ("meta", "current_price"): "price",
+    ("meta", "market_cap"): "scale_money",
+    ("meta", "trailing_pe"): "scale",
+    ("meta", "forward_pe"): "scale",
+    ("step_6_valuation_reality_check", "price_to_sales"): "scale",
+}
+_TARGETS = {
+    "dcf": "simple_dcf_implied_value",
+    "base_case": "base_case_target",
+    "bull_case": "bull_case_target",
+    "bear_case": "bear_case_target",
+}
+
+
+def _parse_number(text: Any) -> Optional[float]:
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER.search(str(text or ""))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def _parse_money(text: Any) -> Optional[float]:
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _MONEY.search(str(text or ""))
+    if not match:
+        return None
+    return float(match.group(1).replace(",", "")) * _UNITS.get((match.group(2) or "").lower(), 1)
+
+
+def _target_price(valuation: Dict[str, Any], name: str) -> Optional[float]:
+    text = str(valuation.get(_TARGETS[name]) or "")
+    if name == "dcf":
+        match = _IMPLIED_PRICE.search(text)
+        return float(match.group(1).replace(",", "")) if match else None
+    return _parse_money(text)
+
+
+def _base_values(report: Dict[str, Any]) -> Dict[str, float]:
+    """Numbers the report was generated with (the reference every refresh rescales)."""
+    base = {}
+    for (section, field), kind in LIVE_FIELDS.items():
+        raw = (report.get(section) or {}).get(field)
+        value = _parse_money(raw) if kind == "scale_money" else _parse_number(raw)
+        if value:
+            base[f"{section}.{field}"] = value
+    return base
+
+
+def refresh_live_fields(report: Dict[str, Any], price: float) -> List[str]:
+    """
+    Patch the price-sensitive fields of `report` in place for a live `price` — no model call.
+
+    Returns:
+        The fields that changed (also recorded with timestamps in meta.live_data)
+    """
+    meta = report.get("meta")
+    if not isinstance(meta, dict) or not price:
+        return []
+    live = meta.setdefault("live_data", {"source": "Yahoo Finance", "fields": {}})
+    base = live.setdefault("base", _base_values(report))
+    base_price = base.get("meta.current_price")
+    if not base_price:
+        return []
+
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    ratio = price / base_price
+    changed = []
+    for (section, field), kind in LIVE_FIELDS.items():
+        path = f"{section}.{field}"
+        if path not in base or not isinstance(report.get(section), dict):
+            continue
+        if kind == "price":
+            value = f"${price:,.2f}"
+        elif kind == "scale_money":
+            value = _money(base[path] * ratio)
+        else:
+            value = _number(base[path] * ratio, 1)
+        if report[section].get(field) != value:
+            report[section][field] = value
+            live["fields"][path] = now
+            changed.append(path)
+
+    valuation = report.get("step_6_valuation_reality_check")
+    if isinstance(valuation, dict):
+        upside = {}
+        for name in _TARGETS:
+            target = _target_price(valuation, name)
+            if target:
+                upside[name] = f"{(target / price - 1) * 100:+.1f}%"
+        if upside and valuation.get("live_upside") != upside:
+            valuation["live_upside"] = upside
+            live["fields"]["step_6_valuation_reality_check.live_upside"] = now
+            changed.append("step_6_valuation_reality_check.live_upside")
+
+    live["price"] = price
+    live["refreshed_at"] = now
+    return changed
@@ -0,0 +1,231 @@
+"""
+Stock Fortress — Typed Report Schema
+=====================================
+Pydantic models mirroring the JSON structure in SYSTEM_PROMPT. They serve two purposes:
+
+  • structured output — passed as `response_schema` so providers that support it
+    (LiteLLM JSON mode, ungrounded Gemini calls) are constrained to the report shape
+  • validation — every generated section is checked here, so only the sections that
+    are actually broken get regenerated
+
+Usage:
+    report, invalid = validate_report(sections)   # invalid: {section_key: error}
+    Model = section_model(["step_7_verdict", "investor_gut_check"])
+    empty = placeholder_section("step_4_know_the_risks")   # when regeneration fails too
+"""
+
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model, field_validator
+
+
+class _Section(BaseModel):
+    # Models often emit numbers for "price"-like text fields. Keys outside the schema are
+    # dropped (extra="allow" would put additionalProperties into Gemini's response_schema).
+    model_config = ConfigDict(coerce_numbers_to_str=True, extra="ignore")
+
+
+class Meta(_Section):
+    ticker: str
+    company_name: str
+    sector: str = ""
+    current_price: str = ""
+    market_cap: str = ""
+    trailing_pe: str = ""
+    forward_pe: str = ""
+    fifty_two_week_range: str = ""
+    avg_volume: str = ""
+    beta: str = ""
+    report_date: str = ""
+    data_freshness_note: str = ""
+
+
+class KnowWhatYouOwn(_Section):
+    one_liner: str
+    how_it_makes_money: str
+    key_products_or_services: List[str] = []
+    customer_type: str = ""
+    pass_fail: str = ""
+
+
+class RevenueSegment(_Section):
+    segment: str
+    percentage: Optional[float] = None
+    revenue: str = ""
+
+    @field_validator("percentage", mode="before")
+    @classmethod
+    def _strip_percent(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            value = value.strip().rstrip("%").strip()
+            return value or None
+        return value
+
+
+class Financials(_Section):
+    latest_quarter: str
+    revenue_latest: str = ""
+    revenue_growth_yoy: str = ""
+    revenue_beat_miss: str = ""
+    eps_latest: str = ""
+    eps_beat_miss: str = ""
+    net_income_latest: str = ""
+    profitable: Optional[bool] = None
+    gross_margin: str = ""
+    operating_margin_trend: str = ""
+    debt_level: str = ""
+    free_cash_flow_latest: str = ""
+    cash_position: str = ""
+    financial_health_grade: str
+    red_flags: List[str] = []
+    green_flags: List[str] = []
+    revenue_breakdown: List[RevenueSegment] = []
+
+
+class EarningsReview(_Section):
+    one_time_items: str = ""
+    segment_breakdown: str = ""
+    guidance_changes: str = ""
+    management_tone: str = ""
+    analyst_reaction: str = ""
+    forward_statements_note: str = ""
+
+
+class Story(_Section):
+    bull_case: str
+    base_case: str
+    bear_case: str
+    what_must_go_right: List[str] = []
+    what_could_break_the_story: List[str] = []
+    macro_overlay: str = ""
+    catalyst_timeline: List[str] = []
+
+
+class Risk(_Section):
+    risk: str
+    severity: str = ""
+    likelihood: str = ""
+    explanation: str = ""
+
+
+class Risks(_Section):
+    top_risks: List[Risk] = Field(min_length=1)
+    ownership_signals: str = ""
+    regulatory_exposure: str = ""
+    concentration_risk: str = ""
+
+
+class Competitor(_Section):
+    name: str
+    why_compete: str = ""
+    their_advantage: str = ""
+
+
+class Competition(_Section):
+    main_competitors: List[Competitor] = []
+    moat_strength: str
+    moat_explanation: str = ""
+
+
+class Valuation(_Section):
+    current_pe: str = ""
+    forward_pe: str = ""
+    sector_or_peer_avg_pe: str = ""
+    price_to_sales: str = ""
+    ev_ebitda_if_relevant: str = ""
+    simple_dcf_implied_value: str = ""
+    is_it_expensive: str
+    valuation_context: str = ""
+    base_case_target: str = ""
+    bull_case_target: str = ""
+    bear_case_target: str = ""
+
+
+class Verdict(_Section):
+    action: str
+    confidence: str
+    one_line_reason: str
+    what_signal_would_change_this: str = ""
+    most_important_metric_to_track: str = ""
+    suggested_revisit_date: str = ""
+
+
+class GutCheck(_Section):
+    question_1: str
+    question_2: str = ""
+    question_3: str = ""
+    question_4: str = ""
+    question_5: Optional[str] = None
+    mindset_reminder: str = ""
+
+
+SECTION_MODELS: Dict[str, type] = {
+    "meta": Meta,
+    "step_1_know_what_you_own": KnowWhatYouOwn,
+    "step_2_check_the_financials": Financials,
+    "step_2a_earnings_and_guidance_review": EarningsReview,
+    "step_3_understand_the_story": Story,
+    "step_4_know_the_risks": Risks,
+    "step_5_check_the_competition": Competition,
+    "step_6_valuation_reality_check": Valuation,
+    "step_7_verdict": Verdict,
+    "investor_gut_check": GutCheck,
+}
+
+_section_models: Dict[Tuple[str, ...], type] = {}
+
+
+def section_model(keys: List[str]) -> type:
+    """A model covering just these top-level sections (for sectioned / targeted generation)."""
+    key = tuple(keys)
+    if key not in _section_models:
+        _section_models[key] = create_model("ReportSections", **{k: (SECTION_MODELS[k], ...) for k in keys})
+    return _section_models[key]
+
+
+Report = create_model("Report", **{k: (model, ...) for k, model in SECTION_MODELS.items()})
+
+
+def validate_report(sections: Dict[str, Any], keys: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Validate each expected section on its own.
+
+    Returns:
+        (valid sections normalized to plain JSON, {section_key: error} for missing/invalid ones)
+    """
+    valid: Dict[str, Any] = {}
+    invalid: Dict[str, str] = {}
+    for key in keys or list(SECTION_MODELS):
+        if key not in sections:
+            invalid[key] = "missing"
+            continue
+        try:
+            valid[key] = SECTION_MODELS[key].model_validate(sections[key]).model_dump(mode="json")
+        except ValidationError as e:
+            invalid[key] = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()[:5])
+    return valid, invalid
+
+
+def placeholder_section(key: str) -> Dict[str, Any]:
+    """
+    Empty stand-in for a section that could not be generated: every field at its default,
+    required text as "", required lists as [], nested sections filled the same way.
+    """
+    return _placeholder(SECTION_MODELS[key])
+
+
+def _placeholder(model: type) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, field in model.model_fields.items():
+        if not field.is_required():
+            out[name] = field.get_default(call_default_factory=True)
+        elif typing.get_origin(field.annotation) in (list, List):
+            out[name] = []
+        elif isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+            out[name] = _placeholder(field.annotation)
+        elif field.annotation is str:
+            out[name] = ""
+        else:
+            out[name] = None
+    return out
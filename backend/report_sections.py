@@ -0,0 +1,140 @@
+"""
+Stock Fortress — Sectioned Report Generation
+=============================================
+Splits the 7-step report schema into independent section groups, generates them
+concurrently, and merges them back into the exact single-call report shape.
+
+Groups can depend on other groups (the verdict needs the findings of every other
+section); a dependent group starts as soon as its dependencies finish, so wall-clock
+time approaches the slowest independent group plus the (short) verdict call.
+
+Usage:
+    report = await generate_sectioned(REPORT_SCHEMA, run_group)
+    # run_group(group, sub_schema, upstream_sections) -> dict of that group's sections
+
+    report = await regenerate_sections(REPORT_SCHEMA, report, ["step_4_know_the_risks"], run_group)
+    # re-runs only the broken sections, leaving the rest of the report untouched
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class SectionGroup:
+    """A set of top-level report sections generated by one model call."""
+
+    def __init__(self, name: str, sections: List[str], depends_on: List[str] = None,
+                 grounded: bool = True):
+        self.name = name
+        self.sections = sections
+        self.depends_on = depends_on or []
+        self.grounded = grounded  # needs Google Search (vs. reasoning over upstream sections)
+
+    def __repr__(self):
+        return f"SectionGroup({self.name!r})"
+
+
+# Order matters: a group may only depend on groups listed before it.
+SECTION_GROUPS = [
+    SectionGroup("snapshot", ["meta", "step_1_know_what_you_own",
+                              "step_2_check_the_financials", "step_2a_earnings_and_guidance_review"]),
+    SectionGroup("story", ["step_3_understand_the_story", "step_5_check_the_competition"]),
+    SectionGroup("risks", ["step_4_know_the_risks"]),
+    SectionGroup("valuation", ["step_6_valuation_reality_check"]),
+    SectionGroup("verdict", ["step_7_verdict", "investor_gut_check"],
+                 depends_on=["snapshot", "story", "risks", "valuation"], grounded=False),
+]
+
+
+def _check_groups(groups: List[SectionGroup]):
+    seen = set()
+    for group in groups:
+        missing = [d for d in group.depends_on if d not in seen]
+        if missing:
+            raise ValueError(f"{group.name} depends on {missing}, which must be listed before it")
+        seen.add(group.name)
+
+
+_check_groups(SECTION_GROUPS)
+
+RunGroup = Callable[[SectionGroup, Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+async def generate_sectioned(schema: Dict[str, Any], run_group: RunGroup,
+                             groups: List[SectionGroup] = SECTION_GROUPS) -> Dict[str, Any]:
+    """
+    Generate every group concurrently (respecting dependencies) and merge the results.
+
+    Args:
+        schema: The full report schema (top-level section → shape)
+        run_group: Coroutine producing one group's sections, given its sub-schema and
+                   the merged sections of the groups it depends on
+        groups: Section groups to run; together they must cover the whole schema
+
+    Returns:
+        The merged report, with sections in schema order
+
+    Raises:
+        ValueError: if the groups don't cover the schema or a group omits a section
+    """
+    covered = [s for g in groups for s in g.sections]
+    uncovered = [key for key in schema if key not in covered]
+    if uncovered:
+        raise ValueError(f"Section groups don't cover: {uncovered}")
+
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(group: SectionGroup) -> Dict[str, Any]:
+        upstream: Dict[str, Any] = {}
+        for dep in group.depends_on:
+            upstream.update(await tasks[dep])
+        sub_schema = {key: schema[key] for key in group.sections}
+        result = await run_group(group, sub_schema, upstream)
+        missing = [key for key in group.sections if key not in result]
+        if missing:
+            raise ValueError(f"Section group '{group.name}' omitted {missing}")
+        return {key: result[key] for key in group.sections}
+
+    for group in groups:
+        tasks[group.name] = asyncio.create_task(run(group))
+
+    try:
+        results = await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    merged: Dict[str, Any] = {}
+    for result in results:
+        merged.update(result)
+    return {key: merged[key] for key in schema if key in merged}
+
+
+async def regenerate_sections(schema: Dict[str, Any], report: Dict[str, Any], keys: List[str],
+                              run_group: RunGroup,
+                              groups: List[SectionGroup] = SECTION_GROUPS) -> Dict[str, Any]:
+    """
+    Regenerate only `keys` of an otherwise-good report, reusing the group layout.
+
+    Each broken section is produced by a call scoped to its own group (same grounding),
+    with the report's intact sections from the group's dependencies as upstream findings.
+
+    Returns:
+        The report with `keys` replaced, in schema order
+    """
+    by_name = {g.name: g for g in groups}
+    partial = []
+    for group in groups:
+        wanted = [k for k in group.sections if k in keys]
+        if wanted:
+            deps = [d for d in group.depends_on if any(k in keys for k in by_name[d].sections)]
+            partial.append(SectionGroup(group.name, wanted, depends_on=deps, grounded=group.grounded))
+
+    async def run(group: SectionGroup, sub_schema: Dict[str, Any], upstream: Dict[str, Any]) -> Dict[str, Any]:
+        kept = {k: report[k] for d in by_name[group.name].depends_on
+                for k in by_name[d].sections if k in report and k not in keys}
+        return await run_group(group, sub_schema, {**kept, **upstream})
+
+    fixed = await generate_sectioned({k: schema[k] for k in schema if k in keys}, run, partial)
+    return {k: fixed[k] if k in fixed else report[k] for k in schema if k in fixed or k in report}
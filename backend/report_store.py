@@ -0,0 +1,332 @@
+"""
+Stock Fortress — Durable Report Store
+======================================
+Keeps EVERY generated report version per ticker (timestamp + model), so restarts and Redis
+flushes never throw away reports we paid an LLM to generate.
+
+  • Supabase/Postgres — shared by every replica; used automatically when SUPABASE_URL and
+    SUPABASE_SERVICE_ROLE_KEY are set
+  • SQLite — local file, zero setup. On Railway the container filesystem is wiped on every
+    deploy, so the file must live on a volume (startup warns loudly when it doesn't)
+
+On startup the backend warms the cache from the newest version of each recent ticker,
+and a cache miss reuses a stored version that is still within the hard TTL.
+
+Configuration via .env:
+    REPORT_STORE=auto                   # auto (supabase if configured, else sqlite) | sqlite | supabase | none
+    REPORT_STORE_PATH=data/reports.db   # SQLite file (relative to backend/; must be on a volume in prod)
+    REPORT_STORE_WARM_LIMIT=200         # Max tickers loaded into the cache at startup
+
+Supabase table:
+    create table report_versions (
+        id bigserial primary key,
+        ticker text not null,
+        created_at timestamptz not null default now(),
+        model text,
+        report jsonb not null
+    );
+    create index report_versions_ticker_created on report_versions (ticker, created_at desc);
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+
+REPORT_STORE = os.environ.get("REPORT_STORE", "auto").lower()
+REPORT_STORE_PATH = os.environ.get("REPORT_STORE_PATH", "data/reports.db")
+REPORT_STORE_WARM_LIMIT = int(os.environ.get("REPORT_STORE_WARM_LIMIT", "200"))
+
+
+# ─── SQLITE ───
+
+class SQLiteReportStore:
+    """Report versions in a local SQLite file. Blocking calls run in a worker thread."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = REPORT_STORE_PATH):
+        self.path = Path(path)
+        if not self.path.is_absolute():
+            self.path = Path(__file__).parent / self.path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS report_versions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ticker TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    model TEXT,
+                    report TEXT NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS report_versions_ticker_created "
+                       "ON report_versions (ticker, created_at DESC)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    async def save(self, ticker: str, report: dict, model: str, created_at: Optional[float] = None) -> dict:
+        created_at = created_at or time.time()
+
+        def insert():
+            with self._connect() as db:
+                cur = db.execute(
+                    "INSERT INTO report_versions (ticker, created_at, model, report) VALUES (?, ?, ?, ?)",
+                    (ticker, created_at, model, json.dumps(report)),
+                )
+                return cur.lastrowid
+
+        version_id = await asyncio.to_thread(insert)
+        return {"id": version_id, "ticker": ticker, "created_at": created_at, "model": model}
+
+    async def history(self, ticker: str, limit: int = 20) -> List[dict]:
+        def query():
+            with self._connect() as db:
+                return db.execute(
+                    "SELECT id, created_at, model FROM report_versions WHERE ticker = ? "
+                    "ORDER BY created_at DESC LIMIT ?", (ticker, limit),
+                ).fetchall()
+
+        rows = await asyncio.to_thread(query)
+        return [{"id": r[0], "ticker": ticker, "created_at": r[1], "model": r[2]} for r in rows]
+
+    async def get(self, ticker: str, version_id: Optional[int] = None) -> Optional[dict]:
+        """A specific version, or the latest one when version_id is None."""
+        def query():
+            with self._connect() as db:
+                if version_id is None:
+                    return db.execute(
+                        "SELECT id, created_at, model, report FROM report_versions WHERE ticker = ? "
+                        "ORDER BY created_at DESC LIMIT 1", (ticker,),
+                    ).fetchone()
+                return db.execute(
+                    "SELECT id, created_at, model, report FROM report_versions WHERE ticker = ? AND id = ?",
+                    (ticker, version_id),
+                ).fetchone()
+
+        row = await asyncio.to_thread(query)
+        if not row:
+            return None
+        return {"id": row[0], "ticker": ticker, "created_at": row[1], "model": row[2], "report": json.loads(row[3])}
+
+    async def latest_all(self, since: float, limit: int = REPORT_STORE_WARM_LIMIT) -> List[dict]:
+        """Newest version of every ticker generated after `since`, most recent first."""
+        def query():
+            with self._connect() as db:
+                return db.execute("""
+                    SELECT v.id, v.ticker, v.created_at, v.model, v.report
+                    FROM report_versions v
+                    JOIN (SELECT ticker, MAX(created_at) AS newest FROM report_versions
+                          WHERE created_at >= ? GROUP BY ticker) n
+                      ON v.ticker = n.ticker AND v.created_at = n.newest
+                    ORDER BY v.created_at DESC LIMIT ?
+                """, (since, limit)).fetchall()
+
+        rows = await asyncio.to_thread(query)
+        return [{"id": r[0], "ticker": r[1], "created_at": r[2], "model": r[3], "report": json.loads(r[4])}
+                for r in rows]
+
+
+# ─── SUPABASE / POSTGRES ───
+
+class SupabaseReportStore:
+    """Report versions in the Supabase `report_versions` table (service role)."""
+
+    name = "supabase"
+
+    def __init__(self):
+        from blog_engine import _get_sb
+        self._get_sb = _get_sb
+        if not _get_sb():
+            raise RuntimeError("Supabase not configured")
+
+    def _table(self):
+        return self._get_sb().table("report_versions")
+
+    async def save(self, ticker: str, report: dict, model: str, created_at: Optional[float] = None) -> dict:
+        row = {"ticker": ticker, "model": model, "report": report}
+        if created_at:
+            row["created_at"] = _iso(created_at)
+        result = await asyncio.to_thread(lambda: self._table().insert(row).execute())
+        saved = result.data[0] if result.data else row
+        return {"id": saved.get("id"), "ticker": ticker, "created_at": _epoch(saved.get("created_at")), "model": model}
+
+    async def history(self, ticker: str, limit: int = 20) -> List[dict]:
+        result = await asyncio.to_thread(lambda: self._table()
+                                         .select("id, created_at, model")
+                                         .eq("ticker", ticker)
+                                         .order("created_at", desc=True)
+                                         .limit(limit)
+                                         .execute())
+        return [{"id": r["id"], "ticker": ticker, "created_at": _epoch(r["created_at"]), "model": r.get("model")}
+                for r in (result.data or [])]
+
+    async def get(self, ticker: str, version_id: Optional[int] = None) -> Optional[dict]:
+        def query():
+            q = self._table().select("id, created_at, model, report").eq("ticker", ticker)
+            if version_id is None:
+                q = q.order("created_at", desc=True).limit(1)
+            else:
+                q = q.eq("id", version_id)
+            return q.execute()
+
+        result = await asyncio.to_thread(query)
+        if not result.data:
+            return None
+        r = result.data[0]
+        return {"id": r["id"], "ticker": ticker, "created_at": _epoch(r["created_at"]),
+                "model": r.get("model"), "report": r["report"]}
+
+    async def latest_all(self, since: float, limit: int = REPORT_STORE_WARM_LIMIT) -> List[dict]:
+        # PostgREST has no DISTINCT ON — read recent rows newest-first and keep the first per ticker
+        result = await asyncio.to_thread(lambda: self._table()
+                                         .select("id, ticker, created_at, model, report")
+                                         .gte("created_at", _iso(since))
+                                         .order("created_at", desc=True)
+                                         .limit(limit * 5)
+                                         .execute())
+        latest: Dict[str, dict] = {}
+        for r in (result.data or []):
+            if r["ticker"] not in latest:
+                latest[r["ticker"]] = {"id": r["id"], "ticker": r["ticker"], "created_at": _epoch(r["created_at"]),
+                                       "model": r.get("model"), "report": r["report"]}
+        return list(latest.values())[:limit]
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _epoch(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def _build_store():
+    backend = REPORT_STORE
+    if backend == "none":
+        return None
+    if backend == "auto":
+        configured = os.environ.get("SUPABASE_URL") and os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        backend = "supabase" if configured else "sqlite"
+    try:
+        store = SupabaseReportStore() if backend == "supabase" else SQLiteReportStore()
+        print(f"✅ Report store: {store.name}")
+    except Exception as e:
+        print(f"⚠️ Report store unavailable ({backend}): {e}")
+        return None
+    if store.name == "sqlite":
+        _check_persistent(store.path)
+    return store
+
+
+def _check_persistent(path: Path):
+    """On Railway, a SQLite file outside the attached volume is lost on every deploy."""
+    if not os.environ.get("RAILWAY_ENVIRONMENT"):
+        return
+    volume = os.environ.get("RAILWAY_VOLUME_MOUNT_PATH")
+    if not volume or not path.resolve().is_relative_to(Path(volume).resolve()):
+        print(f"🚨 Report store: {path} is not on a Railway volume — every stored report is lost on "
+              f"redeploy. Set SUPABASE_URL + SUPABASE_SERVICE_ROLE_KEY, or mount a volume and point "
+              f"REPORT_STORE_PATH into it.")
+
+
+store = _build_store()
+
+
+# ─── DIFF ───
+
+def _flatten(value: Any, prefix: str = "") -> Dict[str, Any]:
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            out.update(_flatten(v, f"{prefix}.{k}" if prefix else k))
+        return out
+    if isinstance(value, list):
+        out = {}
+        for i, v in enumerate(value):
+            out.update(_flatten(v, f"{prefix}[{i}]"))
+        return out or {prefix: []}
+    return {prefix: value}
+
+
+def diff_reports(before: dict, after: dict) -> List[dict]:
+    """Field-level changes between two reports, as dotted paths (lists by index)."""
+    old, new = _flatten(before), _flatten(after)
+    changes = []
+    for path in list(old) + [p for p in new if p not in old]:
+        if path not in new:
+            changes.append({"path": path, "change": "removed", "before": old[path]})
+        elif path not in old:
+            changes.append({"path": path, "change": "added", "after": new[path]})
+        elif old[path] != new[path]:
+            changes.append({"path": path, "change": "changed", "before": old[path], "after": new[path]})
+    return changes
+
+
+# ─── API ENDPOINTS ───
+
+router = APIRouter(prefix="/api/report", tags=["report-history"])
+
+
+def _require_store():
+    if not store:
+        raise HTTPException(503, "Report store not configured")
+
+
+def _clean_ticker(ticker: str) -> str:
+    ticker = ticker.upper().strip()
+    if not ticker or len(ticker) > 10:
+        raise HTTPException(400, "Invalid ticker")
+    return ticker
+
+
+@router.get("/{ticker}/history")
+async def report_history(ticker: str, limit: int = Query(20, ge=1, le=100)):
+    """Every stored version of a ticker's report (newest first, metadata only)."""
+    _require_store()
+    ticker = _clean_ticker(ticker)
+    return {"ticker": ticker, "versions": await store.history(ticker, limit)}
+
+
+@router.get("/{ticker}/history/{version_id}")
+async def report_version(ticker: str, version_id: int):
+    """One stored version of a ticker's report, in full."""
+    _require_store()
+    version = await store.get(_clean_ticker(ticker), version_id)
+    if not version:
+        raise HTTPException(404, "Version not found")
+    return version
+
+
+@router.get("/{ticker}/diff")
+async def report_diff(ticker: str, from_id: Optional[int] = None, to_id: Optional[int] = None):
+    """
+    Field-level diff between two versions. Defaults to the two most recent versions;
+    with only `from_id`, compares it against the latest.
+    """
+    _require_store()
+    ticker = _clean_ticker(ticker)
+    if from_id is None:
+        versions = await store.history(ticker, limit=2)
+        if len(versions) < 2:
+            raise HTTPException(404, "Need at least two versions to diff")
+        from_id = versions[1]["id"]
+        to_id = to_id or versions[0]["id"]
+
+    before = await store.get(ticker, from_id)
+    after = await store.get(ticker, to_id)
+    if not before or not after:
+        raise HTTPException(404, "Version not found")
+
+    changes = diff_reports(before["report"], after["report"])
+    meta = lambda v: {k: v[k] for k in ("id", "created_at", "model")}  # noqa: E731
+    return {"ticker": ticker, "from": meta(before), "to": meta(after), "count": len(changes), "changes": changes}
@@ -0,0 +1,168 @@
+"""
+Stock Fortress — Single-Flight Request Coalescing
+==================================================
+Collapses concurrent cache misses for the same key into ONE generation.
+
+  • Same process: followers await the leader's task instead of starting their own.
+  • Across workers/replicas: the leader holds a Redis lease (SET NX PX). Workers that
+    lose the race poll the shared cache until the leader publishes its result.
+
+Usage:
+    flight = SingleFlight(redis_client)   # redis.asyncio client (or None)
+    report = await flight.do("report:AAPL", generate, lookup=lambda: get_cache("report:AAPL"))
+
+Configuration via .env:
+    SINGLEFLIGHT_LEASE_TTL=180      # Seconds a lease lives without renewal
+    SINGLEFLIGHT_WAIT_TIMEOUT=240   # Max seconds a follower waits on another worker
+    SINGLEFLIGHT_POLL_INTERVAL=0.5  # Seconds between cache polls while waiting
+"""
+
+import os
+import uuid
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+LEASE_TTL = float(os.environ.get("SINGLEFLIGHT_LEASE_TTL", "180"))
+WAIT_TIMEOUT = float(os.environ.get("SINGLEFLIGHT_WAIT_TIMEOUT", "240"))
+POLL_INTERVAL = float(os.environ.get("SINGLEFLIGHT_POLL_INTERVAL", "0.5"))
+
+# Delete / extend the lease only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution."""
+
+    def __init__(self, redis_client=None, lease_ttl: float = LEASE_TTL,
+                 wait_timeout: float = WAIT_TIMEOUT, poll_interval: float = POLL_INTERVAL):
+        self.redis = redis_client
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "leaders": 0,             # calls that actually ran the work
+            "coalesced_local": 0,     # waited on a task in this process
+            "coalesced_remote": 0,    # got the result another worker published
+            "lease_timeouts": 0,      # gave up waiting on a remote lease and ran the work
+            "lease_errors": 0,        # Redis unavailable — fell back to local-only
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 lookup: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run `fn` once per key across all concurrent callers.
+
+        Args:
+            key: Coalescing key (e.g. "report:AAPL")
+            fn: Coroutine factory that produces (and publishes) the value
+            lookup: Reads the published value (sync or async), None while it still has to be
+                produced; checked after taking the lease and while another worker holds it
+
+        Returns:
+            The value produced by whichever caller led the flight
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced_local"] += 1
+        else:
+            task = asyncio.create_task(self._lead(key, fn, lookup))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        # Shield so one impatient caller can't cancel the work everyone else awaits
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def _lead(self, key: str, fn, lookup):
+        if not self.redis:
+            self.counters["leaders"] += 1
+            return await fn()
+
+        loop = asyncio.get_running_loop()
+        lease_key = f"lease:{key}"
+        token = uuid.uuid4().hex
+        deadline = loop.time() + self.wait_timeout
+
+        while True:
+            if await self._acquire(lease_key, token):
+                # The previous holder may have published right before releasing (possibly
+                # before we even tried), so only run the work if nothing is there yet
+                if lookup:
+                    value = await _call(lookup)
+                    if value is not None:
+                        await self._release(lease_key, token)
+                        self.counters["coalesced_remote"] += 1
+                        return value
+                self.counters["leaders"] += 1
+                renewer = asyncio.create_task(self._renew(lease_key, token))
+                try:
+                    return await fn()
+                finally:
+                    renewer.cancel()
+                    await self._release(lease_key, token)
+
+            # Another worker is generating — wait for it to publish
+            if lookup:
+                value = await _call(lookup)
+                if value is not None:
+                    self.counters["coalesced_remote"] += 1
+                    return value
+
+            if loop.time() >= deadline:
+                print(f"⚠️ SingleFlight: gave up waiting on {lease_key}, generating locally")
+                self.counters["lease_timeouts"] += 1
+                self.counters["leaders"] += 1
+                return await fn()
+
+            await asyncio.sleep(self.poll_interval)
+
+    # ─── REDIS LEASE ───
+
+    async def _acquire(self, lease_key: str, token: str) -> bool:
+        try:
+            return bool(await self.redis.set(lease_key, token, nx=True, px=int(self.lease_ttl * 1000)))
+        except Exception as e:
+            print(f"⚠️ SingleFlight lease error: {e}")
+            self.counters["lease_errors"] += 1
+            return True  # Redis down → behave like a single worker
+
+    async def _release(self, lease_key: str, token: str):
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, lease_key, token)
+        except Exception as e:
+            print(f"⚠️ SingleFlight release error: {e}")
+
+    async def _renew(self, lease_key: str, token: str):
+        """Keep the lease alive while a long generation is still running."""
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self.redis.eval(_RENEW_SCRIPT, 1, lease_key, token, int(self.lease_ttl * 1000))
+            except Exception as e:
+                print(f"⚠️ SingleFlight renew error: {e}")
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._inflight)}
+
+
+async def _call(fn):
+    value = fn()
+    return await value if inspect.isawaitable(value) else value
@@ -7,7 +7,8 @@ Architecture:
   2. Backend sends ticker + analysis prompt to Gemini API (with Google Search grounding)
   3. Gemini searches the web for real-time financial data
   4. Gemini returns structured JSON report
-  5. Backend caches result (24h) and returns to frontend
+  5. Backend caches result (6h fresh, served stale while refreshing up to 24h), keeps every version
+     in the durable report store, and returns to frontend
 
 Requirements:
   pip install fastapi uvicorn google-genai
@@ -18,9 +19,10 @@ Environment Variables:
 """
 
 import os
+import time
 import asyncio
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 from pathlib import Path
 from dotenv import load_dotenv
@@ -30,19 +32,40 @@ env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 
 # AI Provider (configurable: gemini, openai, anthropic, perplexity)
-from ai_provider import ai_generate, AI_PROVIDER, AI_MODEL
+from ai_provider import (ai_generate, ai_generate_stream, provider_stats, warm_clients, close_clients,
+                         served_model, track_served, AI_PROVIDER, AI_MODEL)
+from singleflight import SingleFlight
+from json_stream import SectionStreamParser
+from report_sections import generate_sectioned, regenerate_sections, SECTION_GROUPS
+from report_schema import Report, placeholder_section, section_model, validate_report
+from json_repair import salvage_sections
+from report_facts import (gather_facts, facts_prompt, apply_facts, refresh_live_fields, FACT_FIELDS,
+                          REPORT_FACTS_TIMEOUT, REPORT_LIVE_REFRESH_MINUTES)
 
 # ─── CONFIG ───
 GEMINI_KEY = os.environ.get("GEMINI_API_KEY", "")
+REPORT_GENERATION_MODE = os.environ.get("REPORT_GENERATION_MODE", "single").lower()  # single | sectioned
 
 app = FastAPI(title="Stock Fortress API", version="1.0")
 
+
+@app.on_event("startup")
+async def _warm_ai_clients():
+    # Build provider clients + open their keep-alive pools before the first report
+    await warm_clients()
+
+
+@app.on_event("shutdown")
+async def _close_ai_clients():
+    await close_clients()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Lock this down in production
@@ -60,12 +83,23 @@ except ImportError as e:
 
 # ── Market Data Router ──
 try:
-    from market_data import router as market_router
+    from market_data import router as market_router, get_quotes, quote_stats
+    from quote_stream import router as quote_stream_router
+    from price_history import router as price_history_router
+    from market_metrics import router as metrics_router
     app.include_router(market_router)
-    print("✅ Market Data routes mounted at /api/market-data/*")
+    app.include_router(quote_stream_router)
+    app.include_router(price_history_router)
+    app.include_router(metrics_router)
+    print("✅ Market Data routes mounted at /api/market-data/* (live quotes: /stream, /ws; /history, /metrics)")
 except ImportError as e:
+    get_quotes = quote_stats = None
     print(f"⚠️ Market Data module not loaded: {e}")
 
+# ── Admin / Pre-warm Router ──
+from prewarm import router as admin_router, scheduler as prewarmer, PREWARM_LEAD
+app.include_router(admin_router)
+
 # ── Blog Engine Router ──
 try:
     from blog_engine import router as blog_router, generate_blog_post
@@ -76,51 +110,30 @@ except ImportError as e:
     print(f"⚠️ Blog module not loaded: {e}")
 
 
-import redis
-
-# Simple in-memory cache (fallback)
-_cache = {}
-CACHE_TTL = timedelta(hours=24)
-
-# Redis Connection
-REDIS_URL = os.environ.get("REDIS_URL", "")
-redis_client = None
-if REDIS_URL and "YOUR_PASSWORD_HERE" not in REDIS_URL:
-    try:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True, socket_timeout=5)
-        print("✅ Redis client initialized")
-    except Exception as e:
-        print(f"⚠️ Redis init failed: {e}")
+# Tiered report cache: bounded in-process LRU (L1) in front of Redis (L2)
+from cache import (get_cache, get_cache_entry, get_cache_entries, get_cache_body, get_cache_blobs,
+                   set_cache, set_cache_many, cache_stats, close_redis, l1 as l1_cache, redis_client,
+                   CACHE_TTL)
 
-def get_cache(key: str) -> Optional[dict]:
-    # 1. Try Redis
-    if redis_client:
-        try:
-            data = redis_client.get(key)
-            if data:
-                return json.loads(data)
-        except Exception as e:
-            print(f"⚠️ Redis read error: {e}")
+# Durable store: every generated version per ticker (survives restarts and Redis flushes)
+from report_store import router as history_router, store as report_store
+app.include_router(history_router)
 
-    # 2. Fallback to Memory
-    if key in _cache:
-        entry = _cache[key]
-        if datetime.now() - entry["ts"] < CACHE_TTL:
-            return entry["data"]
-        del _cache[key]
-    return None
+# Priority job queue: plan-tiered, deduplicated, one global limit on concurrent generations
+from job_queue import (router as jobs_router, queue as job_queue, JobRunner, plan_for_token, queue_stats,
+                       runners as job_runners, DEFAULT_PLAN, JOB_RUN_IN_WEB)
+app.include_router(jobs_router)
 
+# Stale-while-revalidate: after the SOFT TTL a report is still served instantly (stale: true)
+# while one background refresh runs; only past the HARD TTL does a request block on generation.
+CACHE_SOFT_TTL = timedelta(hours=float(os.environ.get("REPORT_SOFT_TTL_HOURS", "6")))
 
-def set_cache(key: str, data: dict):
-    # 1. Try Redis
-    if redis_client:
-        try:
-            redis_client.setex(key, int(CACHE_TTL.total_seconds()), json.dumps(data))
-        except Exception as e:
-            print(f"⚠️ Redis write error: {e}")
+# How long GET /api/report/{ticker} waits on a miss's queued job before answering 202 with the job
+REPORT_WAIT_SECONDS = float(os.environ.get("REPORT_WAIT_SECONDS", "120"))
+REPORT_JOB_POLL_SECONDS = 0.25
 
-    # 2. Always write to Memory (as backup/layered cache)
-    _cache[key] = {"data": data, "ts": datetime.now()}
+# Coalesces concurrent misses for the same report (in-process + Redis lease across workers)
+report_flight = SingleFlight(redis_client)
 
 # ─── GEMINI ANALYSIS (with Google Search Grounding) ───
 SYSTEM_PROMPT = """You are the lead research analyst at Stock Fortress Research.
@@ -256,10 +269,8 @@ Return ONLY valid JSON (no markdown, no preamble, no extra text) with this exact
 }"""
 
 
-async def generate_report(ticker: str) -> dict:
-    """Send ticker to AI provider to get structured analysis."""
-
-    user_prompt = f"""Generate a Stock Fortress 7-Step Pre-Trade Research Report for {ticker}.
+def _report_user_prompt(ticker: str, facts: Optional[dict] = None) -> str:
+    return f"""Generate a Stock Fortress 7-Step Pre-Trade Research Report for {ticker}.
 
 SEARCH REQUIREMENTS:
 1. Current stock price, market cap, P/E ratio, and key metrics.
@@ -268,22 +279,218 @@ SEARCH REQUIREMENTS:
 4. Recent news (last 30 days). CRITICAL: If you find news about product halts or lawsuits, verify the EXACT scope (e.g., pill vs. injection) and the specific date.
 5. Competitive landscape and moat analysis.
 6. Analyst estimates and price targets.
-7. Regulatory, legal, or concentration risks.
+7. Regulatory, legal, or concentration risks.{facts_prompt(facts or {})}
 
 Return ONLY the JSON structure specified in the system prompt. No markdown fences, no preamble."""
 
+
+# The JSON schema embedded at the end of SYSTEM_PROMPT, split out so sectioned
+# generation can hand each model call only the sections it owns.
+_SCHEMA_MARKER = "Return ONLY valid JSON"
+SYSTEM_PROMPT_PREAMBLE = SYSTEM_PROMPT[:SYSTEM_PROMPT.index(_SCHEMA_MARKER)]
+REPORT_SCHEMA = json.loads(SYSTEM_PROMPT[SYSTEM_PROMPT.index("{", SYSTEM_PROMPT.index(_SCHEMA_MARKER)):])
+
+
+async def generate_report(ticker: str, mode: Optional[str] = None) -> dict:
+    """
+    Send ticker to AI provider to get structured analysis.
+
+    mode="single" asks one model call for the whole report; mode="sectioned" generates
+    section groups concurrently and merges them (defaults to REPORT_GENERATION_MODE).
+
+    Hard numbers are fetched from market data alongside: they go into the prompt as verified
+    facts if they arrive within REPORT_FACTS_TIMEOUT, and overwrite the report fields either way.
+    Technical / risk metrics (market_metrics) ride along as prompt-only facts.
+    """
+    facts_task = asyncio.create_task(gather_facts(ticker))
+    facts = await _facts_within(facts_task)
+
+    if (mode or REPORT_GENERATION_MODE) == "sectioned":
+        sections = await generate_sectioned(REPORT_SCHEMA, lambda group, schema, upstream:
+                                            _generate_section_group(ticker, group, schema, upstream, facts))
+        report, _ = await _finalize_report(ticker, sections, facts)
+        return apply_facts(report, facts or await _late_facts(facts_task))
+
     try:
         # use_grounding=True enables Google Search when provider is Gemini
         full_text = await ai_generate(
             system_prompt=SYSTEM_PROMPT,
-            user_prompt=user_prompt,
+            user_prompt=_report_user_prompt(ticker, facts),
             use_grounding=True,
+            validate=_has_sections,
+            response_schema=Report,
+        )
+    except Exception as e:
+        print(f"\n[AI API ERROR]: {str(e)}\n")
+        raise e
+
+    report, _ = await _finalize_report(ticker, _parse_sections(full_text), facts)
+    return apply_facts(report, facts or await _late_facts(facts_task))
+
+
+async def _facts_within(task: asyncio.Task) -> dict:
+    """The facts if they're ready within REPORT_FACTS_TIMEOUT, else {} (the task keeps running)."""
+    done, _ = await asyncio.wait({task}, timeout=REPORT_FACTS_TIMEOUT)
+    return task.result() if done else {}
+
+
+async def _late_facts(task: asyncio.Task) -> dict:
+    """Facts that missed the prompt, for overwriting the finished report — bounded, so a hung
+    market-data call can't hold up a report that's otherwise done."""
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), REPORT_FACTS_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("⚠️ Report facts still pending after generation — serving the report without them")
+        return {}
+
+
+# Outcomes of parsing model output — a full-report retry should never be needed
+_parse_stats = {"clean": 0, "repaired": 0, "sections_regenerated": 0, "sections_unavailable": 0}
+
+
+def _has_sections(text: str) -> bool:
+    """Routing validator: output with nothing recoverable fails over to the next AI route."""
+    return bool(salvage_sections(text))
+
+
+def _parse_sections(text: str) -> dict:
+    try:
+        sections = json.loads(text)
+        if isinstance(sections, dict):
+            return sections
+    except ValueError:
+        pass
+    _parse_stats["repaired"] += 1
+    return salvage_sections(text)
+
+
+async def _finalize_report(ticker: str, sections: dict, facts: Optional[dict] = None) -> tuple:
+    """
+    Validate every section against the typed schema; regenerate only the broken ones.
+    A section that is still broken after regeneration is replaced by an empty placeholder
+    and listed in meta.unavailable_sections, rather than failing the whole report.
+
+    Returns:
+        (report in schema order, list of regenerated section keys)
+    """
+    report, invalid = validate_report(sections)
+    if not invalid:
+        _parse_stats["clean"] += 1
+        return {key: report[key] for key in REPORT_SCHEMA}, []
+
+    print(f"🩹 {ticker}: regenerating invalid sections {invalid}")
+    _parse_stats["sections_regenerated"] += len(invalid)
+    unavailable: list = []
+    report = await regenerate_sections(REPORT_SCHEMA, report, list(invalid), lambda group, schema, upstream:
+                                       _generate_section_group(ticker, group, schema, upstream, facts,
+                                                               unavailable=unavailable))
+    if unavailable:
+        print(f"⚠️ {ticker}: sections still invalid after regeneration, using placeholders: {unavailable}")
+        _parse_stats["sections_unavailable"] += len(unavailable)
+        report["meta"]["ticker"] = report["meta"]["ticker"] or ticker
+        report["meta"]["unavailable_sections"] = [key for key in REPORT_SCHEMA if key in unavailable]
+    return report, list(invalid)
+
+
+async def _generate_section_group(ticker: str, group, schema: dict, upstream: dict,
+                                  facts: Optional[dict] = None, unavailable: Optional[list] = None) -> dict:
+    """
+    One model call producing only `group`'s sections of the report.
+
+    Sections that come back invalid are returned as parsed (None if missing) for
+    _finalize_report to regenerate. With `unavailable` (the regeneration pass) they are
+    placeholders instead, as is the whole group if the call fails, and their keys are
+    appended to that list.
+    """
+    system_prompt = (
+        SYSTEM_PROMPT_PREAMBLE
+        + "You are producing ONLY the sections below; other analysts cover the rest of the report.\n\n"
+        + "Return ONLY valid JSON (no markdown, no preamble, no extra text) with this exact structure:\n\n"
+        + json.dumps(schema, indent=2)
+    )
+    user_prompt = f"Generate the {', '.join(schema)} section(s) of the Stock Fortress report for {ticker}."
+    if upstream:
+        user_prompt += (
+            "\n\nFindings from the other sections of this report (base your conclusions on them; "
+            "do not contradict them):\n\n" + json.dumps(upstream)
+        )
+    if group.grounded:
+        user_prompt += facts_prompt(facts or {})
+    user_prompt += "\n\nReturn ONLY the JSON structure specified in the system prompt. No markdown fences, no preamble."
+
+    try:
+        text = await ai_generate(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            use_grounding=group.grounded,
+            validate=_has_sections,
+            response_schema=section_model(list(schema)),
         )
+    except Exception as e:
+        print(f"\n[AI API ERROR] section {group.name}: {str(e)}\n")
+        if unavailable is None:
+            raise e
+        unavailable.extend(schema)
+        return {key: placeholder_section(key) for key in schema}
+
+    parsed = _parse_sections(text)
+    sections, invalid = validate_report(parsed, keys=list(schema))
+    if not invalid:
+        return sections
+    if unavailable is None:
+        return {**sections, **{key: parsed.get(key) for key in invalid}}
+    unavailable.extend(invalid)
+    return {**sections, **{key: placeholder_section(key) for key in invalid}}
+
+
+async def generate_report_stream(ticker: str, on_section) -> dict:
+    """
+    Same report as generate_report, but streamed: `on_section(key, value)` fires as soon
+    as each top-level section (meta, step_*, investor_gut_check) closes in the token stream.
+
+    Returns:
+        The fully assembled report
+    """
+    facts_task = asyncio.create_task(gather_facts(ticker))
+    facts = await _facts_within(facts_task)
+
+    parser = SectionStreamParser()
+    chunks, emitted = [], set()
+    try:
+        async for chunk in ai_generate_stream(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=_report_user_prompt(ticker, facts),
+            use_grounding=True,
+        ):
+            # Read the stream to its end even once the report is complete: the provider
+            # records the serving route and token usage only when its generator finishes
+            if parser is not None and parser.done:
+                continue
+            chunks.append(chunk)
+            if parser is None:
+                continue
+            try:
+                for key, value in parser.feed(chunk):
+                    apply_facts({key: value}, facts)
+                    emitted.add(key)
+                    on_section(key, value)
+            except json.JSONDecodeError:
+                parser = None  # malformed section — keep the text, repair it at the end
     except Exception as e:
         print(f"\n[AI API ERROR]: {str(e)}\n")
         raise e
 
-    return json.loads(full_text)
+    sections = parser.result() if parser and parser.done else _parse_sections("".join(chunks))
+    report, regenerated = await _finalize_report(ticker, sections, facts)
+
+    # Facts that missed the prompt still overwrite the report; re-send the sections they touch
+    late_facts = {} if facts else await _late_facts(facts_task)
+    apply_facts(report, facts or late_facts)
+    patched = {section for section, _ in FACT_FIELDS.values()} if late_facts else set()
+    for key, value in report.items():
+        if key not in emitted or key in regenerated or key in patched:
+            on_section(key, value)
+    return report
 
 
 # ─── API ENDPOINTS ───
@@ -297,13 +504,20 @@ def root():
 
 
 @app.get("/api/report/{ticker}")
-async def get_report(ticker: str):
+async def get_report(ticker: str, request: Request, authorization: Optional[str] = Header(None)):
     """
     Generate a Stock Fortress research report for any ticker.
 
     Gemini uses Google Search grounding to gather real-time financial data and
     produces a structured 7-step pre-trade checklist.
-    Cached for 24 hours per ticker.
+    Cached per ticker: fresh until the soft TTL (6h), then served with `stale: true`
+    while one background refresh runs; regenerated only after the hard TTL (24h).
+    A miss is generated through the job queue at the caller's plan priority and awaited;
+    if it hasn't finished within REPORT_WAIT_SECONDS the job is returned with 202 to poll
+    at GET /api/jobs/{job_id}.
+
+    Cache hits are served straight from the cached JSON bytes (never parsed or
+    re-serialized) with an ETag; a matching If-None-Match gets a 304.
     """
     ticker = ticker.upper().strip()
     if not ticker or len(ticker) > 10:
@@ -311,37 +525,601 @@ async def get_report(ticker: str):
 
     # Check cache
     cache_key = f"report:{ticker}"
-    cached = get_cache(cache_key)
-    if cached:
+    hit = await get_cache_body(cache_key)
+    prewarmer.record(ticker, hit=bool(hit))
+    if hit:
+        report_json, report_etag, age = hit
+        stale = age > CACHE_SOFT_TTL.total_seconds()
+        if stale:
+            _schedule_refresh(ticker, cache_key)
+        else:
+            _schedule_live_patch(ticker, cache_key)
         # Auto-generate blog post in background (even if cached)
-        if generate_blog_post:
-            asyncio.create_task(generate_blog_post(ticker, cached))
-        return {"ticker": ticker, "cached": True, "report": cached}
-
-    # Generate Gemini analysis (with Google Search grounding)
+        _queue_blog_post(ticker)
+        return _cached_report_response(ticker, report_json, report_etag, stale, request)
+
+    # Generate Gemini analysis (with Google Search grounding) as a queued job, so a miss
+    # takes the same global slot (JOB_CONCURRENCY) and plan priority as any other generation;
+    # concurrent misses for the same ticker share the one job.
+    job, _ = await _submit_job("report", ticker, {"ticker": ticker}, await plan_for_token(authorization))
+    deadline = time.monotonic() + REPORT_WAIT_SECONDS
+    while job and job["status"] in ("queued", "running"):
+        if time.monotonic() >= deadline:
+            # Still waiting for a slot: hand the client the job to poll instead of holding on
+            return JSONResponse(await _job_view(job), status_code=202)
+        await asyncio.sleep(REPORT_JOB_POLL_SECONDS)
+        job = await job_queue.get(job["id"])
+    report = await get_cache(cache_key)
+    if report is None:
+        detail = (job or {}).get("error") or "no report produced"
+        raise HTTPException(502, f"Analysis generation failed: {detail}")
+
+    prewarmer.served(ticker)
+    return {"ticker": ticker, "cached": False, "stale": False, "report": report}
+
+
+_refresh_queued = {}
+
+
+def _schedule_refresh(ticker: str, cache_key: str):
+    """Queue a background regeneration of a soft-expired report (the queue dedupes per ticker;
+    this only spares a queue round trip on every stale hit)."""
+    if time.time() - _refresh_queued.get(cache_key, 0) < 60:
+        return
+    _refresh_queued[cache_key] = time.time()
+    _enqueue("report", ticker, {"ticker": ticker, "refresh": True})
+
+
+# Intraday: price-derived fields of a cached report are patched from a live quote at most
+# every REPORT_LIVE_REFRESH_MINUTES — no model call. Full regeneration is left to the
+# soft TTL (narrative staleness).
+_live_checked = {}
+_live_patching = set()
+_live_stats = {"patched": 0, "unchanged": 0, "failed": 0}
+
+
+def _schedule_live_patch(ticker: str, cache_key: str):
+    if not get_quotes or REPORT_LIVE_REFRESH_MINUTES <= 0:
+        return
+    if time.time() - _live_checked.get(ticker, 0) < REPORT_LIVE_REFRESH_MINUTES * 60 or ticker in _live_patching:
+        return
+    _live_checked[ticker] = time.time()
+    _live_patching.add(ticker)
+
+    async def patch():
+        try:
+            entry = await get_cache_entry(cache_key)
+            if not entry:
+                return
+            report, age = entry
+            refreshed_at = (report.get("meta") or {}).get("live_data", {}).get("refreshed_at")
+            if refreshed_at and (datetime.now(timezone.utc) - datetime.fromisoformat(refreshed_at)
+                                 < timedelta(minutes=REPORT_LIVE_REFRESH_MINUTES)):
+                return  # another worker just did it
+            generated_at = time.time() - age
+            quote = (await get_quotes([ticker])).get(ticker) or {}
+            changed = refresh_live_fields(report, quote.get("price"))
+            if not changed:
+                _live_stats["unchanged"] += 1
+                return
+            latest = await get_cache_entry(cache_key)
+            if not latest or abs(time.time() - latest[1] - generated_at) > 1:
+                return  # regenerated while we fetched the quote — don't overwrite it
+            # Keep the generation timestamp: a live patch doesn't make the narrative any fresher
+            await set_cache(cache_key, report, ts=generated_at)
+            _live_stats["patched"] += 1
+            print(f"💹 Live-patched {ticker}: {', '.join(changed)}")
+        except Exception as e:
+            _live_stats["failed"] += 1
+            print(f"⚠️ Live patch failed for {ticker}: {e}")
+        finally:
+            _live_patching.discard(ticker)
+
+    asyncio.create_task(patch())
+
+
+def _cached_report_response(ticker: str, report_json: bytes, report_etag: str,
+                            stale: bool, request: Request) -> Response:
+    """Assemble the {"ticker","cached","stale","report"} envelope around the cached bytes."""
+    etag = f'"{report_etag}-{int(stale)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    body = b"".join((
+        b'{"ticker":', json.dumps(ticker).encode(),
+        b',"cached":true,"stale":', b"true" if stale else b"false",
+        b',"report":', report_json, b"}",
+    ))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Tickers whose blog post was already requested today (generate_blog_post dedupes per day,
+# but checking costs a Supabase round trip — and loading the report — on every hit).
+# Holds today's tickers only; the set is dropped when the date changes.
+_blog_checked = {"day": None, "tickers": set()}
+
+
+def _queue_blog_post(ticker: str):
+    if not generate_blog_post:
+        return
+    today = date.today().isoformat()
+    if _blog_checked["day"] != today:
+        _blog_checked["day"], _blog_checked["tickers"] = today, set()
+    if ticker in _blog_checked["tickers"]:
+        return
+    _blog_checked["tickers"].add(ticker)
+    _enqueue("blog", f"{ticker}:{today}", {"ticker": ticker})
+
+
+async def _restore_stored(ticker: str, cache_key: str) -> Optional[dict]:
+    """Re-cache the latest stored version if it's still within the hard TTL (keeping its age)."""
+    if not report_store:
+        return None
+    try:
+        version = await report_store.get(ticker)
+    except Exception as e:
+        print(f"⚠️ Report store read failed for {ticker}: {e}")
+        return None
+    if not version or time.time() - version["created_at"] >= CACHE_TTL.total_seconds():
+        return None
+    await set_cache(cache_key, version["report"], ts=version["created_at"])
+    print(f"📦 Restored {ticker} report from store (version {version['id']})")
+    return version["report"]
+
+
+async def _save_version(ticker: str, report: dict):
+    if not report_store:
+        return
     try:
+        await report_store.save(ticker, report, served_model() or AI_MODEL)
+    except Exception as e:
+        print(f"⚠️ Report store write failed for {ticker}: {e}")
+
+
+async def _generate_and_cache(ticker: str, cache_key: str, reuse_stored: bool = False) -> dict:
+    """
+    Run once per flight: generate, cache, store the version, and kick off the blog post.
+
+    reuse_stored=True (cache misses) serves a stored version still within the hard TTL
+    instead of paying for a new generation; refreshes always regenerate.
+    """
+    if reuse_stored:
+        report = await _restore_stored(ticker, cache_key)
+        if report is not None:
+            return report
+
+    with track_served():  # one record per generation, shared with its section tasks
         report = await generate_report(ticker)
+        await set_cache(cache_key, report)
+        await _save_version(ticker, report)
+
+    # Auto-generate blog post in the background (queued job)
+    _queue_blog_post(ticker)
+
+    return report
+
+
+@app.get("/api/report/{ticker}/stream")
+async def stream_report(ticker: str):
+    """
+    Server-sent-events variant of /api/report/{ticker}.
+
+    Emits one `section` event per top-level report section the moment it is complete
+    ({"section": "step_1_know_what_you_own", "data": {...}}), then a `done` event
+    ({"ticker", "cached", "stale"}) or an `error` event ({"detail"}). The assembled report is
+    cached exactly like the regular endpoint.
+    """
+    ticker = ticker.upper().strip()
+    if not ticker or len(ticker) > 10:
+        raise HTTPException(400, "Invalid ticker")
+
+    cache_key = f"report:{ticker}"
+    return StreamingResponse(
+        _report_events(ticker, cache_key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _report_events(ticker: str, cache_key: str):
+    entry = await get_cache_entry(cache_key)
+    prewarmer.record(ticker, hit=bool(entry))
+    if entry:
+        cached, age = entry
+        stale = age > CACHE_SOFT_TTL.total_seconds()
+        if stale:
+            _schedule_refresh(ticker, cache_key)
+        else:
+            _schedule_live_patch(ticker, cache_key)
+        for key, value in cached.items():
+            yield _sse("section", {"section": key, "data": value})
+        yield _sse("done", {"ticker": ticker, "cached": True, "stale": stale})
+        return
+
+    # Sections land on the queue as the model streams them. If another request is
+    # already generating this ticker we join its flight instead, and our queue stays
+    # empty until the finished report comes back.
+    queue: asyncio.Queue = asyncio.Queue()
+    flight = asyncio.create_task(report_flight.do(
+        cache_key,
+        lambda: _stream_generate_and_cache(ticker, cache_key, queue, reuse_stored=True),
+        lookup=lambda: get_cache(cache_key),
+    ))
+
+    sent = set()
+    try:
+        while not flight.done() or not queue.empty():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, flight}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                continue
+            key, value = getter.result()
+            sent.add(key)
+            yield _sse("section", {"section": key, "data": value})
+
+        report = flight.result()
     except json.JSONDecodeError:
-        raise HTTPException(502, "Failed to parse AI analysis - retry")
+        yield _sse("error", {"detail": "Failed to parse AI analysis - retry"})
+        return
     except Exception as e:
-        raise HTTPException(502, f"Analysis generation failed: {str(e)}")
+        yield _sse("error", {"detail": f"Analysis generation failed: {str(e)}"})
+        return
+
+    # Followers (and any section the parser didn't surface) get the rest from the result
+    for key, value in report.items():
+        if key not in sent:
+            yield _sse("section", {"section": key, "data": value})
+    prewarmer.served(ticker)
+    yield _sse("done", {"ticker": ticker, "cached": False, "stale": False})
+
+
+async def _stream_generate_and_cache(ticker: str, cache_key: str, queue: asyncio.Queue,
+                                     reuse_stored: bool = False) -> dict:
+    """Streaming counterpart of _generate_and_cache."""
+    if reuse_stored:
+        report = await _restore_stored(ticker, cache_key)
+        if report is not None:
+            return report
+
+    with track_served():
+        report = await generate_report_stream(ticker, lambda key, value: queue.put_nowait((key, value)))
+        await set_cache(cache_key, report)
+        await _save_version(ticker, report)
+
+    _queue_blog_post(ticker)
+
+    return report
+
+
+# ─── JOBS (queued generation) ───
+# Report generations, stale refreshes and blog posts run as queued jobs: in this process
+# (JOB_RUN_IN_WEB=1) or in worker.py, so web replicas and generation workers scale separately.
+async def _run_report_job(payload: dict):
+    ticker = payload["ticker"]
+    cache_key = f"report:{ticker}"
+    if payload.get("refresh"):
+        if await _fresh_report(cache_key, CACHE_SOFT_TTL.total_seconds()) is not None:
+            return  # already refreshed (e.g. by an earlier attempt or another replica)
+        # A worker that loses the lease race (or takes it right after the holder finished)
+        # gets the holder's fresh report from the lookup instead of regenerating
+        await report_flight.do(cache_key, lambda: _generate_and_cache(ticker, cache_key),
+                               lookup=lambda: _fresh_report(cache_key, CACHE_SOFT_TTL.total_seconds()))
+        print(f"🔄 Refreshed stale report for {ticker}")
+        return
+    await report_flight.do(
+        cache_key,
+        lambda: _generate_and_cache(ticker, cache_key, reuse_stored=True),
+        lookup=lambda: get_cache(cache_key),
+    )
+
+
+async def _fresh_report(cache_key: str, max_age: float) -> Optional[dict]:
+    """The shared (Redis) copy of a report if it's younger than max_age — never this
+    process's L1 copy, which can lag another worker's refresh by CACHE_L1_TTL_SECONDS."""
+    entry = await get_cache_entry(cache_key, shared=True)
+    return entry[0] if entry and entry[1] < max_age else None
+
+
+async def _run_blog_job(payload: dict):
+    ticker = payload["ticker"]
+    report = await get_cache(f"report:{ticker}")
+    if report is None and report_store:
+        version = await report_store.get(ticker)
+        report = version["report"] if version else None
+    if report is None:
+        raise RuntimeError(f"No report available for {ticker} blog post")
+    await generate_blog_post(ticker, report)
+
+
+job_handlers = {"report": _run_report_job, "blog": _run_blog_job}
+job_runner = JobRunner(job_queue, job_handlers)
+if JOB_RUN_IN_WEB:
+    job_runners.append(job_runner)
+
+
+async def _submit_job(kind: str, key: str, payload: dict, plan: str = DEFAULT_PLAN) -> tuple:
+    job, created = await job_queue.submit(kind, key, payload, plan=plan)
+    if created and JOB_RUN_IN_WEB:
+        job_runner.notify()
+    return job, created
+
+
+def _enqueue(kind: str, key: str, payload: dict, plan: str = DEFAULT_PLAN):
+    """Fire-and-forget submit — only the (fast, durable) enqueue runs in the request's process."""
+    async def submit():
+        try:
+            await _submit_job(kind, key, payload, plan)
+        except Exception as e:
+            print(f"⚠️ Could not queue {kind} job for {key}: {e}")
+
+    asyncio.create_task(submit())
+
+
+async def _job_view(job: dict) -> dict:
+    view = {
+        "job_id": job["id"],
+        "ticker": job["key"],
+        "status": job["status"],
+        "plan": job["plan"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+    }
+    if job["status"] == "queued":
+        view["position"] = await job_queue.position(job)
+    elif job["status"] == "failed":
+        view["detail"] = job["error"]
+    elif job["status"] == "done":
+        view["report"] = await get_cache(f"report:{job['key']}")
+        if job["kind"] == "report" and view["report"] is not None:
+            prewarmer.served(job["key"])
+    return view
+
+
+@app.post("/api/report/{ticker}/jobs", status_code=202)
+async def submit_report_job(ticker: str, authorization: Optional[str] = Header(None)):
+    """
+    Queue a report generation instead of holding the request open.
+
+    Returns 202 with {"job_id", "status", "position"}; poll GET /api/jobs/{job_id} until
+    `done` (the report is included) or `failed`. Jobs run in plan-tier order (premium, pro,
+    free — from the Supabase access token in `Authorization: Bearer ...`), one job per ticker
+    at a time. A fresh cached report is returned straight away with 200.
+    """
+    ticker = ticker.upper().strip()
+    if not ticker or len(ticker) > 10:
+        raise HTTPException(400, "Invalid ticker")
+
+    cache_key = f"report:{ticker}"
+    entry = await get_cache_entry(cache_key)
+    prewarmer.record(ticker, hit=bool(entry))
+    if entry and entry[1] <= CACHE_SOFT_TTL.total_seconds():
+        return JSONResponse({"job_id": None, "ticker": ticker, "status": "done", "cached": True,
+                             "report": entry[0]})
+
+    job, _ = await _submit_job("report", ticker, {"ticker": ticker}, await plan_for_token(authorization))
+    return await _job_view(job)
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued generation; includes the report once `done`."""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found (or expired)")
+    return await _job_view(job)
+
+
+# ─── BATCH (watchlists / dashboard) ───
+BATCH_MAX_TICKERS = int(os.environ.get("BATCH_MAX_TICKERS", "50"))
+# How often a streaming batch checks on the jobs it's waiting for
+BATCH_JOB_POLL_SECONDS = 1.0
+
+
+@app.get("/api/reports/batch")
+async def get_reports_batch(tickers: str, generate: bool = True, stream: bool = False,
+                            authorization: Optional[str] = Header(None)):
+    """
+    Verdict, confidence and live price for many tickers in one call.
+    Example: /api/reports/batch?tickers=AAPL,MSFT,TSLA
+
+    Cached reports are read with one multi-key cache lookup and merged with one bulk quote
+    fetch. Tickers without a report come back as `queued` (submitted to the job queue at the
+    caller's plan priority). With `stream=true` the response is server-sent events: one
+    `ticker` event per summary as it becomes available — queued jobs are followed until
+    they finish — then `done`.
+    """
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not symbols:
+        raise HTTPException(400, "No tickers given")
+    if len(symbols) > BATCH_MAX_TICKERS:
+        raise HTTPException(400, f"At most {BATCH_MAX_TICKERS} tickers per batch")
+    if any(len(t) > 10 for t in symbols):
+        raise HTTPException(400, "Invalid ticker")
+
+    entries, quotes = await asyncio.gather(
+        get_cache_entries([f"report:{t}" for t in symbols]),
+        _batch_quotes(symbols),
+    )
+    summaries, missing = {}, []
+    for ticker, entry in zip(symbols, entries):
+        prewarmer.record(ticker, hit=bool(entry))
+        if entry:
+            report, age = entry
+            stale = age > CACHE_SOFT_TTL.total_seconds()
+            if stale:
+                _schedule_refresh(ticker, f"report:{ticker}")
+            summaries[ticker] = _report_summary(ticker, report, quotes.get(ticker), stale=stale)
+        else:
+            missing.append(ticker)
+
+    plan = await plan_for_token(authorization) if generate and missing else None
+    if stream:
+        return StreamingResponse(
+            _batch_events(summaries, missing, quotes, plan, generate),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    for ticker in missing:
+        if generate:
+            await _queue_generation(ticker, plan)
+        summaries[ticker] = {"ticker": ticker, "status": "queued" if generate else "missing",
+                             **_quote_fields(quotes.get(ticker))}
+    return {"results": [summaries[t] for t in symbols], "queued": missing if generate else []}
+
+
+async def _batch_quotes(symbols: list) -> dict:
+    if not get_quotes:
+        return {}
+    try:
+        return await get_quotes(symbols)
+    except Exception as e:
+        print(f"⚠️ Batch quotes failed: {e}")
+        return {}
+
+
+def _quote_fields(quote: Optional[dict]) -> dict:
+    if not quote or not quote.get("price"):
+        return {"price": None, "change": None, "percent": None}
+    return {"price": quote["price"], "change": quote["change"], "percent": quote["percent"]}
+
+
+def _report_summary(ticker: str, report: dict, quote: Optional[dict], stale: bool = False) -> dict:
+    verdict = report.get("step_7_verdict") or {}
+    meta = report.get("meta") or {}
+    summary = {
+        "ticker": ticker,
+        "status": "ready",
+        "stale": stale,
+        "company_name": meta.get("company_name"),
+        "verdict": verdict.get("action"),
+        "confidence": verdict.get("confidence"),
+        "one_line_reason": verdict.get("one_line_reason"),
+        **_quote_fields(quote),
+    }
+    if summary["price"] is None:
+        summary["report_price"] = meta.get("current_price")  # as of report generation
+    return summary
+
+
+async def _queue_generation(ticker: str, plan: str) -> Optional[dict]:
+    try:
+        job, _ = await _submit_job("report", ticker, {"ticker": ticker}, plan)
+        return job
+    except Exception as e:
+        print(f"⚠️ Batch generation could not be queued for {ticker}: {e}")
+        return None
+
+
+async def _batch_events(summaries: dict, missing: list, quotes: dict, plan: Optional[str], generate: bool = True):
+    for summary in summaries.values():
+        yield _sse("ticker", summary)
+    if not generate:
+        for ticker in missing:
+            yield _sse("ticker", {"ticker": ticker, "status": "missing", **_quote_fields(quotes.get(ticker))})
+        yield _sse("done", {"count": len(summaries) + len(missing)})
+        return
+
+    # Missing reports go through the job queue like any other generation (plan priority,
+    # JOB_CONCURRENCY, workers); the stream just follows the jobs. They keep running
+    # (and fill the cache) even if the client disconnects.
+    jobs = {}
+    for ticker in missing:
+        job = await _queue_generation(ticker, plan)
+        if job:
+            jobs[ticker] = job["id"]
+        else:
+            yield _sse("ticker", {"ticker": ticker, "status": "error", "detail": "Could not queue generation"})
+
+    while jobs:
+        await asyncio.sleep(BATCH_JOB_POLL_SECONDS)
+        for ticker, job_id in list(jobs.items()):
+            job = await job_queue.get(job_id)
+            if job and job["status"] in ("queued", "running"):
+                continue
+            del jobs[ticker]
+            report = await get_cache(f"report:{ticker}")
+            if report is not None:
+                yield _sse("ticker", _report_summary(ticker, report, quotes.get(ticker)))
+            else:
+                detail = (job or {}).get("error") or "Generation failed"
+                yield _sse("ticker", {"ticker": ticker, "status": "error", "detail": detail})
+    yield _sse("done", {"count": len(summaries) + len(missing)})
+
+
+async def _prewarm_regenerate(ticker: str) -> dict:
+    cache_key = f"report:{ticker}"
+    # Fresh means "regenerated since the scheduler picked it", not merely cached
+    max_age = CACHE_SOFT_TTL.total_seconds() - PREWARM_LEAD
+    return await report_flight.do(cache_key, lambda: _generate_and_cache(ticker, cache_key),
+                                  lookup=lambda: _fresh_report(cache_key, max_age))
+
+
+async def _prewarm_cache_ages(tickers: list) -> dict:
+    entries = await get_cache_entries([f"report:{t}" for t in tickers])
+    return {t: (entry[1] if entry else None) for t, entry in zip(tickers, entries)}
+
+
+@app.on_event("startup")
+async def _warm_report_cache():
+    """Load the newest stored version of recent tickers into the cache, so a cold start
+    (or a flushed Redis) doesn't turn every first request into a regeneration."""
+    if not report_store:
+        return
+    try:
+        versions = await report_store.latest_all(since=time.time() - CACHE_TTL.total_seconds())
+        keys = [f"report:{v['ticker']}" for v in versions]
+        cached = await get_cache_blobs(keys)
+        missing = {key: v for key, v, hit in zip(keys, versions, cached) if hit is None}
+        if missing:
+            await set_cache_many({key: v["report"] for key, v in missing.items()},
+                                 {key: v["created_at"] for key, v in missing.items()})
+        print(f"📦 Cache warmed from report store: {len(missing)} of {len(versions)} recent tickers")
+    except Exception as e:
+        print(f"⚠️ Cache warm from report store failed: {e}")
+
+
+@app.on_event("startup")
+async def _start_prewarm():
+    calls = len(SECTION_GROUPS) if REPORT_GENERATION_MODE == "sectioned" else 1
+    prewarmer.bind(_prewarm_cache_ages, _prewarm_regenerate, CACHE_SOFT_TTL.total_seconds(), calls)
+    prewarmer.start()
+
 
-    # Cache and return
-    set_cache(cache_key, report)
+@app.on_event("startup")
+async def _start_job_runner():
+    if JOB_RUN_IN_WEB:
+        job_runner.start()
+    else:
+        print("✅ Generation jobs are left to worker.py (JOB_RUN_IN_WEB=0)")
 
-    # Auto-generate blog post in background (non-blocking)
-    if generate_blog_post:
-        asyncio.create_task(generate_blog_post(ticker, report))
 
-    return {"ticker": ticker, "cached": False, "report": report}
+@app.on_event("shutdown")
+async def _stop_prewarm():
+    await prewarmer.stop()
+    await job_runner.stop(drain=5)
+    await close_redis()
 
 
 @app.get("/api/health")
-def health():
+async def health():
     return {
         "status": "ok",
         "gemini_configured": bool(GEMINI_KEY),
-        "cache_entries": len(_cache),
+        "cache_entries": len(l1_cache),
+        "cache": cache_stats(),
+        "singleflight": report_flight.stats(),
+        "ai_providers": provider_stats(),
+        "report_parsing": _parse_stats,
+        "live_patches": _live_stats,
+        "quote_cache": quote_stats() if quote_stats else None,
+        "report_store": report_store.name if report_store else None,
+        "jobs": await queue_stats(),
     }
 
 
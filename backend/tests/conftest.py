@@ -0,0 +1,20 @@
+"""
+Test setup: backend modules import flat (like the app and benchmarks/), and module-level
+stores point at a throwaway directory instead of backend/data.
+
+Run from backend/:
+    pip install pytest
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_scratch = tempfile.mkdtemp(prefix="stock-fortress-tests-")
+os.environ.setdefault("JOB_QUEUE_BACKEND", "local")
+os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(_scratch, "jobs.db"))
+os.environ.setdefault("PRICE_HISTORY_DIR", os.path.join(_scratch, "history"))
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import ai_provider
+from ai_provider import Route, _is_cache_error, _route
+
+PRIMARY, BACKUP = Route("alpha", "a-1"), Route("beta", "b-1")
+
+
+@pytest.fixture(autouse=True)
+def fresh_routing(monkeypatch):
+    monkeypatch.setattr(ai_provider, "_latency", {})
+    monkeypatch.setattr(ai_provider, "_route_stats", {})
+    monkeypatch.setattr(ai_provider, "_semaphores", {})
+    monkeypatch.setattr(ai_provider, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(ai_provider, "AI_HEDGE_DELAY", 0.05)
+    monkeypatch.setattr(ai_provider, "AI_HEDGE_MIN_DELAY", 0.0)
+
+
+def calls(behaviour: dict, started: list):
+    """make_call for _route: each route sleeps, then returns its text or raises it."""
+    def make_call(route):
+        async def call():
+            started.append(route.name)
+            delay, result = behaviour[route.name]
+            await asyncio.sleep(delay)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return call
+    return make_call
+
+
+def route(behaviour: dict, validate=None):
+    started = []
+    text = asyncio.run(_route([PRIMARY, BACKUP], "report", 5, calls(behaviour, started), validate))
+    return text, started
+
+
+def test_fast_primary_wins_alone():
+    text, started = route({PRIMARY.name: (0, "primary"), BACKUP.name: (0, "backup")})
+
+    assert (text, started) == ("primary", [PRIMARY.name])
+    assert ai_provider._route_stats[PRIMARY.name]["wins"] == 1
+
+
+def test_error_fails_over_to_the_next_route():
+    text, started = route({PRIMARY.name: (0, RuntimeError("down")), BACKUP.name: (0, "backup")})
+
+    assert (text, started) == ("backup", [PRIMARY.name, BACKUP.name])
+    assert ai_provider._route_stats[PRIMARY.name]["failures"] == 1
+    assert ai_provider._route_stats[BACKUP.name]["failovers_to"] == 1
+
+
+def test_invalid_output_fails_over():
+    text, _ = route({PRIMARY.name: (0, "not json"), BACKUP.name: (0, "{}")},
+                    validate=lambda t: t.startswith("{"))
+
+    assert text == "{}"
+    assert ai_provider._route_stats[PRIMARY.name]["invalid"] == 1
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    text, started = route({PRIMARY.name: (1.0, "primary"), BACKUP.name: (0, "backup")})
+
+    counters = ai_provider._route_stats
+    assert (text, started) == ("backup", [PRIMARY.name, BACKUP.name])
+    assert counters[BACKUP.name]["hedge_wins"] == 1
+    assert counters[PRIMARY.name]["cancelled"] == 1
+    assert not ai_provider._window(PRIMARY, "report").samples
+
+
+def test_raises_the_last_error_when_every_route_fails():
+    with pytest.raises(ValueError, match="backup down"):
+        route({PRIMARY.name: (0, RuntimeError("primary down")), BACKUP.name: (0, ValueError("backup down"))})
+
+
+class APIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code, self.message = code, message
+
+
+def test_only_cached_content_errors_trigger_the_uncached_retry():
+    name = "cachedContents/abc123"
+
+    assert _is_cache_error(APIError(404, "CachedContent not found (or permission denied)"), name)
+    assert _is_cache_error(APIError(400, "Cache content abc123 is expired."), name)
+    assert not _is_cache_error(APIError(400, "Request contains an invalid argument."), name)
+    assert not _is_cache_error(APIError(403, "Permission denied: API key not valid."), name)
+    assert not _is_cache_error(APIError(500, "CachedContent not found"), name)
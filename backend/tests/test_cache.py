@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+import cache
+from cache import LRUCache
+
+
+@pytest.fixture
+def l1(monkeypatch):
+    fresh = LRUCache(max_entries=10, max_bytes=1000)
+    monkeypatch.setattr(cache, "l1", fresh)
+    monkeypatch.setattr(cache, "bodies", LRUCache(max_entries=10, max_bytes=1000))
+    return fresh
+
+
+def test_lru_evicts_least_recently_used_past_the_entry_cap():
+    lru = LRUCache(max_entries=2, max_bytes=1000)
+    later = time.time() + 60
+    lru.set("a", b"a", 0, later, 1)
+    lru.set("b", b"b", 0, later, 1)
+    lru.get("a")
+    lru.set("c", b"c", 0, later, 1)
+
+    assert lru.get("b") is None
+    assert lru.get("a") and lru.get("c")
+    assert lru.counters["evictions"] == 1
+
+
+def test_lru_byte_cap_and_oversized_values():
+    lru = LRUCache(max_entries=10, max_bytes=100)
+    later = time.time() + 60
+    lru.set("a", b"", 0, later, 60)
+    lru.set("b", b"", 0, later, 60)
+    lru.set("huge", b"", 0, later, 101)
+
+    assert len(lru) == 1 and lru.get("b") and lru.bytes == 60
+    assert lru.get("huge") is None
+
+
+def test_lru_expired_entries_go_before_live_ones():
+    lru = LRUCache(max_entries=2, max_bytes=1000)
+    now = time.time()
+    lru.set("expired", b"", 0, now - 1, 1)
+    lru.set("live", b"", 0, now + 60, 1)
+    lru.set("new", b"", 0, now + 60, 1)
+
+    assert lru.get("live") and lru.get("new")
+    assert lru.counters == {"hits": 2, "misses": 0, "evictions": 0, "expirations": 1}
+
+
+def test_promote_caps_l1_lifetime_only_with_redis(l1, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(cache, "redis_client", None)
+    cache._promote("solo", b"x", now)
+    monkeypatch.setattr(cache, "redis_client", object())
+    cache._promote("shared", b"x", now)
+    cache._promote("old", b"x", now - cache.CACHE_TTL.total_seconds() + 10)
+
+    expiry = {key: entry[2] - now for key, entry in l1._entries.items()}
+    assert expiry["solo"] == pytest.approx(cache.CACHE_TTL.total_seconds(), abs=1)
+    assert expiry["shared"] == pytest.approx(cache.L1_TTL, abs=1)
+    assert expiry["old"] == pytest.approx(10, abs=1)  # never outlives the hard TTL
+
+
+def test_l1_round_trip_without_redis(l1, monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    report = {"ticker": "AAPL", "verdict": "hold"}
+
+    async def scenario():
+        await cache.set_cache("report:AAPL", report, ts=time.time() - 30)
+        return await cache.get_cache_entry("report:AAPL"), await cache.get_cache_body("report:AAPL")
+
+    (data, age), (body, etag, _) = asyncio.run(scenario())
+
+    assert data == report and 29 <= age < 60
+    assert b'"verdict"' in body and etag
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import cache_codec
+from cache_codec import Codec, ZlibCodec, decode, decode_json, is_framed, read_timestamp
+
+REPORT = {
+    "meta": {"ticker": "AAPL", "company_name": "Apple Inc.", "current_price": "$189.84"},
+    "step_4_know_the_risks": {"top_risks": [{"risk": "China exposure — 19% of revenue", "severity": "High"}]},
+    "investor_gut_check": {"question_1": "Would you hold through a 30% drop?", "question_5": None},
+}
+TS = 1718900000.25
+
+
+@pytest.mark.parametrize("codec", [Codec(), ZlibCodec(6)], ids=["json", "zlib"])
+def test_round_trip(codec):
+    blob = codec.encode(REPORT, TS)
+
+    assert is_framed(blob)
+    assert read_timestamp(blob) == TS
+    assert decode(blob) == REPORT
+    assert json.loads(decode_json(blob)) == REPORT
+
+
+def test_zstd_round_trip_with_dictionary():
+    zstandard = pytest.importorskip("zstandard")
+    samples = [{**REPORT, "meta": {**REPORT["meta"], "ticker": f"T{i}", "current_price": f"${i}.00"}}
+               for i in range(200)]
+    dict_data = cache_codec.train_dictionary(samples, size=4096)
+    codec = cache_codec.ZstdCodec(3, dict_data)
+    cache_codec._codecs.setdefault(codec.tag, codec)
+
+    blob = codec.encode(REPORT, TS)
+
+    assert blob[0] == cache_codec.TAG_ZSTD_DICT
+    assert decode(blob) == REPORT
+    assert isinstance(codec.dictionary, zstandard.ZstdCompressionDict)
+
+
+def test_active_codec_decodes_its_own_entries():
+    blob = cache_codec.get_codec().encode(REPORT, TS)
+
+    assert decode(blob) == REPORT
+
+
+def test_legacy_plain_json_is_not_framed():
+    assert not is_framed(json.dumps(REPORT).encode())
+    assert not is_framed(b"")
+
+
+def test_unknown_tag_raises():
+    blob = Codec().encode(REPORT, TS)
+
+    with pytest.raises(ValueError):
+        decode_json(bytes([0xEE]) + blob[1:])
@@ -0,0 +1,150 @@
+import asyncio
+import sys
+import time
+import types
+from collections import OrderedDict
+
+import pytest
+
+import job_queue
+from job_queue import LocalJobQueue
+
+FREE, PRO, PREMIUM = sorted(job_queue.PLAN_PRIORITY, key=job_queue.PLAN_PRIORITY.get)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return LocalJobQueue(path=str(tmp_path / "jobs.db"), concurrency=10)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_claims_by_plan_priority_then_fifo(queue):
+    for key, plan in (("A", FREE), ("B", PRO), ("C", FREE), ("D", PREMIUM), ("E", PRO)):
+        run(queue.submit("report", key, {"ticker": key}, plan=plan))
+
+    claimed = [run(queue.claim())["key"] for _ in range(5)]
+
+    assert claimed == ["D", "B", "E", "A", "C"]
+    assert run(queue.claim()) is None
+
+
+def test_position_counts_jobs_ahead(queue):
+    run(queue.submit("report", "A", {}, plan=FREE))
+    late, _ = run(queue.submit("report", "B", {}, plan=FREE))
+    urgent, _ = run(queue.submit("report", "C", {}, plan=PREMIUM))
+
+    assert run(queue.position(urgent)) == 0
+    assert run(queue.position(late)) == 2
+
+
+def test_dedupes_active_jobs_per_key(queue):
+    first, created = run(queue.submit("report", "AAPL", {"ticker": "AAPL"}, plan=FREE))
+    again, created_again = run(queue.submit("report", "AAPL", {"ticker": "AAPL"}, plan=FREE))
+    other_kind, created_other = run(queue.submit("blog", "AAPL", {"ticker": "AAPL"}))
+
+    assert created and not created_again
+    assert again["id"] == first["id"]
+    assert created_other and other_kind["id"] != first["id"]
+
+
+def test_resubmit_upgrades_a_queued_job(queue):
+    first, _ = run(queue.submit("report", "AAPL", {}, plan=FREE))
+    upgraded, created = run(queue.submit("report", "AAPL", {}, plan=PREMIUM))
+    downgraded, _ = run(queue.submit("report", "AAPL", {}, plan=FREE))
+
+    assert not created and upgraded["id"] == first["id"]
+    assert upgraded["plan"] == PREMIUM
+    assert run(queue.get(first["id"]))["priority"] == job_queue.plan_priority(PREMIUM)
+    assert downgraded["plan"] == PREMIUM
+
+
+def test_finished_key_can_be_submitted_again(queue):
+    first, _ = run(queue.submit("report", "AAPL", {}))
+    run(queue.claim())
+    run(queue.finish(first["id"]))
+
+    second, created = run(queue.submit("report", "AAPL", {}))
+
+    assert created and second["id"] != first["id"]
+    assert run(queue.get(first["id"]))["status"] == "done"
+
+
+def test_concurrency_cap(tmp_path):
+    queue = LocalJobQueue(path=str(tmp_path / "jobs.db"), concurrency=1)
+    first, _ = run(queue.submit("report", "A", {}))
+    run(queue.submit("report", "B", {}))
+
+    assert run(queue.claim())["id"] == first["id"]
+    assert run(queue.claim()) is None
+    run(queue.finish(first["id"]))
+    assert run(queue.claim())["key"] == "B"
+
+
+def test_expired_lease_is_requeued(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE", 0.05)
+    job, _ = run(queue.submit("report", "AAPL", {}))
+    claimed = run(queue.claim())
+    assert run(queue.claim()) is None
+
+    time.sleep(0.1)
+    reclaimed = run(queue.claim())
+
+    assert reclaimed["id"] == job["id"]
+    assert (claimed["attempts"], reclaimed["attempts"]) == (1, 2)
+    assert not run(queue.renew(claimed))  # the first consumer lost its lease
+    assert run(queue.renew(reclaimed))
+
+
+def test_renewed_lease_is_kept(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE", 0.2)
+    run(queue.submit("report", "AAPL", {}))
+    claimed = run(queue.claim())
+
+    for _ in range(3):
+        time.sleep(0.1)
+        assert run(queue.renew(claimed))
+
+    assert run(queue.claim()) is None
+    assert run(queue.get(claimed["id"]))["status"] == "running"
+
+
+def test_retry_waits_for_backoff(queue):
+    job, _ = run(queue.submit("report", "AAPL", {}))
+    run(queue.claim())
+    run(queue.finish(job["id"], error="boom", retry_at=time.time() + 60))
+
+    assert run(queue.claim()) is None
+    retried = run(queue.get(job["id"]))
+    assert (retried["status"], retried["error"]) == ("queued", "boom")
+
+
+def test_position_is_none_once_not_queued(queue):
+    job, _ = run(queue.submit("report", "AAPL", {}))
+    claimed = run(queue.claim())
+
+    assert run(queue.position(claimed)) is None
+
+
+def test_plan_cache_is_hashed_and_bounded(monkeypatch):
+    lookups = []
+
+    class Supabase:
+        class auth:
+            @staticmethod
+            def get_user(token):
+                lookups.append(token)
+                raise RuntimeError("no such user")
+
+    monkeypatch.setitem(sys.modules, "blog_engine", types.SimpleNamespace(_get_sb=Supabase))
+    monkeypatch.setattr(job_queue, "_plan_cache", OrderedDict())
+    monkeypatch.setattr(job_queue, "JOB_PLAN_CACHE_SIZE", 2)
+
+    for token in ("a", "b", "a", "c", "a", "b"):
+        assert run(job_queue.plan_for_token(f"Bearer {token}")) == FREE
+
+    assert lookups == ["a", "b", "c", "b"]  # "b" was least recently used when "c" came in
+    assert len(job_queue._plan_cache) == 2
+    assert not {"a", "b", "c"} & set(job_queue._plan_cache)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from json_repair import repair_json, salvage_sections
+
+
+# ─── repair_json ───
+
+def test_valid_json_passes_through():
+    assert repair_json('{"a": [1, 2], "b": {"c": null}}') == {"a": [1, 2], "b": {"c": None}}
+
+
+def test_preamble_fences_and_trailing_comma():
+    assert repair_json('Here you go:\n```json\n{"a": 1,}\n```') == {"a": 1}
+
+
+def test_raw_newline_inside_string():
+    assert repair_json('{"a": "line1\nline2"}') == {"a": "line1\nline2"}
+
+
+def test_truncated_object_is_closed():
+    assert repair_json('{"a": {"b": "x", "c') == {"a": {"b": "x"}}
+
+
+def test_truncated_number_is_dropped():
+    # "2" may be the start of "25": a partial literal is never kept
+    assert repair_json('{"a": 1, "b": [1, 2') == {"a": 1, "b": [1]}
+
+
+def test_no_json_raises():
+    with pytest.raises(json.JSONDecodeError):
+        repair_json("Sorry, I can't help with that.")
+
+
+# ─── salvage_sections ───
+
+def test_salvage_keeps_members_around_a_broken_one():
+    text = '{"meta": {"ticker": "AAPL"}, "step_7_verdict": @@@, "investor_gut_check": {"question_1": "q"}}'
+
+    assert salvage_sections(text) == {"meta": {"ticker": "AAPL"}, "investor_gut_check": {"question_1": "q"}}
+
+
+def test_salvage_whole_document():
+    assert salvage_sections('{"meta": {"ticker": "AAPL"}}') == {"meta": {"ticker": "AAPL"}}
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from json_stream import SectionStreamParser
+
+
+REPORT_TEXT = (
+    'Sure!\n```json\n'
+    '{"meta": {"ticker": "A}\\"{", "tags": ["x", "y"]}, "count": 12, '
+    '"risks": [1, {"risk": "]"}], "flag": true}'
+    '\n```\nLet me know if you need anything else.'
+)
+
+
+def test_stream_emits_each_section_as_it_closes():
+    parser = SectionStreamParser()
+    emitted = []
+    for ch in REPORT_TEXT:
+        emitted.extend(parser.feed(ch))
+
+    assert emitted == [
+        ("meta", {"ticker": 'A}"{', "tags": ["x", "y"]}),
+        ("count", 12),
+        ("risks", [1, {"risk": "]"}]),
+        ("flag", True),
+    ]
+    assert parser.done
+    assert parser.result() == dict(emitted)
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(REPORT_TEXT)])
+def test_stream_chunking_does_not_matter(size):
+    parser = SectionStreamParser()
+    for i in range(0, len(REPORT_TEXT), size):
+        parser.feed(REPORT_TEXT[i:i + size])
+
+    assert parser.result() == {"meta": {"ticker": 'A}"{', "tags": ["x", "y"]}, "count": 12,
+                               "risks": [1, {"risk": "]"}], "flag": True}
+
+
+def test_stream_sections_arrive_before_the_object_closes():
+    parser = SectionStreamParser()
+
+    assert parser.feed('{"meta": {"ticker": "AAPL"}, "step_1": {"one') == [("meta", {"ticker": "AAPL"})]
+    assert not parser.done
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_stream_malformed_section_raises():
+    parser = SectionStreamParser()
+
+    with pytest.raises(json.JSONDecodeError):
+        parser.feed('{"meta": {"ticker": AAPL}, ')
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import market_metrics as mm
+from price_history import HISTORY_DTYPE
+
+SESSIONS = 400
+
+
+def _bars(seed: int, sessions: int = SESSIONS, first_day: int = 19000) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, sessions)))
+    bars = np.zeros(sessions, dtype=HISTORY_DTYPE)
+    bars["day"] = first_day + np.arange(sessions)
+    bars["open"] = close
+    bars["close"] = close
+    bars["adj_close"] = close * 0.97
+    bars["high"] = close * (1 + rng.uniform(0, 0.03, sessions))
+    bars["low"] = close * (1 - rng.uniform(0, 0.03, sessions))
+    bars["volume"] = rng.integers(1e6, 5e6, sessions)
+    return bars
+
+
+def _close(value, digits):
+    return pytest.approx(round(float(value), digits), abs=1.5 * 10 ** -digits)
+
+
+@pytest.fixture(scope="module")
+def table():
+    bars = {"AAA": _bars(1), "BBB": _bars(2), "SPY": _bars(3)}
+    return bars, mm.metrics_table(bars, "SPY")
+
+
+@pytest.mark.parametrize("symbol", ["AAA", "BBB"])
+def test_matches_pandas_reference(table, symbol):
+    bars, metrics = table
+    row = metrics[symbol]
+    adj = pd.Series(bars[symbol]["adj_close"])
+    returns = np.log(adj).diff().dropna()
+    market = np.log(pd.Series(bars["SPY"]["adj_close"])).diff().dropna()
+    year = adj.tail(mm.TRADING_DAYS)
+    change = adj.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / 14).mean().iloc[-1]
+    loss = (-change).clip(lower=0).ewm(alpha=1 / 14).mean().iloc[-1]
+    r, m = returns.tail(mm.TRADING_DAYS), market.tail(mm.TRADING_DAYS)
+
+    assert row["sma_50"] == _close(adj.rolling(50).mean().iloc[-1], 2)
+    assert row["sma_200"] == _close(adj.rolling(200).mean().iloc[-1], 2)
+    assert row["ema_20"] == _close(adj.ewm(span=20).mean().iloc[-1], 2)
+    assert row["rsi_14"] == _close(100 - 100 / (1 + gain / loss), 1)
+    assert row["volatility_1m_pct"] == _close(returns.tail(mm.MONTH).std() * np.sqrt(252) * 100, 2)
+    assert row["volatility_1y_pct"] == _close(r.std() * np.sqrt(252) * 100, 2)
+    assert row["max_drawdown_1y_pct"] == _close((year / year.cummax() - 1).min() * 100, 2)
+    assert row["max_drawdown_pct"] == _close((adj / adj.cummax() - 1).min() * 100, 2)
+    assert row["return_1y_pct"] == _close((adj.iloc[-1] / adj.iloc[-253] - 1) * 100, 2)
+    assert row["high_52w"] == _close(pd.Series(bars[symbol]["high"]).tail(252).max(), 2)
+    assert row["low_52w"] == _close(pd.Series(bars[symbol]["low"]).tail(252).min(), 2)
+    assert row["beta_1y"] == _close(r.cov(m) / m.var(), 2)
+    assert row["correlation_1y"] == _close(r.corr(m), 2)
+    assert row["price"] == _close(bars[symbol]["close"][-1], 2)
+    assert row["observations"] == SESSIONS
+
+
+def test_benchmark_against_itself(table):
+    _, metrics = table
+
+    assert metrics["SPY"]["beta_1y"] == 1.0
+    assert metrics["SPY"]["correlation_1y"] == 1.0
+
+
+def test_short_history_leaves_long_windows_empty():
+    bars = {"NEW": _bars(4, sessions=60, first_day=19340), "SPY": _bars(3)}
+
+    row = mm.metrics_table(bars, "SPY")["NEW"]
+
+    assert row["sma_50"] is not None and row["volatility_1m_pct"] is not None
+    assert row["sma_200"] is None and "price_vs_sma_200_pct" not in row
+    assert row["return_1y_pct"] is None
+    assert row["beta_1y"] is None
+    assert row["observations"] == 60
+
+
+def test_gaps_are_forward_filled_on_the_shared_calendar():
+    full = _bars(5)
+    sparse = np.delete(full, [100, 101, 250])
+    aligned = mm.metrics_table({"FULL": full, "SPARSE": sparse}, "FULL")
+
+    days, prices = mm.align({"FULL": full, "SPARSE": sparse})
+    assert len(days) == SESSIONS
+    assert prices[101, 1] == full["adj_close"][99]
+    assert aligned["SPARSE"]["sma_50"] == aligned["FULL"]["sma_50"]
@@ -0,0 +1,55 @@
+import asyncio
+
+import prewarm
+from prewarm import PopularityTracker, PrewarmScheduler
+
+
+def test_misses_count_only_once_served():
+    scheduler = PrewarmScheduler()
+
+    scheduler.record("AAPL", hit=True)
+    scheduler.record("NOTREAL", hit=False)
+    scheduler.record("MSFT", hit=False)
+    scheduler.served("MSFT")
+
+    assert {t for t, _ in scheduler.popularity.top(10)} == {"AAPL", "MSFT"}
+    assert (scheduler.counters["hits"], scheduler.counters["misses"]) == (1, 2)
+
+
+def test_decayed_entries_are_pruned(monkeypatch):
+    tracker = PopularityTracker(half_life=3600)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(prewarm.time, "time", lambda: clock[0])
+    tracker.record("OLD")
+    clock[0] += 3600 * 2
+    tracker.record("NEW")
+
+    clock[0] += 3600 * 5  # OLD: 1/128, below PRUNE_BELOW; NEW: 1/32
+    assert [t for t, _ in tracker.top(10)] == ["NEW"]
+    assert set(tracker._counts) == {"NEW"}
+
+
+def test_overlapping_cycles_share_one_run(monkeypatch):
+    monkeypatch.setattr(prewarm, "is_market_hours", lambda now=None: False)
+    scheduler = PrewarmScheduler()
+    scheduler._seeded_at = float("inf")
+    regenerated = []
+
+    async def cache_ages(tickers):
+        return {t: None for t in tickers}
+
+    async def regenerate(ticker):
+        regenerated.append(ticker)
+        await asyncio.sleep(0.05)
+        return {}
+
+    scheduler.bind(cache_ages, regenerate, soft_ttl=6 * 3600)
+    scheduler.served("AAPL")
+
+    async def both():
+        await asyncio.gather(scheduler.run_cycle(), scheduler.run_cycle())
+
+    asyncio.run(both())
+
+    assert regenerated == ["AAPL"]
+    assert scheduler.budget_remaining() == prewarm.PREWARM_CALLS_PER_HOUR - 1
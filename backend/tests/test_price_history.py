@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+import price_history as ph
+from price_history import HISTORY_DTYPE
+
+TODAY = 20000
+
+
+def _rows(first: int, last: int, adjust: float = 1.0) -> np.ndarray:
+    days = np.arange(first, last + 1)
+    rows = np.zeros(len(days), dtype=HISTORY_DTYPE)
+    rows["day"] = days
+    rows["close"] = 100.0 + (days - first)
+    rows["adj_close"] = rows["close"] * adjust
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ph, "_root", tmp_path)
+    monkeypatch.setattr(ph, "_maps", {})
+    monkeypatch.setattr(ph, "last_completed_session", lambda now=None: TODAY)
+    downloads = []
+    upstream = {"rows": _rows(TODAY - 9, TODAY)}
+
+    def download(symbol, start_day, through_day):
+        downloads.append((start_day, through_day))
+        rows = upstream["rows"]
+        return rows[(rows["day"] >= start_day) & (rows["day"] <= through_day)]
+
+    monkeypatch.setattr(ph, "_download", download)
+    return tmp_path, upstream, downloads
+
+
+def test_write_appends_only_newer_rows(store):
+    assert ph._write("AAPL", _rows(1, 5)) == 5
+    assert ph._write("AAPL", _rows(4, 8)) == 3
+
+    assert ph.load("AAPL")["day"].tolist() == list(range(1, 9))
+
+
+def test_write_drops_a_torn_trailing_record(store):
+    root, _, _ = store
+    ph._write("AAPL", _rows(1, 3))
+    with open(root / "AAPL.ohlcv", "ab") as f:
+        f.write(b"\x00" * (HISTORY_DTYPE.itemsize // 2))
+
+    ph._write("AAPL", _rows(3, 4))
+
+    assert (root / "AAPL.ohlcv").stat().st_size == 4 * HISTORY_DTYPE.itemsize
+    assert ph.load("AAPL")["day"].tolist() == [1, 2, 3, 4]
+
+
+def test_rewrite_replaces_the_file(store):
+    ph._write("AAPL", _rows(1, 5))
+    ph._write("AAPL", _rows(3, 4), rewrite=True)
+
+    assert ph.load("AAPL")["day"].tolist() == [3, 4]
+
+
+def test_update_fills_then_appends_missing_sessions(store, monkeypatch):
+    _, upstream, downloads = store
+    ph._update("AAPL")
+    assert ph.load("AAPL")["day"][-1] == TODAY
+
+    ph._update("AAPL")  # up to date: no request
+    assert len(downloads) == 1
+
+    upstream["rows"] = _rows(TODAY - 9, TODAY + 2)
+    monkeypatch.setattr(ph, "last_completed_session", lambda now=None: TODAY + 2)
+    ph._update("AAPL")
+
+    assert downloads[-1][0] == TODAY  # re-reads the last stored bar only
+    assert ph.load("AAPL")["day"].tolist() == list(range(TODAY - 9, TODAY + 3))
+
+
+def test_update_rewrites_after_an_upstream_readjustment(store, monkeypatch):
+    _, upstream, downloads = store
+    ph._update("AAPL")
+
+    upstream["rows"] = _rows(TODAY - 9, TODAY + 1, adjust=0.98)
+    monkeypatch.setattr(ph, "last_completed_session", lambda now=None: TODAY + 1)
+    ph._update("AAPL")
+
+    bars = ph.load("AAPL")
+    assert downloads[-1][0] == TODAY - 9
+    assert bars["day"].tolist() == list(range(TODAY - 9, TODAY + 2))
+    assert bars["adj_close"][0] == pytest.approx(100.0 * 0.98)
+
+
+def test_update_leaves_no_file_for_an_unknown_symbol(store):
+    root, upstream, _ = store
+    upstream["rows"] = ph.EMPTY
+
+    ph._update("NOPE")
+
+    assert not (root / "NOPE.ohlcv").exists()
+    assert len(ph.load("NOPE")) == 0
+
+
+def test_symbols_cannot_escape_the_store(store):
+    for symbol in ("../../etc/passwd", "A/B", "..", ""):
+        with pytest.raises(ValueError):
+            ph._path(symbol)
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import market_data
+from market_data import EMPTY_QUOTE, get_quotes
+
+
+class Upstream:
+    """_upstream_quotes stand-in: a slow bulk download whose calls are recorded."""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.calls = []
+
+    async def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        await asyncio.sleep(0.02)
+        return {s: self.quotes.get(s) for s in symbols}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = Upstream({"AAPL": {"price": 190.0, "change": 1.0, "percent": 0.5},
+                     "MSFT": {"price": 410.0, "change": -2.0, "percent": -0.5},
+                     "DOWN": market_data._FAILED})
+    monkeypatch.setattr(market_data, "get_redis", lambda: None)
+    monkeypatch.setattr(market_data, "_local_quotes", {})
+    monkeypatch.setattr(market_data, "_quote_fetches", {})
+    monkeypatch.setattr(market_data, "_upstream_quotes", fake)
+    return fake
+
+
+def test_overlapping_requests_fetch_each_symbol_once(upstream):
+    async def scenario():
+        return await asyncio.gather(get_quotes(["AAPL", "MSFT"]), get_quotes(["MSFT", "AAPL"]),
+                                    get_quotes(["AAPL"]))
+
+    first, second, third = asyncio.run(scenario())
+
+    assert upstream.calls == [["AAPL", "MSFT"]]
+    assert first["AAPL"]["price"] == second["AAPL"]["price"] == third["AAPL"]["price"] == 190.0
+    assert market_data._quote_fetches == {}
+
+
+def test_hits_and_negative_entries_are_served_from_cache(upstream):
+    asyncio.run(get_quotes(["AAPL", "NOPE"]))
+    quotes = asyncio.run(get_quotes(["AAPL", "NOPE", "AAPL"]))
+
+    assert upstream.calls == [["AAPL", "NOPE"]]
+    assert quotes["NOPE"] == EMPTY_QUOTE
+    assert market_data._local_quotes["NOPE"][1] is None
+
+
+def test_failed_fetches_are_answered_but_not_cached(upstream):
+    assert asyncio.run(get_quotes(["DOWN"]))["DOWN"] == EMPTY_QUOTE
+    asyncio.run(get_quotes(["DOWN"]))
+
+    assert upstream.calls == [["DOWN"], ["DOWN"]]
+    assert "DOWN" not in market_data._local_quotes
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import quote_stream
+from quote_stream import CapacityError, QuoteHub, Subscriber
+
+
+class Upstream:
+    """get_quotes stand-in: prices set by the test, every call recorded."""
+
+    def __init__(self):
+        self.prices = {}
+        self.calls = []
+
+    async def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        return {s: {"price": self.prices[s], "change": 0, "percent": 0} for s in symbols if s in self.prices}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _until(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_one_poller_per_symbol_and_one_fetch_per_tick():
+    upstream = Upstream()
+    upstream.prices = {"AAPL": 190.0, "MSFT": 410.0}
+
+    async def scenario():
+        hub = QuoteHub(upstream, interval=0.2)
+        a, b = Subscriber(), Subscriber()
+        hub.subscribe(a, ["AAPL", "MSFT"])
+        hub.subscribe(b, ["AAPL"])
+        first_a, first_b = await a.next(1), await b.next(1)
+        stats = hub.stats()
+        hub.unsubscribe(a)
+        hub.unsubscribe(b)
+        return first_a, first_b, stats, hub
+
+    first_a, first_b, stats, hub = run(scenario())
+
+    assert upstream.calls == [["AAPL", "MSFT"]]
+    assert set(first_a) == {"AAPL", "MSFT"} and set(first_b) == {"AAPL"}
+    assert stats["symbols"]["AAPL"]["subscribers"] == 2
+    assert hub.stats()["symbols"] == {} and hub.stats()["subscribers"] == 0
+
+
+def test_only_changes_are_pushed_and_slow_readers_get_the_latest():
+    upstream = Upstream()
+    upstream.prices = {"AAPL": 190.0}
+
+    async def scenario():
+        hub = QuoteHub(upstream, interval=0.05)
+        sub = Subscriber()
+        hub.subscribe(sub, ["AAPL"])
+        await sub.next(1)
+        await asyncio.sleep(0.12)          # unchanged polls: nothing pending
+        unchanged = dict(sub.pending)
+        for price in (191.0, 192.0):
+            upstream.prices["AAPL"] = price
+            await _until(lambda: hub.stats()["symbols"]["AAPL"]["price"] == price)
+        latest = await sub.next(1)
+        hub.unsubscribe(sub)
+        return unchanged, latest, sub.conflated + hub.counters["conflated"]
+
+    unchanged, latest, conflated = run(scenario())
+
+    assert unchanged == {}
+    assert latest["AAPL"]["price"] == 192.0
+    assert conflated >= 1
+
+
+def test_capacity_limits(monkeypatch):
+    monkeypatch.setattr(quote_stream, "QUOTE_STREAM_MAX_POLLERS", 2)
+    monkeypatch.setattr(quote_stream, "QUOTE_STREAM_MAX_SUBSCRIBERS", 1)
+
+    async def scenario():
+        hub = QuoteHub(Upstream(), interval=60)
+        first = Subscriber()
+        hub.check_capacity(["A", "B"])
+        hub.subscribe(first, ["A", "B"])
+        with pytest.raises(CapacityError):
+            hub.subscribe(first, ["C"])       # a third poller
+        with pytest.raises(CapacityError):
+            hub.check_capacity(["A"])         # a second subscriber
+        with pytest.raises(CapacityError):
+            hub.subscribe(Subscriber(), ["A"])
+        hub.unsubscribe(first)
+        hub.check_capacity(["A", "B"])
+        return hub.counters["rejected"]
+
+    assert run(scenario()) == 3
+
+
+def test_sse_stream_subscribes_only_while_the_generator_runs(monkeypatch):
+    upstream = Upstream()
+    upstream.prices = {"AAPL": 190.0}
+    hub = None
+
+    async def scenario():
+        nonlocal hub
+        hub = QuoteHub(upstream, interval=60)
+        monkeypatch.setattr(quote_stream, "hub", hub)
+
+        never_started = quote_stream._quote_events(["AAPL"])
+        idle = hub.stats()["subscribers"]
+        await never_started.aclose()
+
+        events = quote_stream._quote_events(["AAPL"])
+        first = await events.__anext__()
+        open_subscribers = hub.stats()["subscribers"]
+        await events.aclose()
+        return idle, first, open_subscribers
+
+    idle, first, open_subscribers = run(scenario())
+
+    assert idle == 0
+    assert first.startswith("event: quote") and '"symbol": "AAPL"' in first
+    assert open_subscribers == 1
+    assert hub.stats()["subscribers"] == 0 and hub.stats()["symbols"] == {}
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Leases:
+    """The slice of redis.asyncio SingleFlight uses: SET NX and the owner-checked scripts."""
+
+    def __init__(self, fail: bool = False):
+        self.values = {}
+        self.fail = fail
+
+    async def set(self, key, value, nx=False, px=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.values.get(key) != token:
+            return 0
+        if "del" in script:
+            del self.values[key]
+        return 1
+
+
+class Work:
+    def __init__(self, result="report", delay=0.02):
+        self.result, self.delay, self.runs = result, delay, 0
+
+    async def __call__(self):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_callers_share_one_run():
+    flight, work = SingleFlight(), Work()
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("report:AAPL", work) for _ in range(5)))
+
+    assert run(scenario()) == ["report"] * 5
+    assert work.runs == 1
+    assert (flight.counters["leaders"], flight.counters["coalesced_local"]) == (1, 4)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_the_next_call_runs_again():
+    flight, work = SingleFlight(), Work(result=RuntimeError("boom"))
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+
+    assert [str(r) for r in run(scenario())] == ["boom", "boom"]
+    with pytest.raises(RuntimeError):
+        run(flight.do("k", work))
+    assert work.runs == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_run():
+    flight, work = SingleFlight(), Work(delay=0.05)
+
+    async def scenario():
+        impatient = asyncio.create_task(flight.do("k", work))
+        patient = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert run(scenario()) == "report"
+    assert work.runs == 1
+
+
+def test_follower_waits_for_the_lease_holder_to_publish():
+    redis, published = Leases(), {}
+    redis.values["lease:k"] = "other-worker"
+    flight, work = SingleFlight(redis, poll_interval=0.01), Work()
+
+    async def scenario():
+        follower = asyncio.create_task(flight.do("k", work, lookup=lambda: published.get("k")))
+        await asyncio.sleep(0.05)
+        published["k"] = "theirs"
+        return await follower
+
+    assert run(scenario()) == "theirs"
+    assert work.runs == 0 and flight.counters["coalesced_remote"] == 1
+
+
+def test_lease_taken_after_a_publish_reuses_the_result():
+    redis = Leases()
+    flight, work = SingleFlight(redis), Work()
+
+    assert run(flight.do("k", work, lookup=lambda: "already there")) == "already there"
+    assert work.runs == 0 and redis.values == {}
+
+
+def test_leader_releases_its_lease():
+    redis = Leases()
+    flight, work = SingleFlight(redis), Work()
+
+    assert run(flight.do("k", work, lookup=lambda: None)) == "report"
+    assert work.runs == 1 and redis.values == {}
+
+
+def test_gives_up_on_a_stuck_lease():
+    redis = Leases()
+    redis.values["lease:k"] = "dead-worker"
+    flight, work = SingleFlight(redis, wait_timeout=0.05, poll_interval=0.01), Work()
+
+    assert run(flight.do("k", work, lookup=lambda: None)) == "report"
+    assert flight.counters["lease_timeouts"] == 1
+
+
+def test_redis_down_falls_back_to_local_only():
+    flight, work = SingleFlight(Leases(fail=True)), Work()
+
+    assert run(flight.do("k", work)) == "report"
+    assert flight.counters["lease_errors"] == 1 and work.runs == 1
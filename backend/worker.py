@@ -0,0 +1,63 @@
+"""
+Stock Fortress — Generation Worker
+===================================
+Runs report generations, stale refreshes and blog posts from the durable job queue,
+outside the web process. Web replicas only enqueue; workers scale on their own.
+
+    python worker.py                    # WORKER_CONCURRENCY jobs at a time
+    python worker.py --concurrency 4
+
+Deploy alongside the web service with JOB_QUEUE_BACKEND=redis (a local SQLite queue is
+only shared by processes on the same machine) and JOB_RUN_IN_WEB=0 on the web service.
+JOB_CONCURRENCY stays the global cap across every worker; failed jobs are retried with
+backoff (JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF_SECONDS). On SIGTERM the worker stops
+claiming, lets running jobs finish for WORKER_DRAIN_SECONDS, then hands the rest back.
+
+Configuration via .env:
+    WORKER_CONCURRENCY=2        # Jobs this worker runs at once
+    WORKER_DRAIN_SECONDS=90     # Grace period for running jobs on shutdown; keep it well under
+                                # the platform's kill timeout (railway.worker.toml drainingSeconds)
+"""
+
+import os
+import signal
+import asyncio
+import argparse
+
+# Importing the app module loads .env and registers the job handlers (no server is started)
+from stock_fortress_backend import job_handlers, job_queue
+from job_queue import JobRunner, runners, JOB_CONCURRENCY
+from ai_provider import warm_clients, close_clients
+from cache import close_redis
+
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "2"))
+WORKER_DRAIN_SECONDS = float(os.environ.get("WORKER_DRAIN_SECONDS", "90"))
+
+
+async def run(concurrency: int):
+    await warm_clients()
+    runner = JobRunner(job_queue, job_handlers, slots=concurrency)
+    runners.append(runner)
+    runner.start()
+    print(f"✅ Worker started: {concurrency} slots ({job_queue.name} queue, global limit {JOB_CONCURRENCY}), "
+          f"handling {', '.join(job_handlers)}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print(f"🔄 Worker stopping: draining {runner.stats()['active']} running job(s)")
+    await runner.stop(drain=WORKER_DRAIN_SECONDS)
+    await close_clients()
+    await close_redis()
+    print(f"✅ Worker stopped ({runner.stats()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock Fortress generation worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY,
+                        help="jobs this worker runs at once (default: WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency))